@@ -0,0 +1,545 @@
+#!/usr/bin/env python3
+
+import contextlib
+import mmap
+import addresses
+import columnar
+import devices.gp8 as _gp8
+from RolandGp8 import EFFECT_BITS, RolandGp8
+
+CHECKSUM = _gp8.data['CHECKSUM']['position']
+
+'''Records per pass of the bulk checksum functions, bounds memory on huge archives'''
+BLOCK = 1 << 16
+
+_NEGATE = columnar.table(lambda value: -value & 0x7F)
+_SEVEN_BITS = columnar.table(lambda value: value & 0x7F)
+
+'''Packed effects byte -> tuple of the keys of the effects it switches on'''
+_COMBINATIONS = [tuple(key for key, bit in EFFECT_BITS.items() if value & bit) for value in range(256)]
+_HIGH_NIBBLE = columnar.table(lambda value: (value & 0x0F) << 4)
+_LOW_NIBBLE = columnar.table(lambda value: value & 0x0F)
+
+'''Field name -> translate table, 1 for every byte value the field does NOT accept'''
+_ILLEGAL = {name: legal.translate(bytes([1, 0]) + bytes(254)) for name, legal in RolandGp8._legal.items()}
+
+
+class PatchBank():
+    """ Columnar store for any number of GP-8 program records.
+
+        All records live back to back in one contiguous buffer, so a single
+        field can be read or written across every patch with one extended
+        slice (record[position::59]) instead of one RolandGp8 object per patch.
+        Field names are the keys of the device data dictionary, ie. 'OD_DRIVE'.
+
+        Bulk writes keep every record's checksum correct by adjusting it with
+        the per record difference of the column written, in one pass.
+    """
+
+    def __init__(self, buffer=None, count=0):
+        """ Wrap a buffer of back to back 59 byte records. If no buffer is
+            given the bank is filled with count blank (RolandGp8()) records.
+        """
+        if buffer is None:
+            buffer = bytes(RolandGp8()._record) * count
+        if len(buffer) % _gp8.RECORD_LENGTH:
+            raise ValueError('Buffer length is not a multiple of the record length')
+        if isinstance(buffer, mmap.mmap):
+            self._buffer = buffer
+        else:
+            self._buffer = bytearray(buffer)
+        self._gp8 = _gp8.data
+
+    @classmethod
+    def from_patches(cls, patches):
+        """ Build a bank from an iterable of RolandGp8 objects. """
+        return cls(b''.join(bytes(patch._record) for patch in patches))
+
+    @classmethod
+    def from_file(cls, filename):
+        """ Build a bank from a raw GP-8 sysex dump (records back to back). """
+        with open(filename, 'rb') as file:
+            return cls(file.read())
+
+    @classmethod
+    def open(cls, filename, writable=False):
+        """ Memory map a sysex library instead of reading it.
+
+            Nothing is read until a record or column is actually used, so opening
+            a multi-gigabyte archive is practically free. With writable=True
+            every write (through set(), set_effect() or a view()) goes straight
+            back to the file.
+        """
+        with open(filename, 'r+b' if writable else 'rb') as file:
+            if not file.seek(0, 2):
+                return cls()
+            access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+            mapped = mmap.mmap(file.fileno(), 0, access=access)
+        try:
+            return cls(mapped)
+        except ValueError:
+            mapped.close()
+            raise
+
+    def close(self):
+        """ Release the memory map of a bank created with open().
+
+            Views (see view()) still alive keep the map open: the bank lets go
+            of it and it is unmapped once the last view is gone. Either way the
+            bank is left empty.
+        """
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                pass
+            self._buffer = bytearray()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self._buffer) // _gp8.RECORD_LENGTH
+
+    def __getitem__(self, index):
+        """ Return the record at index as a (copied) RolandGp8 object """
+        start = self._offset(index)
+        return RolandGp8(self._buffer[start:start + _gp8.RECORD_LENGTH])
+
+    def __setitem__(self, index, patch):
+        """ Overwrite the record at index with the contents of a RolandGp8 """
+        start = self._offset(index)
+        if len(patch._record) != _gp8.RECORD_LENGTH:
+            raise ValueError('Record is not exactly one program long')
+        self._buffer[start:start + _gp8.RECORD_LENGTH] = patch._record
+
+    def view(self, index):
+        """ Return the record at index as a RolandGp8 wrapping a memoryview of the
+            bank, no bytes are copied. Writes to the view land in the bank (and in
+            the file, for a writable memory mapped bank).
+
+            A bytearray backed bank can't grow while views of it are alive.
+        """
+        start = self._offset(index)
+        return RolandGp8(memoryview(self._buffer)[start:start + _gp8.RECORD_LENGTH])
+
+    def views(self):
+        """ Iterate over zero copy views of every record """
+        for index in range(len(self)):
+            yield self.view(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def _offset(self, index):
+        """ Byte offset of the record at index, negative indexes allowed """
+        count = len(self)
+        if index < 0:
+            index += count
+        if not 0 <= index < count:
+            raise IndexError('PatchBank index out of range')
+        return index * _gp8.RECORD_LENGTH
+
+    def _field(self, name):
+        """ Look up a field in the data dictionary, case insensitively """
+        return self._gp8[name.upper()]
+
+    def append(self, patch):
+        """ Add a RolandGp8 record to the end of the bank """
+        if isinstance(self._buffer, mmap.mmap):
+            raise TypeError('A memory mapped bank can not grow')
+        if len(patch._record) != _gp8.RECORD_LENGTH:
+            raise ValueError('Record is not exactly one program long')
+        self._buffer += patch._record
+
+    def extend(self, patches):
+        """ Add every RolandGp8 record in patches to the end of the bank """
+        for patch in patches:
+            self.append(patch)
+
+    def tobytes(self):
+        """ The whole bank as a raw sysex dump """
+        return bytes(self._buffer)
+
+    def column(self, name, offset=0):
+        """ Raw byte of a field from every record, as one bytes object.
+
+        Args:
+            name ([string]): Field name from the data dictionary.
+            offset ([int]): Byte within a multi byte field.
+
+        Returns:
+            [bytes]: One byte per record, in bank order.
+        """
+        data = self._field(name)
+        return bytes(self._buffer[data['position'] + offset::_gp8.RECORD_LENGTH])
+
+    def out_of_range(self, name):
+        """ Validate a field in every record in one pass, against the legal
+            values table compiled from the data dictionary.
+
+        Returns:
+            [list]: Indexes of the records holding a value the field doesn't accept.
+        """
+        table = _ILLEGAL[name.upper()]
+        columns = [self.column(name, offset).translate(table) for offset in range(self._field(name)['length'])]
+        return columnar.nonzero(columnar.lane_sum(columns, len(self)) if len(columns) > 1 else columns[0])
+
+    def get(self, name):
+        """ Decoded value of a field from every record.
+
+        Returns:
+            bytes for int and bitwise fields (each item is the int value),
+            a list of bool for bool fields and a list of str for strings.
+        """
+        data = self._field(name)
+        if data['type'] in ['int', 'bitwise', 'flag'] and data['length'] == 1:
+            return self.column(name)
+        if data['type'] == 'bool':
+            return [value == 100 for value in self.column(name)]
+        if data['type'] == 'string':
+            with memoryview(self._buffer) as buffer:
+                return [str(buffer[start:start + data['length']], 'ascii')
+                        for start in range(data['position'], len(buffer), _gp8.RECORD_LENGTH)]
+        raise ValueError('Field type not supported: ' + data['type'])
+
+    def set(self, name, value):
+        """ Write a field in every record of the bank.
+
+        Args:
+            name ([string]): Field name from the data dictionary.
+            value: A single value written to every record, or a sequence
+                   with one value per record.
+        """
+        self._write_columns(self._encode(name.upper(), value))
+
+    def set_many(self, values):
+        """ Write several fields and effect switches in every record, all or nothing.
+
+            Every value is validated before a single byte is written, so a bad
+            one leaves the bank untouched. All columns are then written and
+            every checksum adjusted for all of them in the same pass.
+
+        Args:
+            values ([dict]): Field name (as for set()) or effect name (as for
+                             set_effect()) -> value, ie. {'OD_DRIVE': 80, 'CHORUS': True}
+
+        Raises:
+            ValueError: A value out of range, or a sequence of the wrong length.
+            KeyError: An unknown field or effect name.
+        """
+        columns = {}
+        for name, value in values.items():
+            if _is_effect(name):
+                bank, mask = _effect_bit(name)
+                position = self._gp8[bank]['position']
+                columns[position] = _switch(columns.get(position) or self.column(bank), mask, value)
+            else:
+                columns.update(self._encode(name.upper(), value))
+        self._write_columns(columns)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Undo every write made in the with block if it raises.
+
+            The whole buffer is copied on entry, on a huge bank prefer set_many().
+        """
+        snapshot = bytes(self._buffer)
+        try:
+            yield self
+        except BaseException:
+            self._buffer[:] = snapshot
+            raise
+
+    def get_effect(self, effect):
+        """ On/off state of an effect (ie. 'CHORUS') in every record, as a list of bool """
+        bank, mask = _effect_bit(effect)
+        return [bool(value & mask) for value in self.column(bank)]
+
+    def set_effect(self, effect, value):
+        """ Switch an effect on or off in every record of the bank, value is a
+            single bool or a sequence with one per record.
+        """
+        bank, mask = _effect_bit(effect)
+        self._write_columns({self._gp8[bank]['position']: _switch(self.column(bank), mask, value)})
+
+    def slots(self):
+        """ Slot (see addresses.py) of every record by its address bytes, in one pass.
+
+        Returns:
+            [bytes]: One slot per record, addresses.TEMP for the temp area and
+                     addresses.INVALID for an address that is neither.
+        """
+        return addresses.slots(self.column('PROGRAM'), self.column('GROUP'))
+
+    def relocate(self, slots):
+        """ Give every record the address of a slot, rewriting the address bytes
+            and the checksum of every record in one pass.
+
+        Args:
+            slots: One slot per record, 0-127 or addresses.TEMP.
+        """
+        slots = bytes(slots)
+        if len(slots) != len(self) or max(slots, default=0) > addresses.TEMP:
+            raise ValueError('Need one slot (0-128) per record')
+        self._write_columns({self._gp8['PROGRAM']['position']: slots.translate(addresses.SLOT_MSB),
+                             self._gp8['GROUP']['position']: slots.translate(addresses.SLOT_LSB)})
+
+    def renumber(self, first=0):
+        """ Address the records as consecutive slots from first, in dump order
+            (A-1-1, B-1-1, A-1-2, ...), ie. after reordering a full bank.
+        """
+        if first < 0 or first + len(self) > addresses.SLOTS:
+            raise ValueError('The records do not fit in the program memories from slot %d' % first)
+        self.relocate(range(first, first + len(self)))
+
+    def ordering(self, by='name', reverse=False):
+        """ The order that sorts the bank, worked out from raw columns only.
+
+        Args:
+            by ([string]): 'name' (case and surrounding blanks ignored),
+                           'effects' (the packed effects byte, see EFFECT_BITS)
+                           or any one byte field, ie. 'VOLUME'.
+            reverse ([bool]): Sort descending. Ties keep their bank order either way.
+
+        Returns:
+            [list]: Permutation, for permute(): index of the record that goes in every position.
+        """
+        if by.upper() == 'NAME':
+            keys = [name.strip().lower() for name in self.get('NAME')]
+        elif by.upper() == 'EFFECTS':
+            keys = self.effects_column()
+        elif self._field(by)['length'] == 1:
+            keys = self.column(by)
+        else:
+            raise ValueError('Can not sort by ' + by)
+        if reverse:
+            return sorted(range(len(self)), key=lambda index: (keys[index], -index), reverse=True)
+        return sorted(range(len(self)), key=keys.__getitem__)
+
+    def setlist_order(self, names):
+        """ The order putting the records named in a setlist first, in setlist order.
+            Names compare like ordering(by='name') does. A name listed again takes
+            the next record of that name, records not listed follow in bank order.
+
+        Returns:
+            [list]: Permutation, for permute().
+        """
+        positions = {}
+        for index, name in enumerate(self.get('NAME')):
+            positions.setdefault(name.strip().lower(), []).append(index)
+        for indexes in positions.values():
+            indexes.reverse()
+        order = []
+        for name in names:
+            indexes = positions.get(name.strip().lower())
+            if indexes:
+                order.append(indexes.pop())
+        listed = set(order)
+        return order + [index for index in range(len(self)) if index not in listed]
+
+    def permute(self, order, keep_addresses=True):
+        """ Reorder the records in place: record order[i] moves to position i.
+
+            The frames are moved as raw bytes within the one buffer, so this works
+            on a writable memory mapped bank as well. With keep_addresses every
+            position keeps the address it had (the records are renumbered to
+            fit, see relocate()), otherwise the records take theirs along.
+
+        Args:
+            order ([list]): Permutation of range(len(self)), ie. from ordering().
+        """
+        count = len(self)
+        if len(order) != count or set(order) != set(range(count)):
+            raise ValueError('Not a permutation of the bank')
+        slots = self.slots() if keep_addresses else None
+        if slots is not None and slots.count(addresses.INVALID):
+            raise ValueError('Record %d has no valid address to keep' % slots.index(addresses.INVALID))
+        length = _gp8.RECORD_LENGTH
+        with memoryview(self._buffer) as buffer:
+            frames = b''.join([buffer[index * length:(index + 1) * length] for index in order])
+        self._buffer[:] = frames
+        if slots is not None:
+            self.relocate(slots)
+
+    def sort(self, by='name', reverse=False, keep_addresses=True):
+        """ Sort the bank in place, see ordering() and permute().
+
+        Returns:
+            [list]: The permutation applied, ie. to reorder a matching bank the
+                    same way or to undo it with permute(inverse(order)).
+        """
+        order = self.ordering(by, reverse)
+        self.permute(order, keep_addresses)
+        return order
+
+    def effects_column(self):
+        """ The eight effect switches of every record packed in one byte,
+            EFFECT_MSB << 4 | EFFECT_LSB (see EFFECT_BITS), in one pass.
+        """
+        high = int.from_bytes(self.column('EFFECT_MSB').translate(_HIGH_NIBBLE), 'little')
+        low = int.from_bytes(self.column('EFFECT_LSB').translate(_LOW_NIBBLE), 'little')
+        return (high | low).to_bytes(len(self), 'little')
+
+    def effect_combinations(self):
+        """ How many records use each combination of effects.
+
+        Returns:
+            [dict]: Tuple of effect keys, ie. ('CHORUS', 'DISTORTION'), -> number
+                    of records with exactly those effects on, for every
+                    combination found. () counts the records with every effect off.
+        """
+        packed = self.effects_column()
+        counts = {}
+        for value in range(256):
+            count = packed.count(value)
+            if count:
+                counts[_COMBINATIONS[value]] = count
+        return counts
+
+    def effect_counts(self):
+        """ Effect key -> number of records it is on in """
+        counts = dict.fromkeys(EFFECT_BITS, 0)
+        for combination, count in self.effect_combinations().items():
+            for key in combination:
+                counts[key] += count
+        return counts
+
+    def effect_matrix(self):
+        """ On/off matrix of every effect, effect key -> one 0/1 byte per record """
+        packed = self.effects_column()
+        return {key: packed.translate(bytes([1 if value & bit else 0 for value in range(256)]))
+                for key, bit in EFFECT_BITS.items()}
+
+    def _encode(self, name, value):
+        """ Validate a value for set() and encode it as columns.
+
+        Returns:
+            [dict]: Position -> new column (one byte per record), for every byte of the field.
+        """
+        data = self._field(name)
+        count = len(self)
+        position = data['position']
+        if data['type'] in ['int', 'bitwise'] and data['length'] == 1:
+            if type(value) == type(0):
+                values = bytes([value]) * count if value in range(256) else None
+            else:
+                values = bytes(value)
+            if values is None or len(values) != count or values.translate(RolandGp8._legal[name]).count(0):
+                raise ValueError
+            return {position: values}
+        if data['type'] == 'bool':
+            if type(value) == type(True):
+                values = bytes([100 if value else 0]) * count
+            else:
+                values = bytes([100 if item else 0 for item in value])
+            if len(values) != count:
+                raise ValueError
+            return {position: values}
+        if data['type'] == 'string':
+            if type(value) == type(''):
+                value = [value] * count
+            if len(value) != count:
+                raise ValueError
+            text = b''.join(_pad(item, data['length']) for item in value)
+            return {position + offset: text[offset::data['length']] for offset in range(data['length'])}
+        raise ValueError('Field type not supported: ' + data['type'])
+
+    def _write_columns(self, columns):
+        """ Write one byte per record at every position of columns, adjusting
+            every checksum by (old - new) of all of them in the same pass.
+        """
+        if not columns:
+            return
+        length = _gp8.RECORD_LENGTH
+        terms = [self._buffer[CHECKSUM::length]]
+        for position, values in columns.items():
+            terms += [self._buffer[position::length], values.translate(_NEGATE)]
+        for position, values in columns.items():
+            self._buffer[position::length] = values
+        self._buffer[CHECKSUM::length] = columnar.lane_sum(terms, len(self)).translate(_SEVEN_BITS)
+
+    def _checksum_blocks(self):
+        """ Yield (first index, slice of the checksum column, per record sum of
+            the checksummed bytes) for every block of records.
+        """
+        length = _gp8.RECORD_LENGTH
+        for first in range(0, len(self), BLOCK):
+            start = first * length
+            end = min(len(self), first + BLOCK) * length
+            columns = [self._buffer[start + position:end:length]
+                       for position in range(_gp8.CHECKSUM_START, _gp8.CHECKSUM_END)]
+            yield first, slice(start + CHECKSUM, end, length), columnar.lane_sum(columns, end // length - first)
+
+    def _corrupt(self, first, checksums, sums):
+        """ Indexes of the records in a block whose checksum doesn't match sums """
+        wrong = columnar.lane_sum([sums, self._buffer[checksums]], len(sums)).translate(_SEVEN_BITS)
+        return [first + index for index in columnar.nonzero(wrong)]
+
+    def verify_checksums(self):
+        """ Check the checksum of every record in one vectorized pass.
+
+        Returns:
+            [list]: Indexes of the records with a wrong checksum.
+        """
+        corrupt = []
+        for first, checksums, sums in self._checksum_blocks():
+            corrupt += self._corrupt(first, checksums, sums)
+        return corrupt
+
+    def fix_checksums(self):
+        """ Recompute the checksum of every record.
+
+        Returns:
+            [list]: Indexes of the records whose checksum was wrong.
+        """
+        corrupt = []
+        for first, checksums, sums in self._checksum_blocks():
+            corrupt += self._corrupt(first, checksums, sums)
+            self._buffer[checksums] = sums.translate(_NEGATE)
+        return corrupt
+
+
+def inverse(order):
+    """ The permutation undoing order """
+    undo = [0] * len(order)
+    for position, index in enumerate(order):
+        undo[index] = position
+    return undo
+
+
+def _pad(text, length):
+    """ Pad/trim text to exactly length ascii bytes """
+    return bytes(text[:length].ljust(length), 'ascii')
+
+
+def _is_effect(name):
+    """ True if name is an effect switch (ie. 'chorus') rather than a field """
+    return name.upper() in _gp8.BANK_1_EFFECTS_MSB or name.upper() in _gp8.BANK_2_EFFECTS_LSB
+
+
+def _switch(column, mask, value):
+    """ column of EFFECT_MSB/EFFECT_LSB bytes with the bit mask set or cleared,
+        value is a single bool or a sequence with one per record.
+    """
+    if isinstance(value, int):
+        if value:
+            return column.translate(bytes([byte | mask for byte in range(256)]))
+        return column.translate(bytes([byte & ~mask for byte in range(256)]))
+    if len(value) != len(column):
+        raise ValueError
+    return bytes([byte | mask if on else byte & ~mask for byte, on in zip(column, value)])
+
+
+def _effect_bit(effect):
+    """ (bank field name, bit mask) of an effect switch """
+    effect = effect.upper()
+    if effect in _gp8.BANK_1_EFFECTS_MSB:
+        return 'EFFECT_MSB', _gp8.BANK_1_EFFECTS_MSB[effect]
+    if effect in _gp8.BANK_2_EFFECTS_LSB:
+        return 'EFFECT_LSB', _gp8.BANK_2_EFFECTS_LSB[effect]
+    raise KeyError(effect)
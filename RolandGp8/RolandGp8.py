@@ -1,29 +1,93 @@
 #!/usr/bin/env python3
 
-import binascii
+import contextlib
+import hashlib
+import addresses
 import devices.gp8 as _gp8
+import schema as _schema
+from sysex import roland_checksum
 
+'''Baseline for a new patch. All effects off, name set to "*Untitled"'''
+BLANK = bytes.fromhex(
+    'f041001312000000000050646464643c006432211e003232323c32320310191a0f64411b140000002a556e7469746c656420202020202020005df7')
 
+
+'''Data dictionary key -> bit of an effects byte packed as EFFECT_MSB << 4 | EFFECT_LSB'''
+EFFECT_BITS = dict([(key, mask << 4) for key, mask in _gp8.BANK_1_EFFECTS_MSB.items()]
+                   + list(_gp8.BANK_2_EFFECTS_LSB.items()))
+
+'''Effect labels of the effects property, by data dictionary key'''
+EFFECT_LABELS = {key: key.replace('_', ' ').title() for key in
+                 list(_gp8.BANK_1_EFFECTS_MSB) + list(_gp8.BANK_2_EFFECTS_LSB)}
+
+
+def effect_table(effects):
+    """ 16 entry table of the (label, on) pairs of every value of an effects nibble.
+
+    Args:
+        effects ([dict]): Key -> bit mask, ie. devices.gp8.BANK_1_EFFECTS_MSB
+    """
+    return tuple(tuple((EFFECT_LABELS[key], bool(nibble & mask)) for key, mask in effects.items())
+                 for nibble in range(16))
+
+
+def content_hash(record):
+    """ Identity of a patch: hash of its data bytes, address and device id excluded """
+    return hashlib.blake2b(bytes(record[_gp8.DATA_START:_gp8.CHECKSUM_END]), digest_size=16).digest()
+
+
+_EFFECTS_MSB = effect_table(_gp8.BANK_1_EFFECTS_MSB)
+_EFFECTS_LSB = effect_table(_gp8.BANK_2_EFFECTS_LSB)
+_EFFECT_MSB = _gp8.data['EFFECT_MSB']['position']
+_EFFECT_LSB = _gp8.data['EFFECT_LSB']['position']
+_ADDRESS_MSB = _gp8.data['PROGRAM']['position']
+_ADDRESS_LSB = _gp8.data['GROUP']['position']
+_CHECKSUM = _gp8.data['CHECKSUM']['position']
+
+'''Bits of the two effects bytes that are no effect switch'''
+_UNSWITCHED = (0x7F & ~sum(_gp8.BANK_1_EFFECTS_MSB.values()), 0x7F & ~sum(_gp8.BANK_2_EFFECTS_LSB.values()))
+
+
+@_schema.compiled(_gp8, aliases={'DYNAMIC_FILTER': 'filter'})
 class RolandGp8():
     """ Object abstraction for Roland GP-8 program sysex command.
         Refer to GP-8 Notes.md, and the Roland GP-8 Owner's Manual
         for deeper dives.
+
+        Every int, bool and string field of devices/gp8.py (ie. od_drive,
+        od_turbo, name) and every effect switch (ie. chorus, filter) is a
+        property, compiled from the data dictionary by schema.compiled().
+        Deleting a property resets it to its default.
+
+        Every write keeps the CHECKSUM byte correct (as long as it was correct
+        to begin with), see verify_checksum() and fix_checksum().
+
+        An instance holds nothing but its record (__slots__), the data
+        dictionary and effect lookup are shared, read only, by every patch.
     """
 
+    __slots__ = ('_record',)
+
+    _effect_lookup = _schema.freeze(dict(_gp8.BANK_1_EFFECTS_MSB, **_gp8.BANK_2_EFFECTS_LSB))
+    _gp8 = _schema.freeze(_gp8.data)
+    _legal = _schema.freeze(_schema.legal_tables(_gp8))
+
     def __init__(self, record=None):
         """ If initialized with no params, the object returned is a "blank" record
             with the address set to write to the immediate mode temp area at '00 00' 
+
+            A memoryview (ie. a slice of an mmap'd sysex library) is wrapped as is,
+            without copying. Reads only touch the bytes they need and writes go
+            straight back to the underlying buffer.
         """
-        if record == None:
-            """ This hex string becomes the baseline for a new patch. All
-                effects off, name set to "*Untitled"
-            """
-            record = binascii.unhexlify(
-                b'f041001312000000000050646464643c006432211e003232323c32320310191a0f64411b140000002a556e7469746c656420202020202020200012f7')
-        self._record = bytearray(record)
-        self._gp8 = _gp8.data
-        self._effect_lookup = _gp8.BANK_1_EFFECTS_MSB
-        self._effect_lookup.update(_gp8.BANK_2_EFFECTS_LSB)
+        if record is None:
+            record = BLANK
+        if isinstance(record, memoryview):
+            if len(record) != _gp8.RECORD_LENGTH:
+                raise ValueError('Record view is not exactly one program long')
+            self._record = record
+        else:
+            self._record = bytearray(record)
 
     def __str__(self):
         return self.__repr__()
@@ -63,28 +127,31 @@ class RolandGp8():
             value ([type]): A value/type appropriate as defined in self._gp8.
         """
         data = self._gp8[name]
+        start = data['position']
+        end = start + data['length']
+        before = sum(self._record[start:end])
         if data['type'] in ['int', 'bitwise'] and type(value) == type(0):
-            if value in data['range']:
-                self._record[data['position']
-                    :data['position'] + data['length']] = [value]
+            if 0 <= value < 256 and self._legal[name][value]:
+                self._record[data['position']] = value
             else:
                 raise ValueError
 
         if data['type'] == 'bool':
             if value:
-                self._record[data['position']
-                    :data['position'] + data['length']] = [100]
+                self._record[data['position']] = 100
             else:
-                self._record[data['position']
-                    :data['position'] + data['length']] = [0]
+                self._record[data['position']] = 0
 
         if data['type'] == 'string':
-            """Pad the string to length with spaces"""
-            while len(value) <= data['length']:
-                value = value + " "
+            """Pad/trim the string to exactly length with spaces"""
+            value = value[:data['length']].ljust(data['length'])
             self._record[data['position']:data['position'] +
                      data['length']] = bytes(value, 'ascii')
 
+        if _gp8.CHECKSUM_START <= start and end <= _gp8.CHECKSUM_END:
+            checksum = self._gp8['CHECKSUM']['position']
+            self._record[checksum] = (self._record[checksum] + before - sum(self._record[start:end])) & 0x7F
+
     def _effect_get(self, bank, effect):
         """Read data from the sysex buffer using the data dictionary
 
@@ -104,189 +171,185 @@ class RolandGp8():
             self._write_value(bank, self._read_value(
                 bank) ^ self._effect_lookup[effect])
 
-    def csv_hex(self):
-        """ Return the current patch as a hex string that can easily be used with 
-            the send_midi utility provided by the mididings package.
-        """
-        csv = []
-        for byte in self._record:
-            csv.append(byte.to_bytes(1, 'big').hex())
-        return ','.join(csv)
-
-    @property
-    def name(self):
-        """ Returns the name of the patch as a string """
-        data = self._gp8['NAME']
-        return self._record[data['position']:data['position'] + data['length']].decode('ascii')
-
-    @name.setter
-    def name(self, value):
-        """ Update the name of the patch. Automatically padded/trimmed to 16 chars """
-        self._write_value('NAME', value)
-
-    @name.deleter
-    def name(self):
-        """ Reset the patch name to a default value as defined in the data dictionary. """
-        self._reset_value('NAME')
-
-    @property
-    def volume(self):
-        """ Return the master volume as int 0-100 """
-        return self._read_value('VOLUME')
-
-    @volume.setter
-    def volume(self, value):
-        return self._write_value('VOLUME', value)
-
-    @volume.deleter
-    def volume(self):
-        return self._reset_value('VOLUME')
-
-    # EFFECT BIT SWITCHES
-
-    # Dynamic Filter
-    @property
-    def filter(self):
-        """True if the effect is on.
-
-        Returns:
-            [bool]: Effect is either on or off
-        """
-        return self._effect_get('EFFECT_LSB', 'DYNAMIC_FILTER')
-
-    @filter.setter
-    def filter(self, value):
-        self._effect_set('EFFECT_LSB', 'DYNAMIC_FILTER', value)
-
-    @filter.deleter
-    def filter(self):
-        return self._reset_value('DYNAMIC_FILTER')
-
-    # Compressor
-    @property
-    def compressor(self):
-        """True if the effect is on.
-
-        Returns:
-            [bool]: Effect is either on or off
-        """
-        return self._effect_get('EFFECT_LSB', 'COMPRESSOR')
-
-    @compressor.setter
-    def compressor(self, value):
-        self._effect_set('EFFECT_LSB', 'COMPRESSOR', value)
+    def verify_checksum(self):
+        """ True if the CHECKSUM byte matches the address and data bytes """
+        checksum = self._gp8['CHECKSUM']['position']
+        return self._record[checksum] == roland_checksum(self._record[_gp8.CHECKSUM_START:_gp8.CHECKSUM_END])
 
-    @compressor.deleter
-    def compressor(self):
-        return self._reset_value('COMPRESSOR')
+    def fix_checksum(self):
+        """ Recompute the CHECKSUM byte from scratch, ie. for a record edited by hand """
+        checksum = self._gp8['CHECKSUM']['position']
+        self._record[checksum] = roland_checksum(self._record[_gp8.CHECKSUM_START:_gp8.CHECKSUM_END])
 
-    # Overdrive
-    @property
-    def overdrive(self):
-        """True if the effect is on.
-
-        Returns:
-            [bool]: Effect is either on or off
-        """
-        return self._effect_get('EFFECT_LSB', 'OVERDRIVE')
+    def set_many(self, values=None, **kwargs):
+        """ Set several properties at once, all or nothing.
 
-    @overdrive.setter
-    def overdrive(self, value):
-        self._effect_set('EFFECT_LSB', 'OVERDRIVE', value)
+            Every value is validated (against the tables compiled into
+            self._fields) before a single byte is written, so a bad one leaves
+            the record untouched. The checksum is then adjusted once for all of
+            them, ie. patch.set_many(od_drive=80, od_turbo=True, chorus=False)
 
-    @overdrive.deleter
-    def overdrive(self):
-        return self._reset_value('OVERDRIVE')
-
-    # Distortion
-    @property
-    def distortion(self):
-        """True if the effect is on.
+        Args:
+            values ([dict]): Property name -> value, merged with kwargs.
 
-        Returns:
-            [bool]: Effect is either on or off
+        Raises:
+            ValueError: An unknown property, or a value out of range.
         """
-        return self._effect_get('EFFECT_LSB', 'DISTORTION')
-
-    @distortion.setter
-    def distortion(self, value):
-        self._effect_set('EFFECT_LSB', 'DISTORTION', value)
-
-    @distortion.deleter
-    def distortion(self):
-        return self._reset_value('DISTORTION')
-
-    # Phaser
-    @property
-    def phaser(self):
-        """True if the effect is on.
-
-        Returns:
-            [bool]: Effect is either on or off
+        values = dict(values or {}, **kwargs)
+        record = self._record
+        writes = {}
+        for name, value in values.items():
+            field = self._fields.get(name)
+            if field is None:
+                raise ValueError(' '.join(['No such field:', repr(name)]))
+            if isinstance(field, _schema.EffectSwitch):
+                byte = writes[field.position][0] if field.position in writes else record[field.position]
+                writes[field.position] = bytes([field.switch(byte, value)])
+            else:
+                writes[field.position] = field.encode(value)
+        before = sum(record[_gp8.CHECKSUM_START:_gp8.CHECKSUM_END])
+        for position, value in writes.items():
+            record[position:position + len(value)] = value
+        checksum = self._gp8['CHECKSUM']['position']
+        record[checksum] = (record[checksum] + before - sum(record[_gp8.CHECKSUM_START:_gp8.CHECKSUM_END])) & 0x7F
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """ Undo every change made to the patch in the with block if it raises.
+
+            with patch.transaction():
+                patch.name = 'Lead'
+                patch.od_drive = 120  # ValueError, the name is back as well
         """
-        return self._effect_get('EFFECT_MSB', 'PHASER')
-
-    @phaser.setter
-    def phaser(self, value):
-        self._effect_set('EFFECT_MSB', 'PHASER', value)
-
-    @phaser.deleter
-    def phaser(self):
-        return self._reset_value('PHASER')
+        snapshot = bytes(self._record)
+        try:
+            yield self
+        except BaseException:
+            self._record[:] = snapshot
+            raise
 
-    # Equalizer
-    @property
-    def equalizer(self):
-        """True if the effect is on.
-
-        Returns:
-            [bool]: Effect is either on or off
+    def csv_hex(self):
+        """ Return the current patch as a hex string that can easily be used with 
+            the send_midi utility provided by the mididings package.
         """
-        return self._effect_get('EFFECT_MSB', 'EQUALIZER')
+        csv = []
+        for byte in self._record:
+            csv.append(byte.to_bytes(1, 'big').hex())
+        return ','.join(csv)
 
-    @equalizer.setter
-    def equalizer(self, value):
-        self._effect_set('EFFECT_MSB', 'EQUALIZER', value)
+    def to_dict(self):
+        """ Every value of the patch as plain data (ie. for JSON or YAML).
 
-    @equalizer.deleter
-    def equalizer(self):
-        return self._reset_value('EQUALIZER')
+            Keys are the property names (see self._fields) plus device_id,
+            the address as 'MSB LSB' hex and delay_time as its two raw bytes.
+            The name is given without its trailing padding, and a bool stored
+            as anything but 00h/64h (as some dumps have) as its raw int. A bad
+            checksum and a name terminator other than 00h are kept as the
+            checksum and name_term ints, only present when they are.
 
-    # Delay
-    @property
-    def delay(self):
-        """True if the effect is on.
+            Anything the properties can't hold goes under 'raw', present only
+            when needed: an int parameter out of its range (ie. od_drive 120)
+            as its raw int in place of the property, and the bits of the two
+            effects bytes that are no effect switch as 'effects' [MSB, LSB].
 
         Returns:
-            [bool]: Effect is either on or off
+            [dict]: Values from_dict() turns back into the same record.
         """
-        return self._effect_get('EFFECT_MSB', 'DELAY')
-
-    @delay.setter
-    def delay(self, value):
-        self._effect_set('EFFECT_MSB', 'DELAY', value)
-
-    @delay.deleter
-    def delay(self):
-        return self._reset_value('DELAY')
-
-    # Chorus
-    @property
-    def chorus(self):
-        """True if the effect is on.
-
-        Returns:
-            [bool]: Effect is either on or off
+        values = {
+            'device_id': self._record[_gp8.data['DEVICE_ID']['position']],
+            'address': bytes(self._record[_gp8.CHECKSUM_START:_gp8.DATA_START]).hex(' ').upper(),
+        }
+        raw = {}
+        for name, field in self._fields.items():
+            if type(field) is _schema.Field and not field.legal[self._record[field.position]]:
+                raw[name] = self._record[field.position]
+                continue
+            values[name] = getattr(self, name)
+            if isinstance(field, _schema.BoolField) and self._record[field.position] not in (0, 100):
+                values[name] = self._record[field.position]
+        values['name'] = values['name'].rstrip(' ')
+        delay_time = self._gp8['DELAY_TIME']
+        values['delay_time'] = list(self._record[delay_time['position']:delay_time['position'] + delay_time['length']])
+        name_term = self._record[self._gp8['NAME_TERM']['position']]
+        if name_term:
+            values['name_term'] = name_term
+        effects = [self._record[_EFFECT_MSB] & _UNSWITCHED[0], self._record[_EFFECT_LSB] & _UNSWITCHED[1]]
+        if any(effects):
+            raw['effects'] = effects
+        if raw:
+            values['raw'] = raw
+        if not self.verify_checksum():
+            values['checksum'] = self._record[self._gp8['CHECKSUM']['position']]
+        return values
+
+    @classmethod
+    def from_dict(cls, values):
+        """ Build a patch from to_dict() values. Missing values keep their defaults.
+
+            An int for a bool (rather than True/False) is its raw stored byte,
+            so 64h is on and anything else reads as off. Values under 'raw'
+            (see to_dict()) are stored as they are, as long as they are 7 bit.
+            The checksum is worked out, unless a (bad) one is given as checksum.
+
+        Raises:
+            ValueError: An unknown key, or a value out of range.
         """
-        return self._effect_get('EFFECT_MSB', 'CHORUS')
-
-    @chorus.setter
-    def chorus(self, value):
-        self._effect_set('EFFECT_MSB', 'CHORUS', value)
-
-    @chorus.deleter
-    def chorus(self):
-        return self._reset_value('CHORUS')
+        patch = cls()
+        record = patch._record
+        checksum = None
+        for name, value in values.items():
+            if name in ('checksum', 'name_term'):
+                if value.__class__ is not int or not 0 <= value < 0x80:
+                    raise ValueError(' '.join([name, 'out of range:', repr(value)]))
+                if name == 'checksum':
+                    checksum = value
+                else:
+                    record[patch._gp8['NAME_TERM']['position']] = value
+            elif name == 'raw':
+                patch._write_raw(value)
+            elif name == 'device_id':
+                if value not in _gp8.data['DEVICE_ID']['range']:
+                    raise ValueError(' '.join(['device_id out of range:', repr(value)]))
+                record[_gp8.data['DEVICE_ID']['position']] = value
+            elif name == 'address':
+                address = bytes.fromhex(value)
+                if len(address) != 2 or max(address) > 0x7F:
+                    raise ValueError(' '.join(['Bad address:', repr(value)]))
+                record[_gp8.CHECKSUM_START:_gp8.DATA_START] = address
+            elif name == 'delay_time':
+                position = patch._gp8['DELAY_TIME']['position']
+                if len(value) != 2 or not all(0 <= byte < 0x80 for byte in value):
+                    raise ValueError(' '.join(['delay_time out of range:', repr(value)]))
+                record[position:position + 2] = bytes(value)
+            elif isinstance(cls._fields.get(name), _schema.BoolField) and value.__class__ is int:
+                if not 0 <= value < 0x80:
+                    raise ValueError(' '.join([name, 'out of range:', repr(value)]))
+                record[cls._fields[name].position] = value
+            elif name in cls._fields:
+                setattr(patch, name, value)
+            else:
+                raise ValueError(' '.join(['No such field:', repr(name)]))
+        patch.fix_checksum()
+        if checksum is not None:
+            record[patch._gp8['CHECKSUM']['position']] = checksum
+        return patch
+
+    def _write_raw(self, raw):
+        """ Store the 'raw' values of to_dict(), see there """
+        record = self._record
+        for name, value in raw.items():
+            if name == 'effects':
+                if len(value) != 2 or any(byte.__class__ is not int or byte & ~unswitched
+                                          for byte, unswitched in zip(value, _UNSWITCHED)):
+                    raise ValueError(' '.join(['Raw effects out of range:', repr(value)]))
+                for position, byte, unswitched in zip((_EFFECT_MSB, _EFFECT_LSB), value, _UNSWITCHED):
+                    record[position] = record[position] & ~unswitched | byte
+            elif type(self._fields.get(name)) is _schema.Field:
+                if value.__class__ is not int or not 0 <= value < 0x80:
+                    raise ValueError(' '.join(['Raw', name, 'out of range:', repr(value)]))
+                record[self._fields[name].position] = value
+            else:
+                raise ValueError(' '.join(['No such raw field:', repr(name)]))
 
     # For convenience
     @property
@@ -296,423 +359,58 @@ class RolandGp8():
         Returns:
             [dict]: A dictionary with effect names as keys, and bool values for each.
         """
-        return {
-            'Phaser': self.phaser,
-            'Equalizer': self.equalizer,
-            'Delay': self.delay,
-            'Chorus': self.chorus,
-            'Dynamic Filter': self.filter,
-            'Compressor': self.compressor,
-            'Overdrive': self.overdrive,
-            'Distortion': self.distortion,
-        }
-
-    #
-    # Effect Properties
-    #
-    # FILTER_SENS
-
-    @property
-    def filter_sens(self):
-        return self._read_value('FILTER_SENS')
-
-    @filter_sens.setter
-    def filter_sens(self, value):
-        return self._write_value('FILTER_SENS', value)
-
-    @filter_sens.deleter
-    def filter_sens(self):
-        self._reset_value('FILTER_SENS')
-
-    # FILTER_CUTOFF_FREQ
-    @property
-    def filter_cutoff_freq(self):
-        return self._read_value('FILTER_CUTOFF_FREQ')
-
-    @filter_cutoff_freq.setter
-    def filter_cutoff_freq(self, value):
-        return self._write_value('FILTER_CUTOFF_FREQ', value)
-
-    @filter_cutoff_freq.deleter
-    def filter_cutoff_freq(self):
-        self._reset_value('FILTER_CUTOFF_FREQ')
-
-    # FILTER_Q
-    @property
-    def filter_q(self):
-        return self._read_value('FILTER_Q')
+        record = self._record
+        return dict(_EFFECTS_MSB[record[_EFFECT_MSB] & 0x0F] + _EFFECTS_LSB[record[_EFFECT_LSB] & 0x0F])
 
-    @filter_q.setter
-    def filter_q(self, value):
-        return self._write_value('FILTER_Q', value)
-
-    @filter_q.deleter
-    def filter_q(self):
-        self._reset_value('FILTER_Q')
-
-    # FILTER_UP_DOWN
-    @property
-    def filter_up_down(self):
-        return self._read_value('FILTER_UP_DOWN')
-
-    @filter_up_down.setter
-    def filter_up_down(self, value):
-        return self._write_value('FILTER_UP_DOWN', value)
-
-    @filter_up_down.deleter
-    def filter_up_down(self):
-        self._reset_value('FILTER_UP_DOWN')
-
-    # COMP_ATTACK
-    @property
-    def comp_attack(self):
-        return self._read_value('COMP_ATTACK')
-
-    @comp_attack.setter
-    def comp_attack(self, value):
-        return self._write_value('COMP_ATTACK', value)
-
-    @comp_attack.deleter
-    def comp_attack(self):
-        self._reset_value('COMP_ATTACK')
-
-    # COMP_SUSTAIN
-    @property
-    def comp_sustain(self):
-        return self._read_value('COMP_SUSTAIN')
-
-    @comp_sustain.setter
-    def comp_sustain(self, value):
-        return self._write_value('COMP_SUSTAIN', value)
-
-    @comp_sustain.deleter
-    def comp_sustain(self):
-        self._reset_value('COMP_SUSTAIN')
-
-    # OD_TONE
-    @property
-    def od_tone(self):
-        return self._read_value('OD_TONE')
-
-    @od_tone.setter
-    def od_tone(self, value):
-        return self._write_value('OD_TONE', value)
-
-    @od_tone.deleter
-    def od_tone(self):
-        self._reset_value('OD_TONE')
-
-    # OD_DRIVE
-    @property
-    def od_drive(self):
-        return self._read_value('OD_DRIVE')
-
-    @od_drive.setter
-    def od_drive(self, value):
-        return self._write_value('OD_DRIVE', value)
-
-    @od_drive.deleter
-    def od_drive(self):
-        self._reset_value('OD_DRIVE')
-
-    # OD_TURBO
-    @property
-    def od_turbo(self):
-        return self._read_value('OD_TURBO')
-
-    @od_turbo.setter
-    def od_turbo(self, value):
-        return self._write_value('OD_TURBO', value)
-
-    @od_turbo.deleter
-    def od_turbo(self):
-        self._reset_value('OD_TURBO')
-
-    # DIST_TONE
-    @property
-    def dist_tone(self):
-        return self._read_value('DIST_TONE')
-
-    @dist_tone.setter
-    def dist_tone(self, value):
-        return self._write_value('DIST_TONE', value)
-
-    @dist_tone.deleter
-    def dist_tone(self):
-        self._reset_value('DIST_TONE')
-
-    # DIST_DIST
-    @property
-    def dist_dist(self):
-        return self._read_value('DIST_DIST')
-
-    @dist_dist.setter
-    def dist_dist(self, value):
-        return self._write_value('DIST_DIST', value)
-
-    @dist_dist.deleter
-    def dist_dist(self):
-        self._reset_value('DIST_DIST')
-
-    # PHASER_RATE
-    @property
-    def phaser_rate(self):
-        return self._read_value('PHASER_RATE')
-
-    @phaser_rate.setter
-    def phaser_rate(self, value):
-        return self._write_value('PHASER_RATE', value)
-
-    @phaser_rate.deleter
-    def phaser_rate(self):
-        self._reset_value('PHASER_RATE')
-
-    # PHASER_DEPTH
-    @property
-    def phaser_depth(self):
-        return self._read_value('PHASER_DEPTH')
-
-    @phaser_depth.setter
-    def phaser_depth(self, value):
-        return self._write_value('PHASER_DEPTH', value)
-
-    @phaser_depth.deleter
-    def phaser_depth(self):
-        self._reset_value('PHASER_DEPTH')
-
-    # PHASER_RESONANCE
-    @property
-    def phaser_resonance(self):
-        return self._read_value('PHASER_RESONANCE')
-
-    @phaser_resonance.setter
-    def phaser_resonance(self, value):
-        return self._write_value('PHASER_RESONANCE', value)
-
-    @phaser_resonance.deleter
-    def phaser_resonance(self):
-        self._reset_value('PHASER_RESONANCE')
-
-    # EQ_HI
-    @property
-    def eq_hi(self):
-        return self._read_value('EQ_HI')
-
-    @eq_hi.setter
-    def eq_hi(self, value):
-        return self._write_value('EQ_HI', value)
-
-    @eq_hi.deleter
-    def eq_hi(self):
-        self._reset_value('EQ_HI')
-
-    # EQ_MID
-    @property
-    def eq_mid(self):
-        return self._read_value('EQ_MID')
-
-    @eq_mid.setter
-    def eq_mid(self, value):
-        return self._write_value('EQ_MID', value)
-
-    @eq_mid.deleter
-    def eq_mid(self):
-        self._reset_value('EQ_MID')
-
-    # EQ_LO
-    @property
-    def eq_lo(self):
-        return self._read_value('EQ_LO')
-
-    @eq_lo.setter
-    def eq_lo(self, value):
-        return self._write_value('EQ_LO', value)
-
-    @eq_lo.deleter
-    def eq_lo(self):
-        self._reset_value('EQ_LO')
-
-    # EQ_GAIN
-    @property
-    def eq_gain(self):
-        return self._read_value('EQ_GAIN')
-
-    @eq_gain.setter
-    def eq_gain(self, value):
-        return self._write_value('EQ_GAIN', value)
-
-    @eq_gain.deleter
-    def eq_gain(self):
-        self._reset_value('EQ_GAIN')
-
-    # DELAY_LEVEL
-    @property
-    def delay_level(self):
-        return self._read_value('DELAY_LEVEL')
-
-    @delay_level.setter
-    def delay_level(self, value):
-        return self._write_value('DELAY_LEVEL', value)
-
-    @delay_level.deleter
-    def delay_level(self):
-        self._reset_value('DELAY_LEVEL')
-
-    # DELAY_FEEDBACK
+    # Address: group, bank and program, see addresses.py
     @property
-    def delay_feedback(self):
-        return self._read_value('DELAY_FEEDBACK')
-
-    @delay_feedback.setter
-    def delay_feedback(self, value):
-        return self._write_value('DELAY_FEEDBACK', value)
-
-    @delay_feedback.deleter
-    def delay_feedback(self):
-        self._reset_value('DELAY_FEEDBACK')
-
-    # CHORUS_RATE
-    @property
-    def chorus_rate(self):
-        return self._read_value('CHORUS_RATE')
-
-    @chorus_rate.setter
-    def chorus_rate(self, value):
-        return self._write_value('CHORUS_RATE', value)
+    def location(self):
+        """ (group, bank, program) of the record's address, ('A', 0, 0) for the temp area """
+        record = self._record
+        return (addresses.GROUP_OF[record[_ADDRESS_LSB]], addresses.BANK_OF[record[_ADDRESS_MSB]],
+                addresses.PROGRAM_OF[record[_ADDRESS_MSB]])
 
-    @chorus_rate.deleter
-    def chorus_rate(self):
-        self._reset_value('CHORUS_RATE')
+    @location.setter
+    def location(self, value):
+        address = addresses.ADDRESSES.get(tuple(value))
+        if address is None:
+            raise ValueError(' '.join(['No such program memory:', repr(value)]))
+        record = self._record
+        msb, lsb = address
+        record[_CHECKSUM] = (record[_CHECKSUM] + record[_ADDRESS_MSB] + record[_ADDRESS_LSB] - msb - lsb) & 0x7F
+        record[_ADDRESS_MSB] = msb
+        record[_ADDRESS_LSB] = lsb
 
-    # CHORUS_DEPTH
-    @property
-    def chorus_depth(self):
-        return self._read_value('CHORUS_DEPTH')
-
-    @chorus_depth.setter
-    def chorus_depth(self, value):
-        return self._write_value('CHORUS_DEPTH', value)
-
-    @chorus_depth.deleter
-    def chorus_depth(self):
-        self._reset_value('CHORUS_DEPTH')
-
-    # CHORUS_LEVEL
-    @property
-    def chorus_level(self):
-        return self._read_value('CHORUS_LEVEL')
-
-    @chorus_level.setter
-    def chorus_level(self, value):
-        return self._write_value('CHORUS_LEVEL', value)
-
-    @chorus_level.deleter
-    def chorus_level(self):
-        self._reset_value('CHORUS_LEVEL')
-
-    # CHORUS_PRE_DELAY
-    @property
-    def chorus_pre_delay(self):
-        return self._read_value('CHORUS_PRE_DELAY')
-
-    @chorus_pre_delay.setter
-    def chorus_pre_delay(self, value):
-        return self._write_value('CHORUS_PRE_DELAY', value)
-
-    @chorus_pre_delay.deleter
-    def chorus_pre_delay(self):
-        self._reset_value('CHORUS_PRE_DELAY')
-
-    # CHORUS_FEEDBACK
-    @property
-    def chorus_feedback(self):
-        return self._read_value('CHORUS_FEEDBACK')
-
-    @chorus_feedback.setter
-    def chorus_feedback(self, value):
-        return self._write_value('CHORUS_FEEDBACK', value)
-
-    @chorus_feedback.deleter
-    def chorus_feedback(self):
-        self._reset_value('CHORUS_FEEDBACK')
-
-    # EV_5_PARAM
-    @property
-    def ev5_param(self):
-        return self._read_value('EV5_PARAM')
-
-    @ev5_param.setter
-    def ev5_param(self, value):
-        return self._write_value('EV5_PARAM', value)
-
-    @ev5_param.deleter
-    def ev5_param(self):
-        self._reset_value('EV5_PARAM')
-
-    # EXT_CONTROL_1
-    @property
-    def ext_control_1(self):
-        return self._read_value('EXT_CONTROL_1')
-
-    @ext_control_1.setter
-    def ext_control_1(self, value):
-        return self._write_value('EXT_CONTROL_1', value)
-
-    @ext_control_1.deleter
-    def ext_control_1(self):
-        self._reset_value('EXT_CONTROL_1')
-
-    # EXT_CONTROL_2
-    @property
-    def ext_control_2(self):
-        return self._read_value('EXT_CONTROL_2')
-
-    @ext_control_2.setter
-    def ext_control_2(self, value):
-        return self._write_value('EXT_CONTROL_2', value)
-
-    @ext_control_2.deleter
-    def ext_control_2(self):
-        self._reset_value('EXT_CONTROL_2')
-
-    # GROUP
     @property
     def group(self):
-        if self._read_value('GROUP') == 64:
-            return 'B'
-        else:
-            return 'A'
+        return addresses.GROUP_OF[self._record[_ADDRESS_LSB]]
 
     @group.setter
     def group(self, value):
-        if value == 'A':
-            group = 0
-        elif value == 'B':
-            group = 64
-        else:
-            raise ValueError
-        return self._write_value('GROUP', [group])
+        """ Moving a record out of the temp area puts it in bank 1, program 1 """
+        self.location = (value, self.bank or 1, self.program or 1)
 
     @property
     def bank(self):
-        if self._read_value('BANK') == 0:
-            return 0
-        return int((self._read_value('BANK') - 64) / 8) + 1
+        return addresses.BANK_OF[self._record[_ADDRESS_MSB]]
 
     @bank.setter
     def bank(self, value):
-        value = ((value - 1) * 7) + self.program + 64
-        return self._write_value('BANK', value)
+        self.location = (self.group, value, self.program or 1)
 
     @property
     def program(self):
-        if self._read_value('PROGRAM') == 0:
-            return 0
-        return int((self._read_value('PROGRAM') - 64) % 8) + 1
+        return addresses.PROGRAM_OF[self._record[_ADDRESS_MSB]]
 
     @program.setter
     def program(self, value):
-        value = self.bank + value
-        return self._write_value('PROGRAM', value)
+        self.location = (self.group, self.bank or 1, value)
+
 
+'''Effect switch property (ie. chorus, filter) -> its bit of a packed effects byte, see EFFECT_BITS'''
+EFFECT_SWITCHES = {name: EFFECT_BITS[field.key] for name, field in RolandGp8._fields.items()
+                   if isinstance(field, _schema.EffectSwitch)}
 
+'''Parameter properties: name -> Field of every int and bool field, in record order'''
+PARAMETERS = {name: field for name, field in RolandGp8._fields.items()
+              if type(field) in (_schema.Field, _schema.BoolField)}
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+''' Program memory addresses: group A/B, bank 1-8, program 1-8.
+
+Program P of bank K in group G lives at MSB 40h + (K - 1) * 8 + (P - 1), LSB
+00h for group A or 40h for group B, the temp area at 00 00 (see GP-8 Notes.md).
+Dumps, and the emulator, keep the 128 programs in address order, so a slot
+(the index of a program in a full dump) counts A-1-1, B-1-1, A-1-2, B-1-2, ...
+
+All of it is worked out once, here: ADDRESSES and LOCATIONS map each way,
+the *_OF tables decode a location from a single address byte and the SLOT_*
+tables encode whole columns of slots with bytes.translate().
+'''
+
+GROUPS = ('A', 'B')
+BANKS = range(1, 9)
+PROGRAMS = range(1, 9)
+
+'''Program memories, the temp area is slot TEMP'''
+SLOTS = 128
+TEMP = SLOTS
+
+'''Slot of an address that is neither a program memory nor the temp area'''
+INVALID = 0xFF
+
+'''(group, bank, program) of the temp area'''
+TEMP_LOCATION = ('A', 0, 0)
+TEMP_ADDRESS = (0x00, 0x00)
+
+'''(group, bank, program) -> (MSB, LSB) of every program memory and the temp area'''
+ADDRESSES = {(group, bank, program): (0x40 + (bank - 1) * 8 + program - 1, 0x40 * GROUPS.index(group))
+             for bank in BANKS for program in PROGRAMS for group in GROUPS}
+ADDRESSES[TEMP_LOCATION] = TEMP_ADDRESS
+
+'''(MSB, LSB) -> (group, bank, program)'''
+LOCATIONS = {address: location for location, address in ADDRESSES.items()}
+
+'''(MSB, LSB) of every slot, in dump order, then of the temp area'''
+SLOT_ADDRESSES = sorted(address for address in LOCATIONS if address != TEMP_ADDRESS) + [TEMP_ADDRESS]
+
+'''(MSB, LSB) -> slot'''
+SLOT_OF = {address: slot for slot, address in enumerate(SLOT_ADDRESSES)}
+
+'''Translate tables, slot -> its MSB and its LSB (slots past TEMP map to 00h)'''
+SLOT_MSB = bytes(msb for msb, lsb in SLOT_ADDRESSES).ljust(256, b'\x00')
+SLOT_LSB = bytes(lsb for msb, lsb in SLOT_ADDRESSES).ljust(256, b'\x00')
+
+'''Group of an LSB, bank and program of an MSB, by byte value. 0 for the temp area
+(or anything that isn't a program memory).'''
+GROUP_OF = tuple('B' if lsb == 0x40 else 'A' for lsb in range(256))
+BANK_OF = tuple((msb - 0x40) // 8 + 1 if 0x40 <= msb < 0x80 else 0 for msb in range(256))
+PROGRAM_OF = tuple((msb - 0x40) % 8 + 1 if 0x40 <= msb < 0x80 else 0 for msb in range(256))
+
+'''Half of the slot of an address from each byte, OR'd together by slots().
+Anything out of place sets every bit, and the result is then clamped to INVALID.'''
+_SLOT_HIGH = bytes((msb - 0x40) * 2 if 0x40 <= msb < 0x80 else TEMP if msb == 0 else INVALID
+                   for msb in range(256))
+_SLOT_LOW = bytes(0 if lsb == 0 else 1 if lsb == 0x40 else INVALID for lsb in range(256))
+_CLAMP = bytes(value if value <= TEMP else INVALID for value in range(256))
+
+
+def slots(msb, lsb):
+    """ Slot of every record from its MSB and LSB columns, in one pass.
+
+    Returns:
+        [bytes]: One slot per record, TEMP for the temp area and INVALID for
+                 an address that is neither.
+    """
+    high = int.from_bytes(msb.translate(_SLOT_HIGH), 'little')
+    low = int.from_bytes(lsb.translate(_SLOT_LOW), 'little')
+    return (high | low).to_bytes(len(msb), 'little').translate(_CLAMP)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+''' Bulk arithmetic on byte columns, without numpy.
+
+A column is a bytes object holding one byte per record (ie. PatchBank.column()).
+Per record sums are done "SIMD within a register": every byte is spread into
+its own 16 bit lane of one big Python int, so adding two columns is a single
+big int addition carried out in C, and no lane can overflow into the next as
+long as fewer than 257 columns are summed.
+'''
+
+LANE = 2
+
+'''Translate table mapping every non zero byte to 1'''
+_FLAGS = bytes([0] + [1] * 255)
+
+
+def widen(column, lane=LANE):
+    """ One big int with each byte of column in its own lane of lane bytes """
+    lanes = bytearray(len(column) * lane)
+    lanes[0::lane] = column
+    return int.from_bytes(lanes, 'little')
+
+
+def widen16(low, high, lane=4):
+    """ One big int with the 16 bit value low + 256 * high of each record in its own lane """
+    lanes = bytearray(len(low) * lane)
+    lanes[0::lane] = low
+    lanes[1::lane] = high
+    return int.from_bytes(lanes, 'little')
+
+
+def narrow(total, count):
+    """ Low byte of each of the count lanes of total, as a column """
+    return total.to_bytes(count * LANE, 'little')[0::LANE]
+
+
+def lane_sum(columns, count):
+    """ Per record sum (mod 256) of any number of columns of count bytes """
+    total = 0
+    for column in columns:
+        total += widen(column)
+    return narrow(total, count)
+
+
+def table(function):
+    """ 256 entry translate table, function applied to every byte value """
+    return bytes([function(value) & 0xFF for value in range(256)])
+
+
+def nonzero(column):
+    """ Indexes of every non zero byte in column """
+    flags = column.translate(_FLAGS)
+    indexes = []
+    position = flags.find(1)
+    while position >= 0:
+        indexes.append(position)
+        position = flags.find(1, position + 1)
+    return indexes
+
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+''' Batch conversion of sysex archives to JSON or YAML, and back.
+
+Every .syx file under the source directory becomes a .json (or .yaml) file at
+the same relative path under the destination, holding a list of
+RolandGp8.to_dict() patches. Going the other way, every .json, .yaml and .yml
+file becomes a .syx dump.
+
+Files are converted by a process pool. Workers are only sent file names,
+batched so that each batch holds about CHUNK_BYTES of input, and they read
+and write the files themselves, so next to nothing but names and counts
+crosses between processes. A file that can't be converted (ie. a corrupt
+JSON file) is reported and skipped, the rest of the tree is still converted.
+
+Usage: python3 convert.py source destination [--format json|yaml] [--workers N]
+'''
+
+import argparse
+import concurrent.futures
+import json
+import os
+import sys
+
+import yaml
+
+import sysex
+from RolandGp8 import RolandGp8
+
+'''Input bytes per batch of files handed to a worker'''
+CHUNK_BYTES = 4 << 20
+
+FORMATS = {
+    'json': '.json',
+    'yaml': '.yaml',
+}
+TEXT_EXTENSIONS = ('.json', '.yaml', '.yml')
+
+_YamlDumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+_YamlLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def dumps(patches, format='json'):
+    """ Patches as JSON or YAML text """
+    values = [patch.to_dict() for patch in patches]
+    if format == 'json':
+        return json.dumps(values, indent=1) + '\n'
+    if format == 'yaml':
+        return yaml.dump(values, Dumper=_YamlDumper, sort_keys=False)
+    raise ValueError(' '.join(['Unknown format:', repr(format)]))
+
+
+def loads(text, format='json'):
+    """ Patches from JSON or YAML text, as a list of RolandGp8 """
+    if format == 'json':
+        values = json.loads(text)
+    elif format == 'yaml':
+        values = yaml.load(text, Loader=_YamlLoader)
+    else:
+        raise ValueError(' '.join(['Unknown format:', repr(format)]))
+    return [RolandGp8.from_dict(patch) for patch in values or []]
+
+
+def format_of(filename):
+    """ 'json' or 'yaml', from the extension of a text file """
+    return 'json' if filename.lower().endswith('.json') else 'yaml'
+
+
+def convert_file(source, destination, format='json'):
+    """ Convert one .syx file to format, or one JSON/YAML file to .syx.
+
+    Returns:
+        [int]: Number of patches converted.
+    """
+    if source.lower().endswith('.syx'):
+        with open(source, 'rb') as file:
+            patches = [RolandGp8(frame) for frame in sysex.read_frames(file) if sysex.is_program(frame)]
+        output = dumps(patches, format).encode()
+    else:
+        with open(source, 'rb') as file:
+            patches = loads(file.read(), format_of(source))
+        output = b''.join(bytes(patch._record) for patch in patches)
+    os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+    with open(destination, 'wb') as file:
+        file.write(output)
+    return len(patches)
+
+
+def _convert_batch(jobs, format):
+    """ Worker: convert every (source, destination) pair of a batch.
+
+    Returns:
+        [tuple]: (patches, failed): patches converted, (source, error message)
+                 of every file that couldn't be.
+    """
+    count = 0
+    failed = []
+    for source, destination in jobs:
+        try:
+            count += convert_file(source, destination, format)
+        except Exception as error:
+            failed.append((source, ' '.join([type(error).__name__ + ':', str(error)])))
+    return count, failed
+
+
+def jobs(source, destination, format='json'):
+    """ (source, destination, size) of every file to convert under source.
+
+        .syx files are converted to format, JSON and YAML files to .syx.
+    """
+    found = []
+    for directory, subdirectories, files in os.walk(source):
+        subdirectories.sort()
+        for filename in sorted(files):
+            base, extension = os.path.splitext(filename)
+            if extension.lower() == '.syx':
+                target = base + FORMATS[format]
+            elif extension.lower() in TEXT_EXTENSIONS:
+                target = base + '.syx'
+            else:
+                continue
+            path = os.path.join(directory, filename)
+            found.append((path, os.path.join(destination, os.path.relpath(directory, source), target),
+                          os.path.getsize(path)))
+    return found
+
+
+def batches(found, chunk_bytes=CHUNK_BYTES):
+    """ Group jobs into lists of (source, destination) of about chunk_bytes of input each """
+    batch = []
+    size = 0
+    for source, destination, length in found:
+        batch.append((source, destination))
+        size += length
+        if size >= chunk_bytes:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+
+def convert_tree(source, destination, format='json', workers=None, chunk_bytes=CHUNK_BYTES):
+    """ Convert a whole directory tree, see the module documentation.
+
+    Args:
+        source ([str]): Directory to read.
+        destination ([str]): Directory to write, created as needed.
+        format ([str]): 'json' or 'yaml', for .syx files.
+        workers ([int]): Processes, default one per CPU. 1 converts in this process.
+        chunk_bytes ([int]): Input bytes per batch.
+
+    Returns:
+        [tuple]: (files, patches, failed): files and patches converted, and
+                 (source, error message) of every file that failed.
+    """
+    if format not in FORMATS:
+        raise ValueError(' '.join(['Unknown format:', repr(format)]))
+    found = jobs(source, destination, format)
+    if workers == 1:
+        results = [_convert_batch(batch, format) for batch in batches(found, chunk_bytes)]
+    else:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = [(batch, pool.submit(_convert_batch, batch, format)) for batch in batches(found, chunk_bytes)]
+            results = []
+            for batch, future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as error:
+                    # The worker itself went down, every file of its batch failed
+                    message = ' '.join([type(error).__name__ + ':', str(error)])
+                    results.append((0, [(path, message) for path, target in batch]))
+    failed = [failure for count, failures in results for failure in failures]
+    return len(found) - len(failed), sum(count for count, failures in results), failed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source')
+    parser.add_argument('destination')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='json', help='format .syx files become')
+    parser.add_argument('--workers', type=int, help='processes, default one per CPU')
+    options = parser.parse_args()
+    files, patches, failed = convert_tree(options.source, options.destination, options.format, options.workers)
+    for path, message in failed:
+        print('%s: %s' % (path, message), file=sys.stderr)
+    print('Converted %d patches in %d files, %d failed' % (patches, files, len(failed)))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+''' Parameter level sync: send only what changed since the last sync.
+
+Every data byte of a program has its own address, the program address plus its
+offset from the first data byte (see "X-Ref to address mapping of parameters" in
+GP-8 Notes.md), so a changed parameter can be sent as a tiny DT1 message of its
+own. Each message costs 9 bytes on top of its data (F0 41 id 13 12 MSB LSB ..
+sum F7), so changed bytes close together are sent as one message, gap included,
+and when the pieces would cost more than the whole record the record goes
+out instead.
+'''
+
+import devices.gp8 as _gp8
+import sysex
+
+'''Bytes in a DT1 message besides the data'''
+MESSAGE_OVERHEAD = 9
+
+
+def _field_positions():
+    """ Data dictionary key of every data byte position """
+    fields = {}
+    for key, data in _gp8.data.items():
+        if _gp8.DATA_START <= data['position'] < _gp8.CHECKSUM_END:
+            for position in range(data['position'], data['position'] + data['length']):
+                fields[position] = key
+    return fields
+
+
+FIELD_AT = _field_positions()
+
+
+class DeltaTracker():
+    """ Tracks the changes made to a RolandGp8 since it was last synced.
+
+        Usage:
+            tracker = DeltaTracker(patch)    # patch is what the unit has now
+            patch.od_drive = 80
+            for message in tracker.messages():
+                uploader.submit(message, LIVE)
+            tracker.mark_synced()
+    """
+
+    def __init__(self, patch, synced=True):
+        """
+        Args:
+            patch ([RolandGp8]): The patch to track.
+            synced ([bool]): False if the unit doesn't have this patch at all yet.
+        """
+        self.patch = patch
+        self._synced = bytes(patch._record) if synced else None
+
+    def mark_synced(self):
+        """ Remember the current state as what the unit has """
+        self._synced = bytes(self.patch._record)
+
+    def changed_positions(self):
+        """ Record positions of the data bytes changed since the last sync """
+        record = self.patch._record
+        if self._synced is None:
+            return list(range(_gp8.DATA_START, _gp8.CHECKSUM_END))
+        return [position for position in range(_gp8.DATA_START, _gp8.CHECKSUM_END)
+                if record[position] != self._synced[position]]
+
+    def changed_fields(self):
+        """ Data dictionary keys of the fields changed since the last sync """
+        fields = []
+        for position in self.changed_positions():
+            if FIELD_AT[position] not in fields:
+                fields.append(FIELD_AT[position])
+        return fields
+
+    def runs(self):
+        """ (first, last) record positions of each message worth sending, changed
+            bytes less than MESSAGE_OVERHEAD apart are merged into one run.
+        """
+        runs = []
+        for position in self.changed_positions():
+            if runs and position - runs[-1][1] - 1 <= MESSAGE_OVERHEAD:
+                runs[-1][1] = position
+            else:
+                runs.append([position, position])
+        return [tuple(run) for run in runs]
+
+    def messages(self):
+        """ The cheapest list of DT1 messages that brings the unit up to date:
+            one per run of changed bytes, or the whole record if that's fewer
+            bytes on the wire. Empty if nothing changed.
+        """
+        record = self.patch._record
+        if self._synced is not None and (record[:_gp8.DATA_START] != self._synced[:_gp8.DATA_START]):
+            # Moved to another address (or device), the whole record has to go
+            return [bytes(record)]
+        runs = self.runs()
+        if sum(last - first + 1 + MESSAGE_OVERHEAD for first, last in runs) >= _gp8.RECORD_LENGTH:
+            return [bytes(record)]
+        msb, lsb = sysex.address_of(record)
+        device_id = record[2]
+        return [sysex.dt1((msb, lsb + first - _gp8.DATA_START), record[first:last + 1], device_id)
+                for first, last in runs]
+
+    async def sync(self, transport):
+        """ Write the changes straight through a Transport and mark the patch synced """
+        for message in self.messages():
+            await transport.write(message)
+        self.mark_synced()
@@ -2,6 +2,16 @@
 
 ''' GP-8 Specific Values Go here. Goal: Mapping the GP-16 should follow the exact same model '''
 
+'''Every program record (one DT1 sysex message) is exactly this many bytes'''
+RECORD_LENGTH = 59
+
+'''The checksum covers record[CHECKSUM_START:CHECKSUM_END], address and data'''
+CHECKSUM_START = 5
+CHECKSUM_END = 57
+
+'''Patch data (everything after the two address bytes) is record[DATA_START:CHECKSUM_END]'''
+DATA_START = 7
+
 '''Effects switches are bitwise in two banks'''
 BANK_1_EFFECTS_MSB = {
     'PHASER': 0x01,
@@ -90,7 +100,7 @@ data = {
         'name': "Program",
         'description': "",
         'default': 0x00,
-        'range': range(64),
+        'range': [0x00] + list(range(0x40, 0x80)),
     },
     
     'BANK': {
@@ -101,7 +111,7 @@ data = {
         'name': "Bank",
         'description': "",
         'default': 0,
-        'range': range(64),
+        'range': [0x00] + list(range(0x40, 0x80)),
     },
     
     'GROUP': {
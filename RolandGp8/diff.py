@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+''' Field level differences between two banks, ie. two dumps or two archives.
+
+The records of both banks are first paired up (aligned) by one of:
+
+    slot    their address (see addresses.py), the k-th record of a slot in one
+            bank with the k-th record of the same slot in the other
+    name    their name, case and surrounding blanks ignored, again k-th with k-th
+    hash    their content (RolandGp8.content_hash(), the address is left out),
+            so only records found in just one of the banks show up
+
+Then the paired frames are gathered into two buffers and XOR'd against each
+other as two big ints, in one go: only the bytes that differ are left non zero,
+so finding them is a handful of C level find() calls, and only those bytes are
+ever decoded. Every differing byte is reported as the field of devices/gp8.py
+it belongs to (an effects byte as the effects switched, and as its raw value
+if bits outside the switches differ too), the address bytes as LOCATION. The
+checksum is left out, it changes with everything else.
+
+Usage: python3 diff.py old.syx new.syx [--by slot|name|hash] [--json]
+'''
+
+import argparse
+import json
+import operator
+
+import addresses
+import columnar
+import devices.gp8 as _gp8
+from PatchBank import PatchBank
+from RolandGp8 import content_hash
+
+ALIGNMENTS = ('slot', 'name', 'hash')
+
+'''Pseudo field reported for the address bytes, as 'A-1-1' ('A-0-0' is temp)'''
+LOCATION = 'LOCATION'
+
+_ADDRESS = (_gp8.data['PROGRAM']['position'], _gp8.data['GROUP']['position'])
+_CHECKSUM = _gp8.data['CHECKSUM']['position']
+_NAME = _gp8.data['NAME']
+_EFFECTS = {
+    _gp8.data['EFFECT_MSB']['position']: _gp8.BANK_1_EFFECTS_MSB,
+    _gp8.data['EFFECT_LSB']['position']: _gp8.BANK_2_EFFECTS_LSB,
+}
+
+'''Bits of each effects byte that are not an effect switch'''
+_UNSWITCHED = {position: 0xFF & ~sum(effects.values()) for position, effects in _EFFECTS.items()}
+
+
+def _field_at():
+    """ Data dictionary key of the field every byte of a record belongs to """
+    keys = [None] * _gp8.RECORD_LENGTH
+    for key, data in _gp8.data.items():
+        for position in range(data['position'], data['position'] + data['length']):
+            keys[position] = keys[position] or key
+    for position in _ADDRESS:
+        keys[position] = LOCATION
+    return keys
+
+
+FIELD_AT = _field_at()
+
+
+'''A bool stored as anything but 00h/64h is reported as its raw int, like RolandGp8.to_dict() does'''
+_BOOLS = tuple(True if value == 100 else False if value == 0 else value for value in range(256))
+
+
+def _decoder(key):
+    """ Function decoding a field from a record, built once per field """
+    if key == LOCATION:
+        msb, lsb = _ADDRESS
+        return lambda record: '%s-%d-%d' % (addresses.GROUP_OF[record[lsb]], addresses.BANK_OF[record[msb]],
+                                             addresses.PROGRAM_OF[record[msb]])
+    for position, effects in _EFFECTS.items():
+        if key in effects:
+            return lambda record, _position=position, _mask=effects[key]: bool(record[_position] & _mask)
+    data = _gp8.data[key]
+    start = data['position']
+    end = start + data['length']
+    if data['type'] == 'string':
+        return lambda record: str(bytes(record[start:end]), 'ascii', 'replace')
+    if data['length'] > 1:
+        return lambda record: list(record[start:end])
+    if data['type'] == 'bool':
+        return lambda record: _BOOLS[record[start]]
+    return operator.itemgetter(start)
+
+
+'''Field key -> decoder, for every field a diff can report'''
+DECODERS = {key: _decoder(key) for key in list(dict.fromkeys(FIELD_AT))
+            + list(_gp8.BANK_1_EFFECTS_MSB) + list(_gp8.BANK_2_EFFECTS_LSB)}
+
+'''(key, decoder) of the field at every byte of a record'''
+_DECODERS_AT = [(key, DECODERS[key]) for key in FIELD_AT]
+
+
+def decode(record, key):
+    """ Value of a field of a record, as reported in a diff.
+
+        Effect switches and bools are True/False (a bool stored as anything but
+        00h/64h as its raw int), strings are str, multi byte numbers a list of
+        their bytes, LOCATION is 'group-bank-program' and everything else an int.
+    """
+    return DECODERS[key](record)
+
+
+def _name(record):
+    return str(bytes(record[_NAME['position']:_NAME['position'] + _NAME['length']]), 'ascii', 'replace')
+
+
+def _keys(bank, by):
+    """ Alignment key of every record of bank """
+    if by == 'slot':
+        return list(bank.slots())
+    if by == 'name':
+        return [name.strip().lower() for name in bank.get('NAME')]
+    if by == 'hash':
+        length = _gp8.RECORD_LENGTH
+        with memoryview(bank._buffer) as buffer:
+            return [content_hash(buffer[start:start + length]) for start in range(0, len(buffer), length)]
+    raise ValueError(' '.join(['Unknown alignment:', repr(by)]))
+
+
+def align(a, b, by='slot'):
+    """ Pair the records of two banks, see the module documentation.
+
+    Returns:
+        [tuple]: (pairs, removed, added): (index in a, index in b) of every pair,
+                 indexes of the records of a without a match in b and the other
+                 way around.
+    """
+    seen = {}
+    matches = {}
+    for index, key in enumerate(_keys(b, by)):
+        occurrence = seen[key] = seen.get(key, -1) + 1
+        matches[key, occurrence] = index
+    seen = {}
+    pairs = []
+    removed = []
+    for index, key in enumerate(_keys(a, by)):
+        occurrence = seen[key] = seen.get(key, -1) + 1
+        match = matches.pop((key, occurrence), None)
+        if match is None:
+            removed.append(index)
+        else:
+            pairs.append((index, match))
+    added = sorted(matches.values())
+    return pairs, removed, added
+
+
+def frames(bank, indexes):
+    """ The frames of the records at indexes, back to back """
+    length = _gp8.RECORD_LENGTH
+    with memoryview(bank._buffer) as buffer:
+        return b''.join([buffer[index * length:(index + 1) * length] for index in indexes])
+
+
+class Change():
+    """ A record found in both banks with different contents """
+
+    def __init__(self, a, b, fields):
+        """
+        Args:
+            a ([int]): Index of the record in the old bank.
+            b ([int]): Index of the record in the new bank.
+            fields ([dict]): Field key -> (old value, new value).
+        """
+        self.a = a
+        self.b = b
+        self.fields = fields
+
+    def __repr__(self):
+        return 'Change(%d, %d, %r)' % (self.a, self.b, self.fields)
+
+
+class Diff():
+    """ Everything that differs between an old bank and a new one.
+
+        changes lists a Change per pair of differing records, removed the
+        indexes of the old records left without a match, added those of the new.
+    """
+
+    def __init__(self, old, new, by='slot'):
+        self.by = by
+        self.old = old
+        self.new = new
+        pairs, self.removed, self.added = align(old, new, by)
+        self.changes = self._compare(pairs)
+        self.unchanged = len(pairs) - len(self.changes)
+
+    def __bool__(self):
+        return bool(self.changes or self.removed or self.added)
+
+    def _compare(self, pairs):
+        """ XOR the frames of every pair at once, decode only the bytes that differ """
+        length = _gp8.RECORD_LENGTH
+        old = frames(self.old, [a for a, b in pairs])
+        new = frames(self.new, [b for a, b in pairs])
+        difference = bytearray((int.from_bytes(old, 'little') ^ int.from_bytes(new, 'little'))
+                               .to_bytes(len(old), 'little'))
+        difference[_CHECKSUM::length] = bytes(len(pairs))
+        changed = {}
+        for position in columnar.nonzero(difference):
+            pair, offset = divmod(position, length)
+            changed.setdefault(pair, []).append(offset)
+        changes = []
+        for pair, offsets in changed.items():
+            start = pair * length
+            before = old[start:start + length]
+            after = new[start:start + length]
+            fields = {}
+            for offset in offsets:
+                if offset in _EFFECTS:
+                    bits = difference[start + offset]
+                    for key, mask in _EFFECTS[offset].items():
+                        if bits & mask:
+                            fields[key] = (before[offset] & mask != 0, after[offset] & mask != 0)
+                    if bits & _UNSWITCHED[offset]:
+                        # Bits no switch accounts for, report the whole byte
+                        fields[FIELD_AT[offset]] = (before[offset], after[offset])
+                    continue
+                key, decoder = _DECODERS_AT[offset]
+                if key not in fields:
+                    fields[key] = (decoder(before), decoder(after))
+            changes.append(Change(*pairs[pair], fields))
+        return changes
+
+    def to_dict(self):
+        """ The diff as plain data (ie. for JSON) """
+        return {
+            'by': self.by,
+            'unchanged': self.unchanged,
+            'changed': [{'old': change.a, 'new': change.b, 'name': _name(self.new.view(change.b)._record).rstrip(),
+                         'fields': {key: list(values) for key, values in change.fields.items()}}
+                        for change in self.changes],
+            'removed': [{'old': index, 'name': _name(self.old.view(index)._record).rstrip()} for index in self.removed],
+            'added': [{'new': index, 'name': _name(self.new.view(index)._record).rstrip()} for index in self.added],
+        }
+
+    def report(self):
+        """ The diff for humans, one line per record, as a list of str """
+        lines = []
+        for change in self.changes:
+            fields = ', '.join('%s %s -> %s' % (key, _show(old), _show(new))
+                               for key, (old, new) in change.fields.items())
+            lines.append('~ %5d %5d  %s  %s' % (change.a, change.b, _name(self.new.view(change.b)._record), fields))
+        for index in self.removed:
+            lines.append('- %5d        %s' % (index, _name(self.old.view(index)._record)))
+        for index in self.added:
+            lines.append('+       %5d  %s' % (index, _name(self.new.view(index)._record)))
+        lines.append('%d changed, %d removed, %d added, %d unchanged' % (
+            len(self.changes), len(self.removed), len(self.added), self.unchanged))
+        return lines
+
+
+def _show(value):
+    if value is True or value is False:
+        return 'on' if value else 'off'
+    if isinstance(value, str):
+        return repr(value)
+    return str(value)
+
+
+def diff(old, new, by='slot'):
+    """ Diff of two PatchBanks, see Diff """
+    return Diff(old, new, by)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--by', choices=ALIGNMENTS, default='slot', help='how records are paired up')
+    parser.add_argument('--json', action='store_true', help='print the diff as JSON')
+    options = parser.parse_args()
+    with PatchBank.open(options.old) as old, PatchBank.open(options.new) as new:
+        result = diff(old, new, options.by)
+        if options.json:
+            print(json.dumps(result.to_dict(), indent=1))
+        else:
+            print('\n'.join(result.report()))
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+
+''' Software GP-8, for testing transports and uploaders without the rack unit.
+
+The emulated unit keeps the 128 program memories and the temp area (00 00, the
+sound being played) as 50 data bytes each, laid out as in devices/gp8.py. It
+answers RQ1 (11h) requests with DT1 (12h) dumps and accepts DT1 writes of
+whole programs or of any run of bytes inside one, just like the real thing.
+
+Timing is modelled on a MIDI cable: every message takes its length / line rate
+to arrive and to be sent back, and the unit spends `processing` seconds on each
+message before it looks at the next one. Faults can be injected at random (but
+reproducibly, given a seed): replies with a byte dropped, replies with a bad
+checksum and replies which are late.
+'''
+
+import asyncio
+import random
+
+import addresses
+import devices.gp8 as _gp8
+import sysex
+from RolandGp8 import RolandGp8
+from transport import LoopbackBackend
+from uploader import MIDI_BAUD, BITS_PER_BYTE
+
+'''Program memories, the temp area is kept after them'''
+PROGRAMS = 128
+TEMP = PROGRAMS
+
+
+def locate(address):
+    """ Memory slot and offset into it of a data byte address.
+
+    Args:
+        address ([tuple]): (MSB, LSB), ie. (40h, 40h) for B-1-1 or (00h, 00h) for temp.
+
+    Returns:
+        [tuple]: (slot, offset), or None if nothing lives at the address.
+    """
+    msb, lsb = address
+    offset = lsb & 0x3F
+    if offset >= sysex.PROGRAM_SIZE:
+        return None
+    if msb == 0 and lsb < 0x40:
+        return TEMP, offset
+    if 0x40 <= msb < 0x80:
+        return (msb - 0x40) * 2 + (lsb >> 6), offset
+    return None
+
+
+def address_of_slot(slot):
+    """ (MSB, LSB) address of the first data byte of a memory slot """
+    return addresses.SLOT_ADDRESSES[slot]
+
+
+class Gp8Emulator():
+    """ An emulated GP-8 on the far end of a Backend.
+
+        Usage:
+            host, unit = Gp8Emulator.pair(seed=1, drop_rate=0.01)
+            async with unit, Transport(host) as midi:
+                patch = await midi.request_program((0x40, 0x00))
+    """
+
+    def __init__(self, backend, device_id=0, baud=MIDI_BAUD, processing=0.005, drop_rate=0.0,
+                 corrupt_rate=0.0, slow_rate=0.0, slow_delay=0.25, seed=None):
+        """
+        Args:
+            backend ([Backend]): The unit's end of the MIDI cable.
+            device_id ([int]): Zero indexed MIDI channel the unit listens on.
+            baud ([int]): Line rate in bits per second, None for no line delay.
+            processing ([float]): Seconds the unit spends on each message.
+            drop_rate ([float]): Chance a reply loses one of its bytes.
+            corrupt_rate ([float]): Chance a reply has a bad checksum.
+            slow_rate ([float]): Chance a reply is held back slow_delay seconds.
+            slow_delay ([float]): Seconds a slow reply is late.
+            seed ([int]): Seed of the fault injection, for repeatable runs.
+        """
+        self.backend = backend
+        self.device_id = device_id
+        self.rate = baud / BITS_PER_BYTE if baud else None
+        self.processing = processing
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.slow_rate = slow_rate
+        self.slow_delay = slow_delay
+        self.random = random.Random(seed)
+        blank = bytes(RolandGp8()._record[_gp8.DATA_START:_gp8.CHECKSUM_END])
+        self.memory = bytearray(blank * (PROGRAMS + 1))
+        self.received = 0
+        self.written = 0
+        self.answered = 0
+        self.rejected = 0
+        self.faults = 0
+        self._in_free = 0.0
+        self._out_free = 0.0
+        self._task = None
+
+    @classmethod
+    def pair(cls, maxsize=64, **kwargs):
+        """ A LoopbackBackend for the host and an emulator listening on its other end
+
+        Returns:
+            [tuple]: (host backend, Gp8Emulator)
+        """
+        host, unit = LoopbackBackend.pair(maxsize)
+        return host, cls(unit, **kwargs)
+
+    def load(self, patches):
+        """ Store RolandGp8 records (ie. a PatchBank) at the addresses they carry """
+        for patch in patches:
+            self.store(sysex.address_of(patch._record),
+                       patch._record[_gp8.DATA_START:_gp8.CHECKSUM_END])
+
+    def store(self, address, data):
+        """ Write data bytes starting at address, as a DT1 message would.
+
+        Returns:
+            [bool]: False if nothing lives at the address. Bytes past the end
+                    of the program are ignored.
+        """
+        location = locate(address)
+        if location is None:
+            return False
+        slot, offset = location
+        data = bytes(data[:sysex.PROGRAM_SIZE - offset])
+        start = slot * sysex.PROGRAM_SIZE + offset
+        self.memory[start:start + len(data)] = data
+        return True
+
+    def fetch(self, address, size=sysex.PROGRAM_SIZE):
+        """ Up to size data bytes starting at address, None if nothing lives there """
+        location = locate(address)
+        if location is None:
+            return None
+        slot, offset = location
+        start = slot * sysex.PROGRAM_SIZE + offset
+        return bytes(self.memory[start:start + min(size, sysex.PROGRAM_SIZE - offset)])
+
+    def program(self, slot):
+        """ Memory slot (0-127, or TEMP) as a RolandGp8 """
+        address = address_of_slot(slot)
+        return RolandGp8(sysex.dt1(address, self.fetch(address), self.device_id))
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """ Stop listening, the backend is left open """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _line(self, length, free):
+        """ Wait for length bytes to go over a line that is busy until free.
+
+        Returns:
+            [float]: When the line is free again.
+        """
+        loop = asyncio.get_running_loop()
+        if self.rate is None:
+            return loop.time()
+        free = max(loop.time(), free) + length / self.rate
+        delay = free - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return free
+
+    async def _run(self):
+        framer = sysex.Framer()
+        while True:
+            chunk = await self.backend.read()
+            if not chunk:
+                return
+            for frame in framer.feed(chunk):
+                self._in_free = await self._line(len(frame), self._in_free)
+                if self.processing:
+                    await asyncio.sleep(self.processing)
+                await self._handle(frame)
+
+    async def _handle(self, frame):
+        """ Act on one complete message from the host """
+        if frame[2] != self.device_id or len(frame) < 10:
+            return
+        self.received += 1
+        body = frame[5:-2]
+        if sysex.roland_checksum(body) != frame[-2]:
+            # The real unit flashes a checksum error and ignores the message
+            self.rejected += 1
+            return
+        address = sysex.address_of(frame)
+        if frame[4] == sysex.DT1:
+            if self.store(address, body[2:]):
+                self.written += 1
+            else:
+                self.rejected += 1
+        elif frame[4] == sysex.RQ1:
+            data = self.fetch(address, frame[7] << 7 | frame[8])
+            if data is None:
+                self.rejected += 1
+                return
+            await self._reply(sysex.dt1(address, data, self.device_id))
+
+    async def _reply(self, message):
+        """ Send a reply, with whatever faults are due """
+        message = bytearray(message)
+        if self.slow_rate and self.random.random() < self.slow_rate:
+            self.faults += 1
+            await asyncio.sleep(self.slow_delay)
+        if self.corrupt_rate and self.random.random() < self.corrupt_rate:
+            self.faults += 1
+            message[-2] = (message[-2] + 1) & 0x7F
+        if self.drop_rate and self.random.random() < self.drop_rate:
+            self.faults += 1
+            del message[self.random.randrange(1, len(message))]
+        self._out_free = await self._line(len(message), self._out_free)
+        await self.backend.write(message)
+        self.answered += 1
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+''' Streaming reader for text hex dumps, like misc/Text converted memory dump.txt.
+
+A text dump is the hex of sysex messages as two digit bytes, ie.
+
+    F0 41 00 13 12 40 00 08 02 00 50 64 ... 00 59 F7
+
+usually one message per line with blank lines between them. Bytes may be
+separated by any whitespace or commas (csv_hex() output reads back too), and
+upper and lower case digits are both fine.
+
+The text is read in big blocks, cut after the last line break, and each block
+is decoded in one go: separators are deleted with bytes.translate() and the
+digits converted by binascii.unhexlify(). A block holding nothing but whole
+GP-8 programs back to back (the usual case) is checked with a few strided
+counts and used as is; anything else goes through sysex.Framer.
+'''
+
+import binascii
+
+import devices.gp8 as _gp8
+import sysex
+from PatchBank import PatchBank
+from RolandGp8 import RolandGp8
+
+'''Bytes of text decoded at a time'''
+BLOCK_SIZE = 1 << 22
+
+'''Characters allowed between bytes'''
+SEPARATORS = b' \t\r\n\v\f,'
+
+'''Every byte with the top bit clear, deleted to find the status bytes of a block'''
+_DATA_BYTES = bytes(range(0x80))
+
+
+def _cut(chunk):
+    """ Length of chunk up to its last line break (or other separator), 0 if it has none """
+    for separator in (b'\n', b' ', b','):
+        cut = chunk.rfind(separator) + 1
+        if cut:
+            return cut
+    return 0
+
+
+def decode(text, offset=0):
+    """ Bytes of a block of hex text.
+
+    Args:
+        text ([bytes]): Hex digits and separators, every byte two digits.
+        offset ([int]): Position of text in its file, for error messages.
+
+    Raises:
+        ValueError: text holds something else than hex digits and separators,
+                    or an odd number of digits.
+    """
+    try:
+        return binascii.unhexlify(text.translate(None, SEPARATORS))
+    except binascii.Error as error:
+        raise ValueError(' '.join(['Bad hex text in the block at offset', str(offset) + ':', str(error)])) from None
+
+
+def iter_blocks(file, block_size=BLOCK_SIZE):
+    """ Yield the decoded bytes of a binary file object of hex text, a block at a time """
+    rest = b''
+    offset = 0
+    for chunk in iter(lambda: file.read(block_size), b''):
+        chunk = rest + chunk
+        cut = _cut(chunk)
+        rest = chunk[cut:]
+        if cut:
+            yield decode(chunk[:cut], offset)
+            offset += cut
+    if rest:
+        yield decode(rest, offset)
+
+
+def read_frames(file, block_size=BLOCK_SIZE, **kwargs):
+    """ Yield every complete message of a hex text file object, see sysex.Framer for kwargs """
+    return sysex.iter_frames(iter_blocks(file, block_size), **kwargs)
+
+
+def _programs(block):
+    """ Number of records in block if it is nothing but GP-8 programs back to
+        back, 0 otherwise.
+    """
+    length = _gp8.RECORD_LENGTH
+    count, rest = divmod(len(block), length)
+    if rest or not count:
+        return 0
+    if (block[0::length].count(sysex.SYSEX_BEGIN) != count
+            or block[1::length].count(sysex.ROLAND_ID) != count
+            or block[3::length].count(sysex.GP8_MODEL_ID) != count
+            or block[4::length].count(sysex.DT1) != count
+            or block[length - 1::length].count(sysex.SYSEX_END) != count):
+        return 0
+    # The F0 and F7 of every record, and no other byte over 7Fh
+    if block.translate(None, _DATA_BYTES) != bytes([sysex.SYSEX_BEGIN, sysex.SYSEX_END]) * count:
+        return 0
+    return count
+
+
+def program_blocks(file, block_size=BLOCK_SIZE):
+    """ Yield the program records of a hex text file object, as blocks of
+        records back to back. Other messages are skipped.
+    """
+    framer = sysex.Framer()
+    for block in iter_blocks(file, block_size):
+        if not framer.pending and _programs(block):
+            yield block
+        else:
+            programs = b''.join(frame for frame in framer.feed(block) if sysex.is_program(frame))
+            if programs:
+                yield programs
+
+
+def iter_patches(file, block_size=BLOCK_SIZE):
+    """ Yield every program of a hex text file object as a RolandGp8 """
+    length = _gp8.RECORD_LENGTH
+    for block in program_blocks(file, block_size):
+        for start in range(0, len(block), length):
+            yield RolandGp8(block[start:start + length])
+
+
+def read_into(file, buffer, block_size=BLOCK_SIZE):
+    """ Append every program of a hex text file object to a bytearray (ie. a
+        bank buffer) without making RolandGp8 objects.
+
+    Returns:
+        [int]: Number of programs appended.
+    """
+    start = len(buffer)
+    for block in program_blocks(file, block_size):
+        buffer += block
+    return (len(buffer) - start) // _gp8.RECORD_LENGTH
+
+
+def read_bank(filename, block_size=BLOCK_SIZE):
+    """ PatchBank of every program in a hex text dump file """
+    buffer = bytearray()
+    with open(filename, 'rb') as file:
+        read_into(file, buffer, block_size)
+    return PatchBank(buffer)
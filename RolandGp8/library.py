@@ -0,0 +1,291 @@
+#!/usr/bin/env python3
+
+''' Persistent, indexed patch library in SQLite.
+
+Dumps are ingested once: every program found in a .syx file is stored with
+its name, its eight effect switches packed into one byte (EFFECT_MSB << 4 |
+EFFECT_LSB) and every int and bool parameter of devices/gp8.py in a column of
+its own, each of them indexed. Patches are keyed by a hash of their data bytes,
+so the same sound found in many dumps (or at many addresses) is stored once,
+with a row per place it was found.
+
+Re-ingesting a tree only reads files whose size or modification time changed,
+and only replaces their contents if the file hash changed too. Files gone
+from the tree are forgotten, and so is every patch found nowhere else.
+
+Usage:
+    with Library('patches.db') as library:
+        library.ingest('archive/')
+        for patch in library.find(distortion=True, chorus=False, volume=range(61, 128)):
+            print(patch)
+'''
+
+import hashlib
+import os
+import sqlite3
+
+import devices.gp8 as _gp8
+import schema as _schema
+import sysex
+from RolandGp8 import EFFECT_SWITCHES, PARAMETERS, RolandGp8, content_hash
+
+_EFFECT_MSB = _gp8.data['EFFECT_MSB']['position']
+_EFFECT_LSB = _gp8.data['EFFECT_LSB']['position']
+_NAME = _gp8.data['NAME']
+
+
+def _index_sql():
+    """ Indexes of the patches table.
+
+        Parameter indexes lead with the effects byte: it has only 256 values, so
+        effect switches plus a parameter range is a handful of index range scans,
+        and a parameter alone is still found through a skip-scan.
+    """
+    indexes = ''.join('CREATE INDEX IF NOT EXISTS patches_%s ON patches (effects, %s);\n' % (name, name)
+                      for name in PARAMETERS)
+    return indexes + 'CREATE INDEX IF NOT EXISTS patches_name ON patches (name);\n'
+
+
+def _schema_sql():
+    columns = ''.join(',\n    %s INTEGER NOT NULL' % name for name in PARAMETERS)
+    return '''
+CREATE TABLE IF NOT EXISTS patches (
+    id INTEGER PRIMARY KEY,
+    hash BLOB NOT NULL UNIQUE,
+    record BLOB NOT NULL,
+    name TEXT NOT NULL,
+    effects INTEGER NOT NULL%s
+);
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    hash BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS locations (
+    source INTEGER NOT NULL REFERENCES sources (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    patch INTEGER NOT NULL REFERENCES patches (id),
+    PRIMARY KEY (source, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS locations_patch ON locations (patch);
+%s''' % (columns, _index_sql())
+
+
+class Library():
+    """ A SQLite file of patches, searchable by effect, name and parameter """
+
+    def __init__(self, filename=':memory:'):
+        """
+        Args:
+            filename ([str]): The database, created if it doesn't exist.
+        """
+        self.filename = filename
+        self._db = sqlite3.connect(filename)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        self._db.execute('PRAGMA journal_mode = WAL')
+        self._db.execute('PRAGMA synchronous = NORMAL')
+        self._db.execute('PRAGMA cache_size = -65536')
+        self._db.executescript(_schema_sql())
+        self._insert = 'INSERT OR IGNORE INTO patches (hash, record, name, effects, %s) VALUES (?, ?, ?, ?%s)' % (
+            ', '.join(PARAMETERS), ', ?' * len(PARAMETERS))
+        self._positions = [field.position for field in PARAMETERS.values()]
+
+    def close(self):
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._db.execute('SELECT COUNT(*) FROM patches').fetchone()[0]
+
+    def _row(self, record):
+        """ Column values of a record, in the order of the insert statement """
+        name = str(record[_NAME['position']:_NAME['position'] + _NAME['length']], 'ascii', 'replace')
+        return (content_hash(record), bytes(record), name.rstrip(),
+                record[_EFFECT_MSB] << 4 | record[_EFFECT_LSB], *[record[position] for position in self._positions])
+
+    def add(self, patches):
+        """ Store RolandGp8 patches (or raw records) which aren't stored yet.
+
+        Returns:
+            [list]: Row id of every patch, in order.
+        """
+        records = [patch if isinstance(patch, (bytes, bytearray, memoryview)) else patch._record
+                   for patch in patches]
+        rows = [self._row(record) for record in records]
+        with self._db:
+            self._db.executemany(self._insert, rows)
+        return self._ids([row[0] for row in rows])
+
+    def _ids(self, hashes):
+        ids = {}
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            ids.update(self._db.execute('SELECT hash, id FROM patches WHERE hash IN (%s)' % ','.join('?' * len(chunk)),
+                                        chunk))
+        return [ids[digest] for digest in hashes]
+
+    def ingest_file(self, path):
+        """ Store every program of a .syx file, unless it was ingested before unchanged.
+
+        Returns:
+            [int]: Number of programs read, 0 if the file was skipped.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        known = self._db.execute('SELECT id, size, mtime_ns, hash FROM sources WHERE path = ?', (path,)).fetchone()
+        if known is not None and known[1:3] == (stat.st_size, stat.st_mtime_ns):
+            return 0
+        with open(path, 'rb') as file:
+            data = file.read()
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        if known is not None and known[3] == digest:
+            with self._db:
+                self._db.execute('UPDATE sources SET size = ?, mtime_ns = ? WHERE id = ?',
+                                 (stat.st_size, stat.st_mtime_ns, known[0]))
+            return 0
+        records = [frame for frame in sysex.iter_frames([data]) if sysex.is_program(frame)]
+        ids = self.add(records)
+        with self._db:
+            old = self._forget(known[0]) if known is not None else []
+            source = self._db.execute('INSERT INTO sources (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)',
+                                      (path, stat.st_size, stat.st_mtime_ns, digest)).lastrowid
+            self._db.executemany('INSERT INTO locations (source, position, patch) VALUES (?, ?, ?)',
+                                 [(source, position, patch) for position, patch in enumerate(ids)])
+            self._orphans(old)
+        return len(records)
+
+    def _forget(self, source):
+        """ Delete a source and its locations.
+
+        Returns:
+            [list]: Ids of the patches it held, see _orphans().
+        """
+        patches = [patch for patch, in self._db.execute('SELECT DISTINCT patch FROM locations WHERE source = ?',
+                                                        (source,))]
+        self._db.execute('DELETE FROM sources WHERE id = ?', (source,))
+        return patches
+
+    def _orphans(self, patches):
+        """ Delete those of patches which are no longer found in any source """
+        self._db.executemany('DELETE FROM patches WHERE id = ? AND NOT EXISTS '
+                             '(SELECT 1 FROM locations WHERE patch = ?)', [(patch, patch) for patch in patches])
+
+    def prune(self, path):
+        """ Forget every source under path (a file or a directory) which no longer exists.
+
+        Returns:
+            [int]: Number of sources forgotten.
+        """
+        path = os.path.abspath(path)
+        gone = [source for source, known in self._db.execute('SELECT id, path FROM sources')
+                if (known == path or known.startswith(os.path.join(path, ''))) and not os.path.exists(known)]
+        with self._db:
+            patches = [patch for source in gone for patch in self._forget(source)]
+            self._orphans(patches)
+        return len(gone)
+
+    def ingest(self, path):
+        """ Ingest a .syx file, or every .syx file under a directory. Files
+            ingested before and since deleted from the directory are pruned.
+
+        Returns:
+            [int]: Number of programs read from new or changed files.
+        """
+        if not os.path.isdir(path):
+            return self.ingest_file(path)
+        self.prune(path)
+        empty = not len(self)
+        if empty:
+            # Building the indexes once at the end is several times faster
+            # than updating them row by row
+            self._drop_indexes()
+        count = 0
+        try:
+            for directory, subdirectories, files in os.walk(path):
+                subdirectories.sort()
+                for filename in sorted(files):
+                    if filename.lower().endswith('.syx'):
+                        count += self.ingest_file(os.path.join(directory, filename))
+        finally:
+            if empty:
+                self._db.executescript(_index_sql())
+        if count:
+            self._db.execute('ANALYZE')
+        return count
+
+    def _drop_indexes(self):
+        names = [name for name, in self._db.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'patches' AND sql IS NOT NULL")]
+        for name in names:
+            self._db.execute('DROP INDEX %s' % name)
+
+    def _where(self, conditions):
+        """ SQL WHERE clause and parameters for find() conditions """
+        clauses = []
+        parameters = []
+        effects = {}
+        for name, value in conditions.items():
+            if name in EFFECT_SWITCHES:
+                effects[name] = bool(value)
+            elif name == 'name':
+                clauses.append('name GLOB ?')
+                parameters.append(value)
+            elif name in PARAMETERS:
+                field = PARAMETERS[name]
+                if isinstance(field, _schema.BoolField):
+                    value = 100 if value else 0
+                if isinstance(value, range):
+                    if value.step != 1:
+                        raise ValueError(' '.join([name, 'range step must be 1:', repr(value)]))
+                    clauses.append('%s BETWEEN ? AND ?' % name)
+                    parameters.extend([value.start, value.stop - 1])
+                else:
+                    clauses.append('%s = ?' % name)
+                    parameters.append(value)
+            else:
+                raise ValueError(' '.join(['No such field:', name]))
+        if effects:
+            # Only 256 combinations of switches exist, list the ones that match
+            # so the effects index can be used
+            on = sum(EFFECT_SWITCHES[name] for name, value in effects.items() if value)
+            mask = sum(EFFECT_SWITCHES[name] for name in effects)
+            matching = [combination for combination in range(256) if combination & mask == on]
+            clauses.append('effects IN (%s)' % ','.join(map(str, matching)))
+        return ' AND '.join(clauses) or '1', parameters
+
+    def find(self, limit=None, **conditions):
+        """ Patches matching every condition, as RolandGp8 objects, in no particular order.
+
+        Conditions are keyword arguments named like the RolandGp8 properties:
+            effect switches: distortion=True, chorus=False
+            int parameters: an int, or a range (volume=range(61, 101))
+            bool parameters: od_turbo=True
+            name: a glob pattern, ie. name='Lead*'
+
+        Args:
+            limit ([int]): Return at most this many.
+        """
+        where, parameters = self._where(conditions)
+        sql = 'SELECT record FROM patches WHERE %s' % where
+        if limit is not None:
+            sql += ' LIMIT %d' % limit
+        return [RolandGp8(record) for record, in self._db.execute(sql, parameters)]
+
+    def count(self, **conditions):
+        """ Number of patches matching every condition, see find() """
+        where, parameters = self._where(conditions)
+        return self._db.execute('SELECT COUNT(*) FROM patches WHERE %s' % where, parameters).fetchone()[0]
+
+    def sources(self, patch):
+        """ (path, position) of every place a patch was found """
+        return self._db.execute(
+            'SELECT sources.path, locations.position FROM locations JOIN sources ON sources.id = locations.source '
+            'JOIN patches ON patches.id = locations.patch WHERE patches.hash = ? ORDER BY 1, 2',
+            (content_hash(patch._record),)).fetchall()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+''' Three-way merge of patch libraries: a common base, ours and theirs.
+
+Records are paired up with the base the way diff.py does (by slot, name or
+content hash). For every record present in all three, each field is taken
+from whichever side changed it. A field changed on both sides to different
+values is a conflict, and it keeps the value of the side given by prefer.
+Fields are the ones of devices/gp8.py. The name, the delay time and the
+address (LOCATION) are merged as a whole, each effect switch on its own.
+
+The merge is vectorized like diff.py: the paired frames of the three banks
+are gathered into three buffers. Each side's change mask comes from XOR with
+the base, widened to whole fields with translate() and column slices.
+Merging is then one expression over three big ints:
+
+    merged = ours & ~take | theirs & take
+
+where take is the mask of the fields taken from theirs.
+
+Records deleted on one side go if the other side left them alone, and are
+kept (as a conflict) if it changed them. Records new on either side are
+added after the merged ones. Those added by both sides are paired up the
+same way: the same record added twice is kept once, two different ones
+(ie. at one slot) are a conflict and only prefer's is kept. Every checksum
+of the result is recomputed.
+
+Usage: python3 merge.py base.syx ours.syx theirs.syx merged.syx [--by slot|name|hash] [--prefer ours|theirs]
+'''
+
+import argparse
+import json
+
+import columnar
+import devices.gp8 as _gp8
+from diff import ALIGNMENTS, FIELD_AT, align, decode, frames
+from PatchBank import PatchBank
+
+SIDES = ('ours', 'theirs')
+
+'''Field reported for a record deleted on one side and changed on the other'''
+DELETED = 'DELETED'
+
+'''Field reported for two different records added by both sides under one key'''
+ADDED = 'ADDED'
+
+_CHECKSUM = _gp8.data['CHECKSUM']['position']
+_EFFECTS = {
+    _gp8.data['EFFECT_MSB']['position']: _gp8.BANK_1_EFFECTS_MSB,
+    _gp8.data['EFFECT_LSB']['position']: _gp8.BANK_2_EFFECTS_LSB,
+}
+
+'''Every non zero byte to FFh: a changed byte changes its whole field'''
+_SPREAD = bytes([0] + [0xFF] * 255)
+
+
+def _units():
+    """ Byte positions of every field spanning more than one byte """
+    positions = {}
+    for position, key in enumerate(FIELD_AT):
+        positions.setdefault(key, []).append(position)
+    return [found for key, found in positions.items() if len(found) > 1]
+
+
+_UNITS = _units()
+
+
+def _changes(base, side, count):
+    """ Mask of the bits of side's fields that differ from base, as a big int.
+
+        Every byte of a changed field is FFh, except in the effects bytes where
+        every effect bit is a field of its own. The checksum never counts.
+    """
+    length = _gp8.RECORD_LENGTH
+    delta = (int.from_bytes(base, 'little') ^ int.from_bytes(side, 'little')).to_bytes(len(base), 'little')
+    mask = bytearray(delta.translate(_SPREAD))
+    for position in _EFFECTS:
+        mask[position::length] = delta[position::length]
+    mask[_CHECKSUM::length] = bytes(count)
+    for positions in _UNITS:
+        flags = 0
+        for position in positions:
+            flags |= int.from_bytes(mask[position::length], 'little')
+        flags = flags.to_bytes(count, 'little')
+        for position in positions:
+            mask[position::length] = flags
+    return int.from_bytes(mask, 'little')
+
+
+class Conflict():
+    """ A field changed on both sides to different values """
+
+    def __init__(self, base, ours, theirs, field, values):
+        """
+        Args:
+            base, ours, theirs ([int]): Index of the record in each bank, None
+                                        where a side deleted it (or, for
+                                        the base, neither had it).
+            field ([str]): Data dictionary key, an effect, LOCATION, DELETED
+                           or ADDED.
+            values ([tuple]): (base, ours, theirs) value of the field, None for
+                              a deleted or added record.
+        """
+        self.base = base
+        self.ours = ours
+        self.theirs = theirs
+        self.field = field
+        self.values = values
+
+    def __repr__(self):
+        return 'Conflict(%r, %r, %r, %r, %r)' % (self.base, self.ours, self.theirs, self.field, self.values)
+
+
+class Merge():
+    """ Three-way merge of PatchBanks, see the module documentation.
+
+        bank is the merged PatchBank and conflicts lists every Conflict. The
+        merged records come in base order, then those added by ours, then
+        those added by theirs.
+    """
+
+    def __init__(self, base, ours, theirs, by='slot', prefer='ours'):
+        if prefer not in SIDES:
+            raise ValueError(' '.join(['prefer is ours or theirs, not', repr(prefer)]))
+        self.by = by
+        self.prefer = prefer
+        self.conflicts = []
+        ours_pairs, ours_deleted, ours_added = align(base, ours, by)
+        theirs_pairs, theirs_deleted, theirs_added = align(base, theirs, by)
+        in_ours = dict(ours_pairs)
+        in_theirs = dict(theirs_pairs)
+        triples = [(index, in_ours[index], in_theirs[index]) for index in range(len(base))
+                   if index in in_ours and index in in_theirs]
+        merged = self._merge(base, ours, theirs, triples)
+        kept = self._deletions(base, ours, in_ours, theirs_deleted, 'theirs')
+        kept += self._deletions(base, theirs, in_theirs, ours_deleted, 'ours')
+        added = self._additions(ours, ours_added, theirs, theirs_added)
+        self.bank = PatchBank(merged + b''.join(kept) + added)
+        self.bank.fix_checksums()
+
+    def _merge(self, base, ours, theirs, triples):
+        """ The merged frames of every record found in all three banks """
+        count = len(triples)
+        old = frames(base, [index for index, o, t in triples])
+        mine = frames(ours, [o for index, o, t in triples])
+        other = frames(theirs, [t for index, o, t in triples])
+        ours_changed = _changes(old, mine, count)
+        theirs_changed = _changes(old, other, count)
+        mine_int = int.from_bytes(mine, 'little')
+        other_int = int.from_bytes(other, 'little')
+        take = theirs_changed if self.prefer == 'theirs' else theirs_changed & ~ours_changed
+        merged = (mine_int & ~take | other_int & take).to_bytes(len(mine), 'little')
+        clash = (ours_changed & theirs_changed & (mine_int ^ other_int)).to_bytes(len(mine), 'little')
+        self._conflicts(clash, triples, old, mine, other)
+        return merged
+
+    def _conflicts(self, clash, triples, old, mine, other):
+        """ One Conflict per field of a record with clashing bits """
+        length = _gp8.RECORD_LENGTH
+        found = {}
+        for position in columnar.nonzero(clash):
+            triple, offset = divmod(position, length)
+            fields = found.setdefault(triple, {})
+            if offset in _EFFECTS:
+                for key, mask in _EFFECTS[offset].items():
+                    if clash[position] & mask:
+                        fields[key] = None
+            else:
+                fields[FIELD_AT[offset]] = None
+        for triple, fields in found.items():
+            start = triple * length
+            records = [record[start:start + length] for record in (old, mine, other)]
+            for key in fields:
+                self.conflicts.append(Conflict(*triples[triple], key, tuple(decode(record, key) for record in records)))
+
+    def _deletions(self, base, side, pairs, deleted, deleted_by):
+        """ Frames of the records deleted by one side which the other side
+            changed: those are kept (side's version) as conflicts.
+        """
+        kept = []
+        for index in deleted:
+            if index not in pairs:
+                continue
+            record = frames(side, [pairs[index]])
+            if record[:_CHECKSUM] != frames(base, [index])[:_CHECKSUM]:
+                kept.append(record)
+                ours, theirs = (pairs[index], None) if deleted_by == 'theirs' else (None, pairs[index])
+                self.conflicts.append(Conflict(index, ours, theirs, DELETED, (None, None, None)))
+        return kept
+
+    def _additions(self, ours, ours_added, theirs, theirs_added):
+        """ Frames of the records added by either side, those both added once """
+        length = _gp8.RECORD_LENGTH
+        mine = frames(ours, ours_added)
+        other = frames(theirs, theirs_added)
+        pairs, only_ours, only_theirs = align(PatchBank(mine), PatchBank(other), self.by)
+        kept = [mine[index * length:(index + 1) * length] for index in range(len(ours_added))]
+        for index, match in pairs:
+            record = other[match * length:(match + 1) * length]
+            if record[:_CHECKSUM] == kept[index][:_CHECKSUM]:
+                continue
+            self.conflicts.append(Conflict(None, ours_added[index], theirs_added[match], ADDED, (None, None, None)))
+            if self.prefer == 'theirs':
+                kept[index] = record
+        return b''.join(kept) + b''.join(other[index * length:(index + 1) * length] for index in only_theirs)
+
+    def to_dict(self):
+        """ The conflicts as plain data (ie. for JSON) """
+        return {
+            'by': self.by,
+            'prefer': self.prefer,
+            'records': len(self.bank),
+            'conflicts': [{'base': conflict.base, 'ours': conflict.ours, 'theirs': conflict.theirs,
+                           'field': conflict.field, 'values': list(conflict.values)} for conflict in self.conflicts],
+        }
+
+    def report(self):
+        """ The conflicts for humans, one line each, as a list of str """
+        lines = ['! %5s %5s %5s  %s: base %r, ours %r, theirs %r' % (
+            conflict.base, conflict.ours, conflict.theirs, conflict.field, *conflict.values)
+            for conflict in self.conflicts]
+        lines.append('%d records, %d conflicts, %s kept' % (len(self.bank), len(self.conflicts), self.prefer))
+        return lines
+
+
+def merge(base, ours, theirs, by='slot', prefer='ours'):
+    """ Three-way merge of PatchBanks, see Merge """
+    return Merge(base, ours, theirs, by, prefer)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('base')
+    parser.add_argument('ours')
+    parser.add_argument('theirs')
+    parser.add_argument('merged', help='sysex file the result is written to')
+    parser.add_argument('--by', choices=ALIGNMENTS, default='slot', help='how records are paired up')
+    parser.add_argument('--prefer', choices=SIDES, default='ours', help='side whose value a conflict keeps')
+    parser.add_argument('--json', action='store_true', help='print the conflicts as JSON')
+    options = parser.parse_args()
+    with PatchBank.open(options.base) as base, PatchBank.open(options.ours) as ours, \
+            PatchBank.open(options.theirs) as theirs:
+        result = merge(base, ours, theirs, options.by, options.prefer)
+    with open(options.merged, 'wb') as file:
+        file.write(result.bank.tobytes())
+    if options.json:
+        print(json.dumps(result.to_dict(), indent=1))
+    else:
+        print('\n'.join(result.report()))
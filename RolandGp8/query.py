@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+''' Filter expressions over patch banks, ie.
+
+    distortion and not chorus and od_drive >= 80 and name ~ "Lead"
+
+A name is any property of RolandGp8 compiled from the data dictionary (see
+RolandGp8._fields): an effect switch or a bool on its own is true when it is
+on, an int is compared to a number (decimal or 0x hex) with < <= == != >= >,
+a bool or effect to true/false, and the name with == / != (trailing padding
+ignored) or ~, which is true if the name contains the text, ignoring case.
+Predicates combine with and, or, not and parentheses.
+
+An expression is compiled once into a tree of functions working on whole
+columns of a PatchBank, like PatchBank.set() does: every comparison is a
+256 entry translate table turning a column into one 0/1 flag byte per record,
+and the flags are read as one big int, so and/or/not of two predicates over a
+whole archive is a single big int operation carried out in C.
+
+Usage:
+    lead = Query('distortion and not chorus and od_drive >= 80 and name ~ "Lead"')
+    for patch in lead.views(PatchBank.open('archive.syx')):
+        print(patch)
+'''
+
+import functools
+import operator
+import re
+
+import columnar
+import devices.gp8 as _gp8
+import schema as _schema
+from RolandGp8 import RolandGp8
+
+COMPARISONS = {
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '>=': operator.ge,
+    '>': operator.gt,
+}
+
+_TOKENS = re.compile(r'''\s*(?:(0x[0-9a-fA-F]+|\d+)|"([^"]*)"|'([^']*)'|(<=|>=|==|!=|<|>|~|\(|\))|([A-Za-z_]\w*))''')
+
+'''Separator between names in the text searched by ~, never part of a name'''
+_SEPARATOR = b'\n'
+
+
+class Token():
+    """ One token of an expression: kind is number, string, operator or word """
+
+    def __init__(self, kind, value):
+        self.kind = kind
+        self.value = value
+
+    def __repr__(self):
+        return repr(self.value)
+
+
+def tokenize(text):
+    """ Split an expression into Tokens.
+
+    Raises:
+        ValueError: Text that is not part of the language.
+    """
+    tokens = []
+    position = 0
+    text = text.rstrip()
+    while position < len(text):
+        match = _TOKENS.match(text, position)
+        if match is None:
+            raise ValueError(' '.join(['Unexpected text in query:', repr(text[position:])]))
+        number, double, single, symbol, word = match.groups()
+        if number is not None:
+            tokens.append(Token('number', int(number, 0)))
+        elif double is not None or single is not None:
+            tokens.append(Token('string', double if double is not None else single))
+        elif symbol is not None:
+            tokens.append(Token('operator', symbol))
+        else:
+            tokens.append(Token('word', word.lower()))
+        position = match.end()
+    return tokens
+
+
+@functools.lru_cache(maxsize=1024)
+def _table(comparison, value):
+    """ Translate table, 1 for every byte value for which comparison(byte, value) holds """
+    return bytes([1 if COMPARISONS[comparison](byte, value) else 0 for byte in range(256)])
+
+
+def _flags(column, table):
+    """ Column translated to 0/1 flags, as one big int with a byte per record """
+    return int.from_bytes(column.translate(table), 'little')
+
+
+def _column(bank, position):
+    return bytes(bank._buffer[position::_gp8.RECORD_LENGTH])
+
+
+def _names(bank, field):
+    """ Every name of the bank in one bytes object, each followed by _SEPARATOR """
+    width = field.length + 1
+    names = bytearray(_SEPARATOR * (len(bank) * width))
+    for offset in range(field.length):
+        names[offset::width] = _column(bank, field.position + offset)
+    return bytes(names)
+
+
+class Query():
+    """ A filter expression, compiled once and run against any number of banks. """
+
+    def __init__(self, text):
+        """ Compile text.
+
+        Raises:
+            ValueError: A syntax error, an unknown name or a comparison
+                        that doesn't fit the type of the property.
+        """
+        self.text = text
+        self._tokens = tokenize(text)
+        self._next = 0
+        self._evaluate = self._or()
+        if self._next < len(self._tokens):
+            raise ValueError(' '.join(['Unexpected', repr(self._tokens[self._next].value), 'in query:', text]))
+        del self._tokens
+
+    def __repr__(self):
+        return 'Query(%r)' % self.text
+
+    def mask(self, bank):
+        """ One byte per record of bank, 1 where the record matches, as a big int """
+        return self._evaluate(bank, int.from_bytes(b'\x01' * len(bank), 'little'))
+
+    def flags(self, bank):
+        """ One byte per record of bank, 1 where the record matches """
+        return self.mask(bank).to_bytes(len(bank), 'little')
+
+    def indexes(self, bank):
+        """ Indexes of the records of bank matching the query, in bank order """
+        return columnar.nonzero(self.flags(bank))
+
+    def count(self, bank):
+        """ How many records of bank match the query """
+        return self.flags(bank).count(1)
+
+    def views(self, bank):
+        """ Zero copy views (see PatchBank.view()) of every matching record """
+        for index in self.indexes(bank):
+            yield bank.view(index)
+
+    # Recursive descent: or binds loosest, then and, then not.
+
+    def _peek(self):
+        return self._tokens[self._next] if self._next < len(self._tokens) else None
+
+    def _take(self, kind=None, value=None):
+        token = self._peek()
+        if token is None or (kind and token.kind != kind) or (value and token.value != value):
+            found = 'end of query' if token is None else repr(token.value)
+            raise ValueError(' '.join(['Expected', value or kind or 'more', 'but found', found, 'in query:',
+                                       self.text]))
+        self._next += 1
+        return token
+
+    def _accept(self, kind, value):
+        token = self._peek()
+        if token is not None and token.kind == kind and token.value == value:
+            self._next += 1
+            return True
+        return False
+
+    def _or(self):
+        terms = [self._and()]
+        while self._accept('word', 'or'):
+            terms.append(self._and())
+        if len(terms) == 1:
+            return terms[0]
+        return lambda bank, ones: functools.reduce(operator.or_, (term(bank, ones) for term in terms))
+
+    def _and(self):
+        factors = [self._not()]
+        while self._accept('word', 'and'):
+            factors.append(self._not())
+        if len(factors) == 1:
+            return factors[0]
+        return lambda bank, ones: functools.reduce(operator.and_, (factor(bank, ones) for factor in factors))
+
+    def _not(self):
+        if self._accept('word', 'not'):
+            factor = self._not()
+            return lambda bank, ones: factor(bank, ones) ^ ones
+        if self._accept('operator', '('):
+            expression = self._or()
+            self._take('operator', ')')
+            return expression
+        return self._predicate()
+
+    def _predicate(self):
+        name = self._take('word').value
+        field = RolandGp8._fields.get(name)
+        if field is None:
+            raise ValueError(' '.join(['No such field:', repr(name), 'in query:', self.text]))
+        token = self._peek()
+        comparison = None
+        if token is not None and token.kind == 'operator' and token.value not in ('(', ')'):
+            comparison = self._take().value
+            value = self._take()
+        if isinstance(field, _schema.StringField):
+            if comparison not in ('==', '!=', '~') or value.kind != 'string':
+                raise ValueError(' '.join([name, 'is compared with ==, != or ~ and a string, in query:', self.text]))
+            return self._text(field, comparison, value.value)
+        if comparison is None:
+            comparison, value = '==', Token('word', 'true')
+        if isinstance(field, (_schema.BoolField, _schema.EffectSwitch)):
+            if comparison not in ('==', '!=') or value.kind != 'word' or value.value not in ('true', 'false'):
+                raise ValueError(' '.join([name, 'is compared with == or != and true/false, in query:', self.text]))
+            if isinstance(field, _schema.EffectSwitch):
+                table = bytes([1 if byte & field.mask else 0 for byte in range(256)])
+            else:
+                table = _table('==', 100)
+            if (comparison == '==') != (value.value == 'true'):
+                table = table.translate(bytes([1, 0]) + bytes(254))
+            return lambda bank, ones: _flags(_column(bank, field.position), table)
+        if comparison == '~' or value.kind != 'number':
+            raise ValueError(' '.join([name, 'is compared with a number, in query:', self.text]))
+        table = _table(comparison, value.value)
+        return lambda bank, ones: _flags(_column(bank, field.position), table)
+
+    def _text(self, field, comparison, text):
+        """ Predicate on the name field """
+        if comparison == '~':
+            pattern = re.compile(re.escape(bytes(text, 'ascii')), re.IGNORECASE)
+        else:
+            # The whole name, up to its padding
+            pattern = re.compile(b'(?m)^' + re.escape(bytes(text.rstrip(' '), 'ascii')) + b' *$')
+        width = field.length + 1
+
+        def matches(bank, ones):
+            flags = bytearray(len(bank))
+            for match in pattern.finditer(_names(bank, field)):
+                # An empty pattern also matches after the last separator
+                if match.start() // width < len(flags):
+                    flags[match.start() // width] = 1
+            mask = int.from_bytes(flags, 'little')
+            return mask ^ ones if comparison == '!=' else mask
+        return matches
+
+
+@functools.lru_cache(maxsize=256)
+def compiled(text):
+    """ Query for text, compiled once per distinct expression """
+    return Query(text)
+
+
+def select(bank, text):
+    """ Indexes of the records of bank matching the expression text """
+    return compiled(text).indexes(bank)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+''' Compiles a device data dictionary (ie. devices/gp8.py) into properties.
+
+Each field of the dictionary is described once by a small Field object (key,
+position, default, table of legal values), which then builds a property whose
+getter/setter are closures with all of that baked in as local constants. Getting
+or setting an attribute is a single index into the record instead of a
+dictionary lookup and a chain of type comparisons per access.
+
+Every setter also keeps the Roland checksum byte correct, adjusting it by the
+difference between the old and the new value of the bytes it changed.
+'''
+
+import types
+
+
+def freeze(data):
+    """ Read only view of a (nested) dictionary, ie. a device data dictionary,
+        so it can be shared by every instance without anyone mutating it.
+    """
+    return types.MappingProxyType({key: freeze(value) if isinstance(value, dict) else value
+                                   for key, value in data.items()})
+
+
+def legal_values(data):
+    """ 256 entry table, 1 for every byte value the field accepts.
+
+        Works both as a lookup (table[value], one index per write) and as a
+        bytes.translate() table validating a whole column at once. Data bytes
+        are 7 bit, only the F0h/F7h framing bytes are ever legal above 7Fh.
+        Bools are stored as 00h/64h, and every byte of a multi byte number or
+        of a string may be any 7 bit value.
+    """
+    if data['type'] == 'bool':
+        legal = (0, 100)
+    elif data['range'] is None or (data['length'] > 1 and data['type'] != 'string'):
+        legal = range(128)
+    else:
+        legal = [int(value, 16) if isinstance(value, str) else value for value in data['range']]
+    return bytes([1 if value in legal else 0 for value in range(256)])
+
+
+def legal_tables(data):
+    """ Key -> legal_values() table of every field of a device data dictionary """
+    return {key: legal_values(field) for key, field in data.items()}
+
+
+class Field():
+    """ Single byte unsigned int field, ie. OD_DRIVE (0-100) """
+
+    def __init__(self, key, data, checksum):
+        self.key = key
+        self.checksum = checksum
+        self.position = data['position']
+        self.length = data['length']
+        self.default = data['default']
+        self.legal = legal_values(data)
+        self.label = data['name']
+        self.category = data.get('category')
+
+    def encode(self, value):
+        """ The bytes value is stored as, ValueError if it is out of range """
+        if value.__class__ is int and 0 <= value < 256 and self.legal[value]:
+            return bytes([value])
+        raise ValueError(' '.join([self.key, 'out of range:', repr(value)]))
+
+    def property(self):
+        """ Build the specialized property for this field """
+        def fget(patch, _position=self.position):
+            return patch._record[_position]
+
+        def fset(patch, value, _position=self.position, _legal=self.legal, _int=int, _key=self.key,
+                 _checksum=self.checksum):
+            if value.__class__ is _int and 0 <= value < 256 and _legal[value]:
+                record = patch._record
+                record[_checksum] = (record[_checksum] + record[_position] - value) & 0x7F
+                record[_position] = value
+            else:
+                raise ValueError(' '.join([_key, 'out of range:', repr(value)]))
+
+        def fdel(patch, _default=self.default):
+            fset(patch, _default)
+
+        return property(fget, fset, fdel, ' '.join([self.category or '', self.label]).strip())
+
+
+class BoolField(Field):
+    """ On/off field, stored as 64h (100) for on and 00h for off """
+
+    def encode(self, value):
+        return b'\x64' if value else b'\x00'
+
+    def property(self):
+        def fget(patch, _position=self.position):
+            return patch._record[_position] == 100
+
+        def fset(patch, value, _position=self.position, _checksum=self.checksum):
+            record = patch._record
+            value = 100 if value else 0
+            record[_checksum] = (record[_checksum] + record[_position] - value) & 0x7F
+            record[_position] = value
+
+        def fdel(patch, _default=self.default):
+            fset(patch, _default)
+
+        return property(fget, fset, fdel, ' '.join([self.category or '', self.label]).strip())
+
+
+class StringField(Field):
+    """ Fixed length 7 bit ASCII field, padded/trimmed with spaces """
+
+    def encode(self, value):
+        return bytes(value[:self.length].ljust(self.length), 'ascii')
+
+    def property(self):
+        def fget(patch, _start=self.position, _end=self.position + self.length):
+            return str(patch._record[_start:_end], 'ascii')
+
+        def fset(patch, value, _start=self.position, _end=self.position + self.length, _length=self.length,
+                 _checksum=self.checksum):
+            record = patch._record
+            value = bytes(value[:_length].ljust(_length), 'ascii')
+            record[_checksum] = (record[_checksum] + sum(record[_start:_end]) - sum(value)) & 0x7F
+            record[_start:_end] = value
+
+        def fdel(patch, _default=self.default):
+            fset(patch, _default)
+
+        return property(fget, fset, fdel, self.label + ', padded/trimmed to %d chars' % self.length)
+
+
+class EffectSwitch():
+    """ One effect on/off bit of the EFFECT_MSB/EFFECT_LSB bytes """
+
+    def __init__(self, key, position, mask, checksum):
+        self.key = key
+        self.position = position
+        self.mask = mask
+        self.checksum = checksum
+
+    def switch(self, byte, value):
+        """ The EFFECT_MSB/EFFECT_LSB byte with this effect switched on or off """
+        return byte | self.mask if value else byte & ~self.mask
+
+    def property(self):
+        def fget(patch, _position=self.position, _mask=self.mask):
+            return bool(patch._record[_position] & _mask)
+
+        def fset(patch, value, _position=self.position, _mask=self.mask, _checksum=self.checksum):
+            record = patch._record
+            old = record[_position]
+            new = old | _mask if value else old & ~_mask
+            record[_checksum] = (record[_checksum] + old - new) & 0x7F
+            record[_position] = new
+
+        def fdel(patch):
+            fset(patch, False)
+
+        return property(fget, fset, fdel, 'True if the effect is on.')
+
+
+'''Which Field class compiles each data dictionary type'''
+CODECS = {
+    'int': Field,
+    'bool': BoolField,
+    'string': StringField,
+}
+
+
+def compile_fields(device, aliases=None):
+    """ Describe every field and effect switch of a device module.
+
+    Args:
+        device ([module]): Device definition, ie. devices.gp8
+        aliases ([dict]): Attribute names which differ from the lower cased key.
+
+    Returns:
+        [dict]: Attribute name -> Field (or EffectSwitch).
+    """
+    aliases = aliases or {}
+    checksum = device.data['CHECKSUM']['position']
+    fields = {}
+    for key, data in device.data.items():
+        if data['type'] in CODECS:
+            fields[aliases.get(key, key.lower())] = CODECS[data['type']](key, data, checksum)
+    for bank, effects in [('EFFECT_MSB', device.BANK_1_EFFECTS_MSB), ('EFFECT_LSB', device.BANK_2_EFFECTS_LSB)]:
+        for key, mask in effects.items():
+            fields[aliases.get(key, key.lower())] = EffectSwitch(
+                key, device.data[bank]['position'], mask, checksum)
+    return fields
+
+
+def compiled(device, aliases=None):
+    """ Class decorator, installs a compiled property per field of device on the class.
+
+        Anything the class body defines itself (ie. group, bank) is left alone.
+        The Field descriptions are kept in cls._fields, keyed by attribute name.
+    """
+    def install(cls):
+        cls._fields = compile_fields(device, aliases)
+        for name, field in cls._fields.items():
+            if name not in cls.__dict__:
+                setattr(cls, name, field.property())
+        return cls
+    return install
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+''' Printable (plain text) and HTML patch sheets, rendered with Jinja2.
+
+Templates live in templates/ (sheet.html, sheet.txt) and are made of three
+blocks: header, patches and footer. They are compiled once per process and
+kept by a shared Environment. The labels and sections of a sheet come from the
+names and categories in devices/gp8.py.
+
+Rendering streams: patches are turned into sheets one at a time while the
+output is written, so a library of any size renders in flat memory. Big sysex
+files can be split across worker processes (render_file()): each worker
+renders a range of patches into a part file, and the parts are joined between
+the header and the footer.
+
+Usage:
+    write(PatchBank.from_file('bank.syx'), 'bank.html')
+    render_file('archive.syx', 'archive.txt', workers=4)
+'''
+
+import concurrent.futures
+import functools
+import os
+import shutil
+import tempfile
+
+import jinja2
+
+import devices.gp8 as _gp8
+import schema as _schema
+from PatchBank import PatchBank
+from RolandGp8 import RolandGp8
+
+TEMPLATES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+'''Template of each output format'''
+FORMATS = {
+    'html': 'sheet.html',
+    'txt': 'sheet.txt',
+}
+
+'''Patches per part when a file is rendered by worker processes'''
+CHUNK = 2000
+
+'''Label of the parameters not belonging to an effect'''
+PATCH_SECTION = 'Patch'
+
+
+def _sections():
+    """ (label, effect switch or None, [(property, label, bool)]) of each group
+        of parameters on a sheet, in data dictionary order.
+    """
+    switches = {name: name for name, field in RolandGp8._fields.items() if isinstance(field, _schema.EffectSwitch)}
+    sections = {}
+    for name, field in RolandGp8._fields.items():
+        if type(field) not in (_schema.Field, _schema.BoolField):
+            continue
+        category = field.category if field.category and field.category.lower() in switches else PATCH_SECTION
+        if category not in sections:
+            sections[category] = (category, switches.get(category.lower()), [])
+        sections[category][2].append((name, field.label, isinstance(field, _schema.BoolField)))
+    return list(sections.values())
+
+
+SECTIONS = _sections()
+
+
+def slot(patch):
+    """ Where a patch lives, ie. 'A-1-1', or 'Temp' for the temp area """
+    if patch._record[_gp8.CHECKSUM_START] < 0x40:
+        return 'Temp'
+    return '%s-%d-%d' % (patch.group, patch.bank, patch.program)
+
+
+def sheet(patch):
+    """ Everything a template shows of a patch, as plain data """
+    return {
+        'name': patch.name.rstrip(),
+        'slot': slot(patch),
+        'effects': [{'label': label, 'on': on} for label, on in patch.effects.items()],
+        'sections': [{
+            'label': label,
+            'on': switch is None or getattr(patch, switch),
+            'parameters': [{'label': parameter, 'value': ('On' if getattr(patch, name) else 'Off') if is_bool
+                            else getattr(patch, name)}
+                           for name, parameter, is_bool in parameters],
+        } for label, switch, parameters in SECTIONS],
+    }
+
+
+def parameters(values):
+    """ Template filter: the parameters of a section as 'Label value, ...' """
+    return ', '.join('%s %s' % (value['label'], value['value']) for value in values)
+
+
+@functools.lru_cache(maxsize=None)
+def environment():
+    """ The Jinja2 Environment of this process, its compiled templates are cached """
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(TEMPLATES),
+        autoescape=jinja2.select_autoescape(['html']),
+        auto_reload=False,
+        trim_blocks=True,
+        lstrip_blocks=True,
+    )
+    env.filters['parameters'] = parameters
+    return env
+
+
+def template(format):
+    """ Compiled template of an output format, 'html' or 'txt' """
+    if format not in FORMATS:
+        raise ValueError(' '.join(['Unknown format:', repr(format)]))
+    return environment().get_template(FORMATS[format])
+
+
+def format_of(filename):
+    """ Output format from a file name's extension, html unless it's .txt """
+    return 'txt' if filename.lower().endswith('.txt') else 'html'
+
+
+def render(patches, format='html', title='GP-8 patches'):
+    """ Generate the sheets of an iterable of RolandGp8 patches, as chunks of text """
+    return template(format).generate(title=title, patches=(sheet(patch) for patch in patches))
+
+
+def write(patches, filename, format=None, title='GP-8 patches'):
+    """ Stream the sheets of patches into a file """
+    format = format or format_of(filename)
+    with open(filename, 'w', encoding='utf-8') as file:
+        for chunk in render(patches, format, title):
+            file.write(chunk)
+
+
+def _render_block(format, block, file, **context):
+    """ Write one block of a template into an open file """
+    compiled = template(format)
+    for chunk in compiled.blocks[block](compiled.new_context(context)):
+        file.write(chunk)
+
+
+def _render_part(source, first, last, format, filename):
+    """ Worker: render the patches block of records first to last of source into filename """
+    with PatchBank.open(source) as bank, open(filename, 'w', encoding='utf-8') as file:
+        _render_block(format, 'patches', file, patches=(sheet(bank[index]) for index in range(first, last)))
+    return filename
+
+
+def render_file(source, destination, format=None, title=None, workers=None, chunk=CHUNK):
+    """ Render the sheets of a sysex file, fanning out over worker processes.
+
+    Args:
+        source ([str]): Sysex dump (records back to back).
+        destination ([str]): Output file.
+        format ([str]): 'html' or 'txt', default from the destination's extension.
+        title ([str]): Heading, default the source's file name.
+        workers ([int]): Processes, default one per CPU. 1 renders in this process.
+        chunk ([int]): Patches rendered per worker job.
+
+    Returns:
+        [int]: Number of patches rendered.
+    """
+    format = format or format_of(destination)
+    title = title or os.path.basename(source)
+    with PatchBank.open(source) as bank:
+        count = len(bank)
+        if workers == 1 or count <= chunk:
+            write((bank[index] for index in range(count)), destination, format, title)
+            return count
+    parts = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(destination)))
+    try:
+        with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+            futures = [pool.submit(_render_part, source, first, min(count, first + chunk), format,
+                                   os.path.join(parts, '%08d' % first))
+                       for first in range(0, count, chunk)]
+            with open(destination, 'w', encoding='utf-8') as file:
+                _render_block(format, 'header', file, title=title)
+                for future in futures:
+                    with open(future.result(), encoding='utf-8') as part:
+                        shutil.copyfileobj(part, file)
+                    os.remove(part.name)
+                _render_block(format, 'footer', file, title=title)
+    finally:
+        shutil.rmtree(parts, ignore_errors=True)
+    return count
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source', help='sysex dump')
+    parser.add_argument('destination', help='.html or .txt file')
+    parser.add_argument('--title')
+    parser.add_argument('--workers', type=int, help='processes, default one per CPU')
+    options = parser.parse_args()
+    print('Rendered %d patches' % render_file(options.source, options.destination, title=options.title,
+                                              workers=options.workers))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+''' "Sounds like" search: the k patches nearest to a given one.
+
+A patch is compared as a vector of its int and bool parameters plus its eight
+effect switches. The distance is the weighted sum of squared differences, each
+parameter scaled to its own range so Volume (0-100) and the EV-5 parameter
+(0-27) count the same, plus the weight of every effect switch that differs.
+
+The search is columnar, like PatchBank: the index keeps one bytes column per
+parameter. For a query, every possible byte value's (16 bit) distance from the
+query value goes in a translate table, so translating a column gives the
+distance of every patch for that parameter at C speed, and those are summed in
+16 bit lanes of one big int (see columnar.py), one addition per parameter,
+carried into 32 bit lanes whenever the next one could overflow.
+'''
+
+import array
+import functools
+import heapq
+import itertools
+import sys
+
+import columnar
+import schema as _schema
+from RolandGp8 import EFFECT_SWITCHES, PARAMETERS
+
+'''Distance of two patches a whole range apart in one parameter, at weight 1'''
+SCALE = 1000
+
+'''Bytes per lane of the distance sums'''
+LANE = 4
+
+'''Largest distance summed in one 16 bit lane before it's carried into 32 bits'''
+LANE_LIMIT = 0xFFFF
+
+'''Largest weight of a parameter, and of all effect switches together: a lane holds no more'''
+MAX_WEIGHT = LANE_LIMIT / SCALE
+
+'''Distances sampled by nearest() to pick the patches worth a closer look'''
+SAMPLE = 1024
+
+'''Parameter names by the effect they belong to (ie. chorus: chorus_rate, ...)'''
+EFFECT_PARAMETERS = {effect: [name for name, field in PARAMETERS.items() if field.category
+                              and field.category.lower() == effect] for effect in EFFECT_SWITCHES}
+
+'''Parameter bytes are 7 bit: values over 127 are clamped, the top bit then
+selects the high byte of the distance in the interleaved columns'''
+_CLAMP = columnar.table(lambda byte: min(byte, 127))
+_HIGH = columnar.table(lambda byte: min(byte, 127) | 0x80)
+
+
+def _span(field):
+    """ Difference between the lowest and highest legal value of a parameter """
+    if isinstance(field, _schema.BoolField):
+        return 100
+    legal = [value for value in range(256) if field.legal[value]]
+    return (legal[-1] - legal[0]) or 1
+
+
+def _check(weights, effects):
+    """ Raise ValueError for a weight the distance lanes can't hold, rather
+        than clamping it and quietly changing the ranking
+    """
+    for name, weight in weights.items():
+        if not 0 <= weight <= MAX_WEIGHT:
+            raise ValueError(' '.join(['Weight of', name, 'is', repr(weight), 'not within 0 -', str(MAX_WEIGHT)]))
+    weights = [effects.get(name, 1) for name in EFFECT_SWITCHES]
+    if min(weights) < 0 or sum(weights) > MAX_WEIGHT:
+        raise ValueError(' '.join(['Effect weights must be positive and add up to', str(MAX_WEIGHT), 'at most']))
+
+
+def _limit(weight):
+    """ Largest distance a parameter contributes at weight """
+    return min(LANE_LIMIT, round(weight * SCALE))
+
+
+@functools.lru_cache(maxsize=1024)
+def _differences(name, weight):
+    """ Distance of two values of a parameter by their difference (0-127),
+        as (low bytes, high bytes)
+    """
+    span = _span(PARAMETERS[name])
+    distances = [min(_limit(weight), round(weight * SCALE * (min(difference, span) / span) ** 2))
+                 for difference in range(128)]
+    return bytes(distance & 0xFF for distance in distances), bytes(distance >> 8 for distance in distances)
+
+
+def _table(name, value, weight):
+    """ Translate table of an interleaved column: the low byte of the distance
+        of every value from value at the value, the high byte at value | 80h.
+    """
+    low, high = _differences(name, weight)
+    value = min(value, 127)
+    # distance[byte] = difference[abs(byte - value)]: the differences up to
+    # value backwards, then from 0 forwards
+    return (low[value:0:-1] + low[:128 - value]) + (high[value:0:-1] + high[:128 - value])
+
+
+@functools.lru_cache(maxsize=1024)
+def _effect_tables(effects, weights):
+    """ Translate tables of the distance of every packed effects byte from effects """
+    distances = [min(LANE_LIMIT, round(SCALE * sum(weight for bit, weight in weights if (byte ^ effects) & bit)))
+                 for byte in range(256)]
+    return bytes(distance & 0xFF for distance in distances), bytes(distance >> 8 for distance in distances)
+
+
+def _carry(total, count):
+    """ Move the count 16 bit lanes of total into LANE byte lanes """
+    data = total.to_bytes(count * 2, 'little')
+    lanes = bytearray(count * LANE)
+    lanes[0::LANE] = data[0::2]
+    lanes[1::LANE] = data[1::2]
+    return int.from_bytes(lanes, 'little')
+
+
+def effects_byte(patch):
+    """ The effect switches of a patch packed like the library does, EFFECT_MSB << 4 | EFFECT_LSB """
+    return sum(bit for name, bit in EFFECT_SWITCHES.items() if getattr(patch, name))
+
+
+def distance(a, b, weights=None, effects=None):
+    """ Distance between two patches, as SimilarityIndex.distances() measures it """
+    weights = weights or {}
+    effects = effects or {}
+    _check(weights, effects)
+    total = 0
+    for name, field in PARAMETERS.items():
+        weight = weights.get(name, 1)
+        if weight:
+            low, high = _differences(name, weight)
+            difference = abs(min(a._record[field.position], 127) - min(b._record[field.position], 127))
+            total += low[difference] | high[difference] << 8
+    effect_weights = tuple((bit, effects.get(name, 1)) for name, bit in EFFECT_SWITCHES.items())
+    low, high = _effect_tables(effects_byte(a), effect_weights)
+    effects = effects_byte(b)
+    return total + (low[effects] | high[effects] << 8)
+
+
+class SimilarityIndex():
+    """ Columns of the parameters of a PatchBank, searched by weighted distance.
+
+        Usage:
+            index = SimilarityIndex(bank)
+            for distance, position in index.nearest(patch, 5, weights={'volume': 0}):
+                print(distance, bank[position])
+    """
+
+    def __init__(self, bank):
+        """
+        Args:
+            bank ([PatchBank]): The patches, positions in results are indexes into it.
+        """
+        self._count = len(bank)
+        # Every parameter column is kept interleaved with itself | 80h, so one
+        # translate() gives the 16 bit little endian distance of every patch
+        self._columns = {}
+        for name, field in PARAMETERS.items():
+            column = bank.column(field.key)
+            interleaved = bytearray(self._count * 2)
+            interleaved[0::2] = column.translate(_CLAMP)
+            interleaved[1::2] = column.translate(_HIGH)
+            self._columns[name] = bytes(interleaved)
+        msb = columnar.table(lambda byte: byte << 4)
+        packed = (int.from_bytes(bank.column('EFFECT_MSB').translate(msb), 'little')
+                  | int.from_bytes(bank.column('EFFECT_LSB'), 'little'))
+        self._effects = packed.to_bytes(self._count, 'little')
+
+    def __len__(self):
+        return self._count
+
+    def distances(self, patch, weights=None, effects=None, active_only=False):
+        """ Distance of every patch of the index from patch.
+
+        Args:
+            patch ([RolandGp8]): The query.
+            weights ([dict]): Weight of parameters (ie. {'volume': 0.5}), default 1,
+                              0 ignores the parameter, MAX_WEIGHT at most.
+            effects ([dict]): Weight of effect switches (ie. {'chorus': 4}), default 1,
+                              0 ignores whether the effect is on or off. All
+                              eight add up to MAX_WEIGHT at most.
+            active_only ([bool]): Ignore the parameters of effects which are off
+                                  in patch.
+
+        Returns:
+            [array]: One unsigned int per patch, in index order.
+
+        Raises:
+            ValueError: A weight out of range.
+        """
+        weights = dict(weights or {})
+        if active_only:
+            for effect, names in EFFECT_PARAMETERS.items():
+                if not getattr(patch, effect):
+                    weights.update(dict.fromkeys(names, 0))
+        effects = effects or {}
+        _check(weights, effects)
+        record = patch._record
+        effect_weights = tuple((bit, effects.get(name, 1)) for name, bit in EFFECT_SWITCHES.items())
+        low, high = _effect_tables(effects_byte(patch), effect_weights)
+        total = columnar.widen16(self._effects.translate(low), self._effects.translate(high), LANE)
+        # Parameters are summed in 16 bit lanes for as long as they can't overflow
+        lanes = 0
+        room = LANE_LIMIT
+        for name, column in self._columns.items():
+            weight = weights.get(name, 1)
+            if not weight:
+                continue
+            if _limit(weight) > room:
+                total += _carry(lanes, self._count)
+                lanes = 0
+                room = LANE_LIMIT
+            room -= _limit(weight)
+            lanes += int.from_bytes(column.translate(_table(name, record[PARAMETERS[name].position], weight)),
+                                    'little')
+        total += _carry(lanes, self._count)
+        distances = array.array('I' if array.array('I').itemsize == LANE else 'L')
+        distances.frombytes(total.to_bytes(self._count * LANE, 'little'))
+        if sys.byteorder == 'big':
+            distances.byteswap()
+        return distances
+
+    def nearest(self, patch, k=5, **options):
+        """ The k patches of the index nearest to patch, see distances() for the options.
+
+        Returns:
+            [list]: (distance, position) pairs, nearest first.
+        """
+        distances = self.distances(patch, **options)
+        candidates = range(self._count)
+        if self._count > SAMPLE * 4:
+            # Only look closer at the patches no further than the 4k-th nearest
+            # of an even sample, found with C level iteration. If too few
+            # are that close, fall back to looking at all of them.
+            sample = sorted(distances[::self._count // SAMPLE])
+            threshold = sample[min(len(sample) - 1, 4 * k)]
+            close = list(itertools.compress(candidates, map(threshold.__ge__, distances)))
+            if len(close) >= k:
+                candidates = close
+        return [(distances[position], position)
+                for position in heapq.nsmallest(k, candidates, key=distances.__getitem__)]
+
+    def within(self, patch, radius, **options):
+        """ (distance, position) of every patch no further than radius from patch, nearest first """
+        distances = self.distances(patch, **options)
+        close = itertools.compress(range(self._count), map(radius.__ge__, distances))
+        return sorted((distances[position], position) for position in close)
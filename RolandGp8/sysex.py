@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+''' Streaming SYSEX framing.
+
+Splits an arbitrary stream of bytes (a dump file, a socket, a MIDI port) into
+complete F0 ... F7 system exclusive messages. Chunks may be cut anywhere, other
+manufacturers' messages and junk between frames are skipped, and truncated
+frames are dropped.
+'''
+
+import devices.gp8 as _gp8
+
+SYSEX_BEGIN = 0xF0
+SYSEX_END = 0xF7
+ROLAND_ID = 0x41
+GP8_MODEL_ID = 0x13
+
+'''Roland commands: Request data 1 and Data set 1'''
+RQ1 = 0x11
+DT1 = 0x12
+
+'''Data bytes in one program, from the first byte after the address to the name terminator'''
+PROGRAM_SIZE = _gp8.CHECKSUM_END - _gp8.DATA_START
+
+'''MIDI real time messages may legally appear inside a sysex message'''
+_REALTIME = bytes(range(0xF8, 0x100))
+
+'''Framer state while skipping the rest of an oversized message'''
+_DISCARD = object()
+
+
+class Framer():
+    """ Incremental sysex framer with a constant memory footprint.
+
+        Only the frame currently being assembled is buffered, and it is never
+        allowed to grow past max_length. Every byte is scanned exactly once.
+    """
+
+    def __init__(self, gp8_only=True, max_length=512):
+        """
+        Args:
+            gp8_only ([bool]): Only yield Roland GP-8 (41h .. 13h) messages.
+            max_length ([int]): Longest message kept, anything longer is dropped.
+        """
+        self.gp8_only = gp8_only
+        self.max_length = max_length
+        self.dropped = 0
+        self._partial = None
+
+    def feed(self, chunk):
+        """ Feed the next chunk of the stream.
+
+        Args:
+            chunk ([bytes]): bytes or bytearray, of any length.
+
+        Yields:
+            [bytes]: Every message completed by this chunk.
+        """
+        position = 0
+        length = len(chunk)
+        while position < length:
+            if self._partial is None:
+                start = chunk.find(SYSEX_BEGIN, position)
+                if start < 0:
+                    return
+                self._partial = bytearray()
+                position = start
+            collecting = self._partial is not _DISCARD
+            end = chunk.find(SYSEX_END, position)
+            stop = length if end < 0 else end + 1
+            # A new F0 before the end means the message in progress was truncated
+            begin = position + 1 if collecting and not self._partial else position
+            restart = chunk.rfind(SYSEX_BEGIN, begin, stop)
+            if restart >= 0:
+                # Every F0 before the last starts a message cut short by the next
+                self.dropped += chunk.count(SYSEX_BEGIN, begin, restart)
+                if collecting and not self._partial:
+                    self.dropped += 1
+                self._drop()
+                self._partial = bytearray()
+                position = restart
+                collecting = True
+            if collecting:
+                self._partial += chunk[position:stop]
+                if len(self._partial) > self.max_length:
+                    self._drop()
+                    self._partial = _DISCARD
+            position = stop
+            if end >= 0:
+                frame = self._complete()
+                if frame is not None:
+                    yield frame
+
+    @property
+    def pending(self):
+        """ True while a message has been started but not finished """
+        return self._partial is not None
+
+    def _drop(self):
+        """ Forget the message in progress, counting it if it had started """
+        if self._partial is not _DISCARD and self._partial:
+            self.dropped += 1
+        self._partial = None
+
+    def _complete(self):
+        """ Validate the message just closed by an F7 and reset for the next one """
+        partial, self._partial = self._partial, None
+        if partial is _DISCARD:
+            return None
+        frame = bytes(partial).translate(None, _REALTIME)
+        if len(frame) < 3 or max(frame[1:-1]) >= 0x80:
+            self.dropped += 1
+            return None
+        if self.gp8_only and (len(frame) < 5 or frame[1] != ROLAND_ID or frame[3] != GP8_MODEL_ID):
+            return None
+        return frame
+
+
+def iter_frames(chunks, **kwargs):
+    """ Yield every complete message from an iterable of byte chunks """
+    framer = Framer(**kwargs)
+    for chunk in chunks:
+        yield from framer.feed(chunk)
+
+
+def read_frames(file, chunk_size=65536, **kwargs):
+    """ Yield every complete message in a binary file object, read in chunks """
+    return iter_frames(iter(lambda: file.read(chunk_size), b''), **kwargs)
+
+
+def roland_checksum(data):
+    """ Roland checksum of the address and data bytes of a message: the value
+        which brings their sum to a multiple of 128.
+    """
+    return -sum(data) & 0x7F
+
+
+def dt1(address, data, device_id=0):
+    """ Build a Data set 1 (12h) message.
+
+    Args:
+        address ([tuple]): (MSB, LSB) address the data is written to.
+        data ([bytes]): Data bytes, 7 bit each.
+        device_id ([int]): Zero indexed MIDI channel of the unit.
+    """
+    body = bytes(address) + bytes(data)
+    return bytes([SYSEX_BEGIN, ROLAND_ID, device_id, GP8_MODEL_ID, DT1]) + body + bytes([roland_checksum(body), SYSEX_END])
+
+
+def rq1(address, size=PROGRAM_SIZE, device_id=0):
+    """ Build a Request data 1 (11h) message for size bytes starting at address.
+
+        The size is sent as two 7 bit bytes, MSB first, after the address.
+    """
+    body = bytes(address) + bytes([size >> 7 & 0x7F, size & 0x7F])
+    return bytes([SYSEX_BEGIN, ROLAND_ID, device_id, GP8_MODEL_ID, RQ1]) + body + bytes([roland_checksum(body), SYSEX_END])
+
+
+def address_of(frame):
+    """ (MSB, LSB) address of a DT1/RQ1 message """
+    return frame[5], frame[6]
+
+
+def is_program(frame):
+    """ True if frame is a full GP-8 program record (DT1, 59 bytes) """
+    return len(frame) == _gp8.RECORD_LENGTH and frame[4] == 0x12
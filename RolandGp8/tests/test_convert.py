@@ -0,0 +1,80 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PatchBank import PatchBank
+import convert
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_text_round_trip(self):
+        for format in convert.FORMATS:
+            patches = convert.loads(convert.dumps(self.bank, format), format)
+            self.assertEqual(PatchBank.from_patches(patches).tobytes(), self.bank.tobytes(), format)
+
+    def test_odd_bytes_round_trip(self):
+        ''' Values out of range and unswitched effects bits survive the text formats '''
+        patch = self.bank[0]
+        patch._record[16] = 120
+        patch._record[8] |= 0x40
+        patch.fix_checksum()
+        for format in convert.FORMATS:
+            self.assertEqual(convert.loads(convert.dumps([patch], format), format)[0]._record, patch._record, format)
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            convert.dumps(self.bank, 'xml')
+
+    def tree(self):
+        ''' A small archive: the sample dump at a few places, and a file to be ignored '''
+        source = os.path.join(self.directory, 'syx')
+        for relative in ['a.syx', 'one/b.syx', 'one/two/c.SYX']:
+            os.makedirs(os.path.dirname(os.path.join(source, relative)), exist_ok=True)
+            shutil.copy(SAMPLE_DUMP, os.path.join(source, relative))
+        with open(os.path.join(source, 'notes.txt'), 'w') as file:
+            file.write('Not a dump')
+        return source
+
+    def test_tree_round_trip(self):
+        source = self.tree()
+        for format, workers in [('json', 1), ('yaml', 2)]:
+            text = os.path.join(self.directory, format)
+            back = os.path.join(self.directory, format + '-syx')
+            self.assertEqual(convert.convert_tree(source, text, format, workers, chunk_bytes=1), (3, 384, []))
+            self.assertTrue(os.path.exists(os.path.join(text, 'one', 'two', 'c' + convert.FORMATS[format])))
+            self.assertEqual(convert.convert_tree(text, back, format, workers), (3, 384, []))
+            with open(os.path.join(back, 'one', 'b.syx'), 'rb') as file:
+                self.assertEqual(file.read(), self.bank.tobytes())
+
+    def test_tree_keeps_going(self):
+        ''' A file that can't be converted is reported, every other one is still converted '''
+        source = self.tree()
+        text = os.path.join(self.directory, 'json')
+        convert.convert_tree(source, text, 'json', 1)
+        with open(os.path.join(text, 'one', 'b.json'), 'w') as file:
+            file.write('[{"od_drive": 120}]')
+        back = os.path.join(self.directory, 'back')
+        for workers in (1, 2):
+            files, patches, failed = convert.convert_tree(text, back, 'json', workers, chunk_bytes=1)
+            self.assertEqual((files, patches), (2, 256))
+            self.assertEqual([path for path, message in failed], [os.path.join(text, 'one', 'b.json')])
+            self.assertIn('OD_DRIVE', failed[0][1])
+            self.assertTrue(os.path.exists(os.path.join(back, 'one', 'two', 'c.syx')))
+
+    def test_batches(self):
+        found = [('a', 'x', 10), ('b', 'y', 10), ('c', 'z', 30), ('d', 'w', 1)]
+        self.assertEqual(list(convert.batches(found, 20)), [[('a', 'x'), ('b', 'y')], [('c', 'z')], [('d', 'w')]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import asyncio
+import os
+import unittest
+import sysex
+from PatchBank import PatchBank
+from delta import DeltaTracker, MESSAGE_OVERHEAD
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class Recorder():
+    ''' Stands in for a Transport, remembers what was written '''
+
+    def __init__(self):
+        self.written = []
+
+    async def write(self, message):
+        self.written.append(message)
+
+
+class TestDeltaTracker(unittest.TestCase):
+
+    def setUp(self):
+        self.patch = PatchBank.from_file(SAMPLE_DUMP)[5]
+        self.tracker = DeltaTracker(self.patch)
+        self.address = sysex.address_of(self.patch._record)
+
+    def test_nothing_changed(self):
+        self.assertEqual(self.tracker.messages(), [])
+        self.assertEqual(self.tracker.changed_fields(), [])
+
+    def test_single_parameter(self):
+        ''' One changed parameter goes out as one 10 byte message at its own address '''
+        self.patch.od_drive = (self.patch.od_drive + 1) % 100
+        messages = self.tracker.messages()
+        self.assertEqual(len(messages), 1)
+        message = messages[0]
+        self.assertEqual(len(message), MESSAGE_OVERHEAD + 1)
+        self.assertEqual(sysex.address_of(message), (self.address[0], self.address[1] + 16 - 7))
+        self.assertEqual(message[7], self.patch.od_drive)
+        self.assertEqual(sysex.roland_checksum(message[5:8]), message[8])
+        self.assertEqual(self.tracker.changed_fields(), ['OD_DRIVE'])
+
+    def test_nearby_changes_merge(self):
+        ''' Changed bytes a few apart cost less as one message, gap included '''
+        self.patch.od_drive = (self.patch.od_drive + 1) % 100
+        self.patch.od_tone = (self.patch.od_tone + 1) % 100
+        messages = self.tracker.messages()
+        self.assertEqual(len(messages), 1)
+        self.assertEqual(self.tracker.runs(), [(15, 16)])
+
+    def test_distant_changes_split(self):
+        self.patch.od_drive = (self.patch.od_drive + 1) % 100
+        self.patch.name = 'Delta'
+        runs = self.tracker.runs()
+        self.assertEqual(len(runs), 2)
+        messages = self.tracker.messages()
+        self.assertEqual(len(messages), 2)
+        self.assertIn('NAME', self.tracker.changed_fields())
+
+    def test_many_changes_send_whole_record(self):
+        ''' A run over every data byte costs as much as the record itself '''
+        for position in range(7, 57, 7):
+            self.patch._record[position] ^= 1
+        self.assertEqual(self.tracker.runs(), [(7, 56)])
+        self.assertEqual(self.tracker.messages(), [bytes(self.patch._record)])
+
+    def test_moved_patch_sends_whole_record(self):
+        self.patch._record[6] ^= 0x40
+        self.assertEqual(self.tracker.messages(), [bytes(self.patch._record)])
+
+    def test_never_synced(self):
+        tracker = DeltaTracker(self.patch, synced=False)
+        self.assertEqual(tracker.messages(), [bytes(self.patch._record)])
+
+    def test_messages_rebuild_patch(self):
+        ''' Applying the messages to the old record gives the new record '''
+        old = bytearray(self.patch._record)
+        self.patch.od_drive = (self.patch.od_drive + 1) % 100
+        self.patch.delay_level = (self.patch.delay_level + 1) % 100
+        self.patch.name = 'Rebuilt'
+        for message in self.tracker.messages():
+            start = message[6] - self.address[1] + 7
+            old[start:start + len(message) - MESSAGE_OVERHEAD] = message[7:-2]
+        self.assertEqual(old[:57], self.patch._record[:57])
+
+    def test_sync(self):
+        recorder = Recorder()
+        self.patch.od_drive = (self.patch.od_drive + 1) % 100
+        asyncio.run(self.tracker.sync(recorder))
+        self.assertEqual(len(recorder.written), 1)
+        self.assertEqual(self.tracker.messages(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
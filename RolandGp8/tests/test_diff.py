@@ -0,0 +1,76 @@
+import json
+import os
+import unittest
+from PatchBank import PatchBank
+from diff import diff, decode, LOCATION
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.old = PatchBank.from_file(SAMPLE_DUMP)
+        self.new = PatchBank(self.old.tobytes())
+
+    def test_identical(self):
+        for by in ('slot', 'name', 'hash'):
+            result = diff(self.old, self.new, by)
+            self.assertFalse(result)
+            self.assertEqual(result.unchanged, 128)
+
+    def test_fields_by_slot(self):
+        patch = self.new.view(12)
+        patch.od_drive = 99 if patch.od_drive != 99 else 98
+        patch.chorus = not patch.chorus
+        patch.name = 'Renamed'
+        result = diff(self.old, self.new)
+        self.assertEqual(len(result.changes), 1)
+        change = result.changes[0]
+        self.assertEqual((change.a, change.b), (12, 12))
+        self.assertEqual(change.fields['OD_DRIVE'], (self.old[12].od_drive, patch.od_drive))
+        self.assertEqual(change.fields['CHORUS'], (self.old[12].chorus, patch.chorus))
+        self.assertEqual(change.fields['NAME'], (self.old[12].name, 'Renamed         '))
+        self.assertEqual(set(change.fields), {'OD_DRIVE', 'CHORUS', 'NAME'})
+
+    def test_unswitched_effect_bits(self):
+        ''' Effects byte bits outside the switches are reported as the raw byte '''
+        record = self.new.view(20)._record
+        before = record[7]
+        record[7] = before ^ 0x30
+        result = diff(self.old, self.new)
+        self.assertEqual(result.changes[0].fields, {'EFFECT_MSB': (before, before ^ 0x30)})
+        self.assertIn('EFFECT_MSB', result.report()[0])
+
+    def test_moved_by_name_and_hash(self):
+        ''' A sorted bank holds the same patches, only their locations changed '''
+        self.new.sort('name')
+        result = diff(self.old, self.new, 'hash')
+        self.assertEqual((result.removed, result.added), ([], []))
+        self.assertTrue(all(set(change.fields) == {LOCATION} for change in result.changes))
+        self.assertEqual(len(result.changes) + result.unchanged, 128)
+        change = result.changes[0]
+        self.assertEqual(change.fields[LOCATION], (decode(self.old[change.a]._record, LOCATION),
+                                                   decode(self.new[change.b]._record, LOCATION)))
+
+    def test_added_and_removed(self):
+        names = [patch.name.strip().lower() for patch in self.old]
+        unique = [index for index, name in enumerate(names) if names.count(name) == 1][0]
+        self.new.view(unique).name = 'Brand New'
+        result = diff(self.old, self.new, 'name')
+        self.assertEqual(result.removed, [unique])
+        self.assertEqual(result.added, [unique])
+        data = json.loads(json.dumps(result.to_dict()))
+        self.assertEqual(data['added'], [{'new': unique, 'name': 'Brand New'}])
+        self.assertEqual(data['unchanged'], 127)
+        report = result.report()
+        self.assertTrue(report[0].startswith('-') and report[1].startswith('+'))
+        self.assertEqual(report[-1], '0 changed, 1 removed, 1 added, 127 unchanged')
+
+    def test_bad_alignment(self):
+        with self.assertRaises(ValueError):
+            diff(self.old, self.new, 'colour')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import asyncio
+import os
+import unittest
+import sysex
+from RolandGp8 import RolandGp8
+from PatchBank import PatchBank
+from transport import Transport
+from emulator import Gp8Emulator, TEMP, locate, address_of_slot
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestAddresses(unittest.TestCase):
+
+    def test_locate(self):
+        self.assertEqual(locate((0x40, 0x00)), (0, 0))
+        self.assertEqual(locate((0x40, 0x40)), (1, 0))
+        self.assertEqual(locate((0x41, 0x09)), (2, 9))
+        self.assertEqual(locate((0x7F, 0x71)), (127, 49))
+        self.assertEqual(locate((0x00, 0x05)), (TEMP, 5))
+        self.assertIsNone(locate((0x40, 0x32)))
+        self.assertIsNone(locate((0x10, 0x00)))
+
+    def test_round_trip(self):
+        for slot in list(range(128)) + [TEMP]:
+            self.assertEqual(locate(address_of_slot(slot)), (slot, 0))
+
+
+class TestEmulator(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        host, self.unit = Gp8Emulator.pair(baud=None, processing=0.0)
+        self.unit.load(self.bank)
+        await self.unit.start()
+        self.midi = Transport(host, timeout=0.5)
+        await self.midi.start()
+
+    async def asyncTearDown(self):
+        await self.midi.close()
+        await self.unit.close()
+
+    async def test_request_programs(self):
+        ''' Every program comes back exactly as it was dumped '''
+        replies = await asyncio.gather(*[self.midi.request(sysex.address_of(patch._record))
+                                         for patch in self.bank])
+        self.assertEqual(b''.join(replies), self.bank.tobytes())
+        self.assertEqual(self.unit.answered, 128)
+
+    async def test_write_program(self):
+        patch = self.bank[7]
+        patch.name = 'Emulated'
+        await self.midi.send(patch)
+        received = await self.midi.request_program(sysex.address_of(patch._record))
+        self.assertEqual(received.name, patch.name.ljust(16))
+        self.assertEqual(received._record, patch._record)
+
+    async def test_partial_write(self):
+        ''' A DT1 into the middle of a program changes just those bytes '''
+        address = sysex.address_of(self.bank[2]._record)
+        await self.midi.send_data((address[0], address[1] + 9), bytes([42]))
+        received = await self.midi.request_program(address)
+        self.assertEqual(received.od_drive, 42)
+        self.assertTrue(received.verify_checksum())
+        self.assertEqual(self.unit.written, 1)
+
+    async def test_temp_area(self):
+        patch = RolandGp8()
+        patch.volume = 12
+        await self.midi.send(patch)
+        received = await self.midi.request_program((0x00, 0x00))
+        self.assertEqual(received.volume, 12)
+        self.assertEqual(self.unit.program(TEMP)._record, patch._record)
+        self.assertEqual(self.unit.program(0)._record, self.bank[0]._record)
+
+    async def test_bad_checksum_rejected(self):
+        message = bytearray(sysex.dt1((0x40, 0x09), bytes([1])))
+        message[-2] ^= 1
+        await self.midi.write(message)
+        await self.midi.request((0x40, 0x00))
+        self.assertEqual(self.unit.rejected, 1)
+        self.assertEqual(self.unit.program(0)._record, self.bank[0]._record)
+
+    async def test_nothing_at_address(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.midi.request((0x20, 0x00), timeout=0.05)
+        self.assertEqual(self.unit.rejected, 1)
+
+
+class TestEmulatorFaults(unittest.IsolatedAsyncioTestCase):
+
+    async def connect(self, **kwargs):
+        host, self.unit = Gp8Emulator.pair(processing=0.0, seed=8, **kwargs)
+        await self.unit.start()
+        self.midi = Transport(host, timeout=0.2)
+        await self.midi.start()
+
+    async def asyncTearDown(self):
+        await self.midi.close()
+        await self.unit.close()
+
+    async def test_line_timing(self):
+        ''' A request and its reply take at least their time on the wire '''
+        await self.connect()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await self.midi.request((0x40, 0x00))
+        self.assertGreaterEqual(loop.time() - started, (12 + 59) / 3125)
+
+    async def test_corrupt_replies(self):
+        await self.connect(baud=None, corrupt_rate=1.0)
+        with self.assertRaises(ValueError):
+            await self.midi.request((0x40, 0x00))
+        self.assertEqual(self.unit.faults, 1)
+
+    async def test_dropped_bytes(self):
+        ''' A reply missing a byte fails or times out the request, never completes it '''
+        await self.connect(baud=None, drop_rate=1.0)
+        failed = 0
+        for slot in range(4):
+            try:
+                reply = await self.midi.request((0x40 + slot, 0x00), timeout=0.05)
+            except (asyncio.TimeoutError, ValueError):
+                failed += 1
+                continue
+            # Anything handed back must be a whole, valid frame
+            self.assertEqual(len(reply), 59)
+            self.assertTrue(RolandGp8(reply).verify_checksum())
+        self.assertEqual(failed, 4)
+        self.assertEqual(self.unit.faults, 4)
+
+    async def test_slow_replies(self):
+        await self.connect(baud=None, slow_rate=1.0, slow_delay=0.3)
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.midi.request((0x40, 0x00), timeout=0.1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import io
+import os
+import unittest
+from PatchBank import PatchBank
+import hexdump
+import sysex
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+TEXT_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'misc', 'Text converted memory dump.txt')
+
+
+class TestHexDump(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.records = [bytes(patch._record) for patch in self.bank]
+
+    def text(self, records, separator=' ', line_end='\r\n\r\n', upper=True):
+        lines = [record.hex(separator) if separator else record.hex() for record in records]
+        text = line_end.join(lines) + line_end
+        return io.BytesIO((text.upper() if upper else text).encode())
+
+    def test_memory_dump(self):
+        ''' The text dump in misc/ is the sample sysex dump '''
+        self.assertEqual(hexdump.read_bank(TEXT_DUMP).tobytes(), self.bank.tobytes())
+
+    def test_spacing_and_case(self):
+        for separator, line_end, upper in [(' ', '\n', False), (',', '\n', True), ('\t', ' ', True), ('', '\n\n', False)]:
+            for block_size in (hexdump.BLOCK_SIZE, 100, 1000):
+                buffer = bytearray()
+                text = self.text(self.records, separator, line_end, upper)
+                self.assertEqual(hexdump.read_into(text, buffer, block_size), len(self.records))
+                self.assertEqual(bytes(buffer), self.bank.tobytes(), (separator, line_end, block_size))
+
+    def test_other_messages(self):
+        ''' Requests and stray bytes between programs are skipped '''
+        records = self.records[:10] + [sysex.rq1((0x40, 0x00)), b'\x00\x01'] + self.records[10:20]
+        patches = list(hexdump.iter_patches(self.text(records), block_size=500))
+        self.assertEqual([bytes(patch._record) for patch in patches], self.records[:20])
+
+    def test_read_into_appends(self):
+        buffer = bytearray(self.records[0])
+        self.assertEqual(hexdump.read_into(self.text(self.records[1:5]), buffer), 4)
+        self.assertEqual(bytes(buffer), b''.join(self.records[:5]))
+
+    def test_bad_text(self):
+        for text in [b'F0 41 0G\n', b'F0 41 0\n']:
+            with self.assertRaises(ValueError):
+                list(hexdump.iter_blocks(io.BytesIO(text)))
+
+
+if __name__ == '__main__':
+    unittest.main()
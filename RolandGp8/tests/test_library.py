@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+import unittest
+from RolandGp8 import RolandGp8, content_hash
+from PatchBank import PatchBank
+from library import Library
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestLibrary(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.dump = os.path.join(self.directory, 'bank.syx')
+        shutil.copy(SAMPLE_DUMP, self.dump)
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.library = Library(os.path.join(self.directory, 'library.db'))
+
+    def tearDown(self):
+        self.library.close()
+        shutil.rmtree(self.directory)
+
+    def test_ingest(self):
+        self.assertEqual(self.library.ingest(self.directory), 128)
+        self.assertEqual(len(self.library), len({content_hash(patch._record) for patch in self.bank}))
+        self.assertEqual(self.library.sources(self.bank[3]), [(os.path.abspath(self.dump), 3)])
+
+    def test_incremental(self):
+        ''' Unchanged files are skipped, changed ones replaced, identical patches stored once '''
+        self.library.ingest(self.directory)
+        stored = len(self.library)
+        self.assertEqual(self.library.ingest(self.directory), 0)
+        shutil.copy(SAMPLE_DUMP, os.path.join(self.directory, 'copy.syx'))
+        self.assertEqual(self.library.ingest(self.directory), 128)
+        self.assertEqual(len(self.library), stored)
+        self.assertEqual(len(self.library.sources(self.bank[3])), 2)
+
+        self.bank.set('volume', 7)
+        with open(self.dump, 'wb') as file:
+            file.write(self.bank.tobytes())
+        os.utime(self.dump, ns=(1, 1))
+        self.assertEqual(self.library.ingest(self.dump), 128)
+        self.assertEqual(self.library.count(volume=7), len(self.library.find(volume=7)))
+        self.assertEqual(self.library.sources(self.bank[3]), [(os.path.abspath(self.dump), 3)])
+
+    def test_modified_file(self):
+        ''' Patches only found in the old version of a file are forgotten '''
+        self.library.ingest(self.dump)
+        old = self.bank[3]
+        self.bank.set('volume', 7)
+        with open(self.dump, 'wb') as file:
+            file.write(self.bank.tobytes())
+        os.utime(self.dump, ns=(1, 1))
+        self.assertEqual(self.library.ingest(self.dump), 128)
+        self.assertEqual(self.library.sources(old), [])
+        self.assertEqual(len(self.library), len({content_hash(patch._record) for patch in self.bank}))
+        self.assertEqual(self.library.count(), len(self.library))
+        self.assertEqual(self.library.count(volume=7), len(self.library))
+
+    def test_deleted_file(self):
+        ''' A file deleted from the tree takes the patches found only there with it '''
+        copy = os.path.join(self.directory, 'copy.syx')
+        shutil.copy(SAMPLE_DUMP, copy)
+        self.library.ingest(self.directory)
+        stored = len(self.library)
+        os.remove(copy)
+        self.assertEqual(self.library.ingest(self.directory), 0)
+        self.assertEqual(len(self.library), stored)
+        self.assertEqual(self.library.sources(self.bank[3]), [(os.path.abspath(self.dump), 3)])
+        os.remove(self.dump)
+        self.assertEqual(self.library.prune(self.directory), 1)
+        self.assertEqual(len(self.library), 0)
+        self.assertEqual(self.library.find(), [])
+
+    def test_find_effects(self):
+        self.library.ingest(self.dump)
+        expected = [patch for patch in self.bank if patch.distortion and not patch.chorus and patch.volume > 60]
+        found = self.library.find(distortion=True, chorus=False, volume=range(61, 128))
+        self.assertEqual({content_hash(p._record) for p in found}, {content_hash(p._record) for p in expected})
+        self.assertEqual(len(found), len({content_hash(p._record) for p in expected}))
+        self.assertEqual(self.library.count(distortion=True), len({content_hash(p._record) for p in self.bank
+                                                                   if p.distortion}))
+
+    def test_find_parameters(self):
+        self.library.ingest(self.dump)
+        patch = self.bank[10]
+        found = self.library.find(od_drive=patch.od_drive, od_turbo=patch.od_turbo, name=patch.name.rstrip())
+        self.assertIn(patch.name, [p.name for p in found])
+        for p in found:
+            self.assertEqual(p.od_drive, patch.od_drive)
+            self.assertEqual(p.od_turbo, patch.od_turbo)
+
+    def test_find_name_glob(self):
+        patch = RolandGp8()
+        patch.name = 'Glob Lead'
+        self.library.add([patch])
+        self.assertEqual([p.name for p in self.library.find(name='Glob*')], [patch.name])
+        self.assertEqual(self.library.find(name='*Lead', limit=1)[0].name, patch.name)
+
+    def test_bad_condition(self):
+        with self.assertRaises(ValueError):
+            self.library.find(no_such_field=1)
+        with self.assertRaises(ValueError):
+            self.library.find(volume=range(0, 100, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
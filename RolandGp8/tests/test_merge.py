@@ -0,0 +1,94 @@
+import os
+import unittest
+from PatchBank import PatchBank
+from merge import merge, ADDED, DELETED
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.base = PatchBank.from_file(SAMPLE_DUMP)
+        self.ours = PatchBank(self.base.tobytes())
+        self.theirs = PatchBank(self.base.tobytes())
+
+    def test_unchanged(self):
+        result = merge(self.base, self.ours, self.theirs)
+        self.assertEqual(result.bank.tobytes(), self.base.tobytes())
+        self.assertEqual(result.conflicts, [])
+
+    def test_non_overlapping(self):
+        ''' Changes to different fields, or different effects of one byte, are combined '''
+        self.ours.view(3).volume = 99
+        self.ours.view(3).chorus = not self.base[3].chorus
+        self.theirs.view(3).name = 'Theirs'
+        self.theirs.view(3).delay = not self.base[3].delay
+        self.theirs.view(70).od_drive = 1
+        result = merge(self.base, self.ours, self.theirs)
+        self.assertEqual(result.conflicts, [])
+        patch = result.bank[3]
+        self.assertEqual((patch.volume, patch.name), (99, 'Theirs          '))
+        self.assertEqual((patch.chorus, patch.delay), (not self.base[3].chorus, not self.base[3].delay))
+        self.assertEqual(result.bank[70].od_drive, 1)
+        self.assertEqual(result.bank.verify_checksums(), [])
+
+    def test_conflicts(self):
+        self.ours.view(5).volume = 11
+        self.theirs.view(5).volume = 12
+        self.ours.view(5).name = 'Same'
+        self.theirs.view(5).name = 'Same'
+        self.ours.view(9).phaser = not self.base[9].phaser
+        self.theirs.view(9).phaser = not self.base[9].phaser
+        result = merge(self.base, self.ours, self.theirs)
+        self.assertEqual([(c.base, c.field, c.values) for c in result.conflicts],
+                         [(5, 'VOLUME', (self.base[5].volume, 11, 12))])
+        self.assertEqual(result.bank[5].volume, 11)
+        self.assertEqual(result.bank[5].name, 'Same            ')
+        self.assertEqual(merge(self.base, self.ours, self.theirs, prefer='theirs').bank[5].volume, 12)
+        self.assertIn('VOLUME', merge(self.base, self.ours, self.theirs).report()[0])
+
+    def test_deleted_and_added(self):
+        ''' By name: a patch deleted by theirs goes, unless ours changed it '''
+        names = [patch.name.strip().lower() for patch in self.base]
+        unique = [index for index, name in enumerate(names) if names.count(name) == 1]
+        self.theirs.view(unique[0]).name = 'Added By Theirs'
+        self.theirs.view(unique[1]).name = 'Also Theirs'
+        self.ours.view(unique[1]).volume = 0 if self.base[unique[1]].volume else 1
+        result = merge(self.base, self.ours, self.theirs, by='name')
+        merged = [patch.name.strip() for patch in result.bank]
+        self.assertEqual(len(result.bank), 128 + 1)
+        self.assertNotIn(self.base[unique[0]].name.strip(), merged)
+        self.assertEqual(merged.count(self.base[unique[1]].name.strip()), 1)
+        self.assertEqual(merged[-2:], ['Added By Theirs', 'Also Theirs'])
+        self.assertEqual([(c.base, c.ours, c.theirs, c.field) for c in result.conflicts],
+                         [(unique[1], unique[1], None, DELETED)])
+        self.assertEqual(result.bank.verify_checksums(), [])
+
+    def test_added_by_both(self):
+        ''' The same patches added on both sides are kept once '''
+        for by in ('slot', 'name', 'hash'):
+            result = merge(PatchBank(), self.ours, self.theirs, by=by)
+            self.assertEqual(result.bank.tobytes(), self.base.tobytes(), by)
+            self.assertEqual(result.conflicts, [], by)
+
+    def test_added_at_one_slot(self):
+        ''' Two different patches added at one slot are a conflict, only one is kept '''
+        ours = PatchBank.from_patches([self.base[0]])
+        theirs = PatchBank.from_patches([self.base[2]])
+        theirs.view(0).location = self.base[0].location
+        result = merge(PatchBank(), ours, theirs)
+        self.assertEqual(list(result.bank.slots()), [0])
+        self.assertEqual(result.bank[0].name, self.base[0].name)
+        self.assertEqual([(c.base, c.ours, c.theirs, c.field) for c in result.conflicts], [(None, 0, 0, ADDED)])
+        result = merge(PatchBank(), ours, theirs, prefer='theirs')
+        self.assertEqual(result.bank[0].name, self.base[2].name)
+        self.assertEqual(result.bank.verify_checksums(), [])
+
+    def test_bad_prefer(self):
+        with self.assertRaises(ValueError):
+            merge(self.base, self.ours, self.theirs, prefer='mine')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,306 @@
+import os
+import shutil
+import tempfile
+import unittest
+import addresses
+from RolandGp8 import RolandGp8
+from PatchBank import PatchBank, EFFECT_BITS, inverse
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestPatchBank(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+
+    def test_length(self):
+        ''' The example dump holds 128 programs '''
+        self.assertEqual(len(self.bank), 128)
+        self.assertEqual(len(PatchBank(count=10)), 10)
+
+    def test_bad_buffer_length(self):
+        ''' A buffer which isn't whole records is refused '''
+        with self.assertRaises(ValueError):
+            PatchBank(bytes(60))
+
+    def test_getitem_matches_record(self):
+        ''' Indexing returns the same record as reading the dump by hand '''
+        with open(SAMPLE_DUMP, 'rb') as file:
+            file.seek(59 * 3)
+            record = file.read(59)
+        self.assertEqual(bytes(self.bank[3]._record), record)
+        self.assertEqual(self.bank[-1].name, self.bank[127].name)
+        with self.assertRaises(IndexError):
+            self.bank[128]
+
+    def test_get_int_column(self):
+        ''' Column read matches per object property access '''
+        drive = self.bank.get('OD_DRIVE')
+        self.assertEqual(list(drive), [p.od_drive for p in self.bank])
+
+    def test_get_bool_and_string(self):
+        self.assertEqual(self.bank.get('OD_TURBO'), [p.od_turbo for p in self.bank])
+        self.assertEqual(self.bank.get('NAME'), [p.name for p in self.bank])
+
+    def test_set_scalar(self):
+        ''' One value written to every record '''
+        bank = PatchBank(count=10000)
+        bank.set('VOLUME', 77)
+        self.assertEqual(bank.get('VOLUME'), bytes([77]) * 10000)
+        self.assertEqual(bank[9999].volume, 77)
+
+    def test_set_sequence(self):
+        values = bytes(range(0, 128 * 2, 2)[:128])
+        self.bank.set('od_tone', [v % 101 for v in values])
+        self.assertEqual(self.bank[5].od_tone, 10)
+
+    def test_set_out_of_range(self):
+        ''' Out of range values are refused, and nothing is written '''
+        before = self.bank.tobytes()
+        with self.assertRaises(ValueError):
+            self.bank.set('VOLUME', 101)
+        with self.assertRaises(ValueError):
+            self.bank.set('VOLUME', [50] * 127 + [101])
+        with self.assertRaises(ValueError):
+            self.bank.set('VOLUME', [50] * 3)
+        self.assertEqual(self.bank.tobytes(), before)
+
+    def test_set_bool_and_string(self):
+        self.bank.set('EXT_CONTROL_1', True)
+        self.assertTrue(all(self.bank.get('EXT_CONTROL_1')))
+        self.bank.set('NAME', 'Bulk')
+        self.assertEqual(self.bank[42].name, 'Bulk            ')
+
+    def test_effects(self):
+        self.assertEqual(self.bank.get_effect('chorus'), [p.chorus for p in self.bank])
+        self.bank.set_effect('CHORUS', True)
+        self.bank.set_effect('DISTORTION', False)
+        self.assertTrue(all(p.chorus and not p.distortion for p in self.bank))
+
+    def test_effect_histograms(self):
+        ''' Bulk effect statistics agree with the effects property of every patch '''
+        combinations = {}
+        for patch in self.bank:
+            keys = tuple(key for key, label in zip(EFFECT_BITS, patch.effects) if patch.effects[label])
+            combinations[keys] = combinations.get(keys, 0) + 1
+        self.assertEqual(self.bank.effect_combinations(), combinations)
+        self.assertEqual(sum(self.bank.effect_combinations().values()), 128)
+        counts = self.bank.effect_counts()
+        self.assertEqual(counts['CHORUS'], sum(self.bank.get_effect('CHORUS')))
+        matrix = self.bank.effect_matrix()
+        self.assertEqual(list(matrix['DYNAMIC_FILTER']), [int(on) for on in self.bank.get_effect('DYNAMIC_FILTER')])
+        self.assertEqual(self.bank.effects_column()[5], self.bank[5]._record[7] << 4 | self.bank[5]._record[8])
+
+    def test_slots(self):
+        ''' The example dump holds every program memory in address order '''
+        self.assertEqual(self.bank.slots(), bytes(range(128)))
+        bank = PatchBank(count=3)
+        bank._buffer[2 * 59 + 6] = 0x20
+        self.assertEqual(bank.slots(), bytes([addresses.TEMP, addresses.TEMP, addresses.INVALID]))
+
+    def test_relocate_and_renumber(self):
+        before = self.bank.tobytes()
+        self.bank.relocate(range(127, -1, -1))
+        self.assertEqual(self.bank[0].location, ('B', 8, 8))
+        self.assertEqual(self.bank[127].location, ('A', 1, 1))
+        self.assertEqual(self.bank.verify_checksums(), [])
+        self.bank.renumber()
+        self.assertEqual(self.bank.tobytes(), before)
+        self.bank.relocate([addresses.TEMP] * 128)
+        self.assertEqual(self.bank[9].location, addresses.TEMP_LOCATION)
+        self.assertEqual(self.bank.verify_checksums(), [])
+        with self.assertRaises(ValueError):
+            self.bank.relocate([200] * 128)
+        with self.assertRaises(ValueError):
+            self.bank.renumber(1)
+
+    def test_sort_by_name(self):
+        before = self.bank.tobytes()
+        names = [patch.name for patch in self.bank]
+        order = self.bank.sort('name')
+        self.assertEqual([patch.name for patch in self.bank], [names[index] for index in order])
+        self.assertEqual([patch.name.strip().lower() for patch in self.bank],
+                         sorted(name.strip().lower() for name in names))
+        # Every position keeps its address, and every checksum is right
+        self.assertEqual(self.bank.slots(), bytes(range(128)))
+        self.assertEqual(self.bank.verify_checksums(), [])
+        self.bank.permute(inverse(order))
+        self.assertEqual(self.bank.tobytes(), before)
+
+    def test_sort_by_field(self):
+        order = self.bank.sort('VOLUME', reverse=True, keep_addresses=False)
+        volumes = [patch.volume for patch in self.bank]
+        self.assertEqual(volumes, sorted(volumes, reverse=True))
+        ties = [index for index, volume in zip(order, volumes) if volume == volumes[0]]
+        self.assertEqual(ties, sorted(ties))
+        self.assertEqual(sorted(self.bank.slots()), list(range(128)))
+        self.bank.sort('effects')
+        self.assertEqual(list(self.bank.effects_column()), sorted(self.bank.effects_column()))
+
+    def test_setlist_order(self):
+        names = [patch.name for patch in self.bank]
+        order = self.bank.setlist_order([names[40], 'no such patch', names[3].strip().upper(), names[3]])
+        self.assertEqual(order[0], 40)
+        self.assertEqual([names[index] for index in order[1:3]], [names[3]] * 2)
+        self.assertEqual(sorted(order), list(range(128)))
+
+    def test_permute_memory_mapped(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'bank.syx')
+            shutil.copy(SAMPLE_DUMP, filename)
+            with PatchBank.open(filename, writable=True) as bank:
+                order = bank.sort('name')
+            with PatchBank.open(filename) as bank:
+                self.assertEqual(bank[0].name, self.bank[order[0]].name)
+                self.assertEqual(bank.verify_checksums(), [])
+            with self.assertRaises(ValueError):
+                self.bank.permute([0] * 128)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_checksums(self):
+        ''' The example dump is clean, corrupt records are reported and fixed '''
+        self.assertEqual(self.bank.verify_checksums(), [])
+        self.bank._buffer[5 * 59 + 20] ^= 0x01
+        self.bank._buffer[90 * 59 + 57] ^= 0x10
+        self.assertEqual(self.bank.verify_checksums(), [5, 90])
+        self.assertEqual(self.bank.fix_checksums(), [5, 90])
+        self.assertEqual(self.bank.verify_checksums(), [])
+        self.assertTrue(self.bank[5].verify_checksum())
+
+    def test_checksums_kept_on_bulk_write(self):
+        self.bank.set('VOLUME', 100)
+        self.bank.set('OD_TURBO', [i % 2 for i in range(128)])
+        self.bank.set('NAME', 'Bulk')
+        self.bank.set_effect('PHASER', True)
+        self.assertEqual(self.bank.verify_checksums(), [])
+
+    def test_out_of_range(self):
+        ''' Whole columns validated against the compiled legal values tables '''
+        self.assertEqual(self.bank.out_of_range('VOLUME'), [])
+        # The example dump itself holds a few bools stored as neither 00h nor 64h
+        self.assertEqual(self.bank.out_of_range('OD_TURBO'), [85, 102])
+        self.bank._buffer[3 * 59 + 36] = 101
+        self.bank._buffer[9 * 59 + 17] = 1
+        self.bank._buffer[7 * 59 + 45] = 0x80
+        self.assertEqual(self.bank.out_of_range('volume'), [3])
+        self.assertEqual(self.bank.out_of_range('OD_TURBO'), [9, 85, 102])
+        self.assertEqual(self.bank.out_of_range('NAME'), [7])
+        self.assertEqual(self.bank.out_of_range('SYSEX_END'), [])
+
+    def test_set_many(self):
+        ''' Fields and effects written in one pass, checksums kept '''
+        self.bank.set_many({'VOLUME': 90, 'od_drive': [i % 101 for i in range(128)], 'NAME': 'Many',
+                            'chorus': True, 'DISTORTION': [i % 2 for i in range(128)]})
+        patch = self.bank[3]
+        self.assertEqual((patch.volume, patch.od_drive, patch.name), (90, 3, 'Many            '))
+        self.assertTrue(patch.chorus and patch.distortion and not self.bank[4].distortion)
+        self.assertEqual(self.bank.verify_checksums(), [])
+
+    def test_set_many_all_or_nothing(self):
+        before = self.bank.tobytes()
+        with self.assertRaises(ValueError):
+            self.bank.set_many({'VOLUME': 90, 'NAME': 'Fine', 'OD_DRIVE': [50] * 127 + [101]})
+        with self.assertRaises(KeyError):
+            self.bank.set_many({'VOLUME': 90, 'NO_SUCH_FIELD': 1})
+        self.assertEqual(self.bank.tobytes(), before)
+
+    def test_transaction_rolls_back(self):
+        before = self.bank.tobytes()
+        with self.assertRaises(ValueError):
+            with self.bank.transaction():
+                self.bank.set('VOLUME', 90)
+                self.bank.set_effect('CHORUS', True)
+                self.bank.set('VOLUME', 101)
+        self.assertEqual(self.bank.tobytes(), before)
+
+    def test_checksums_blocks(self):
+        ''' Banks bigger than one block are checked block by block '''
+        import PatchBank as module
+        bank = PatchBank(count=10)
+        bank._buffer[7 * 59 + 30] = 1
+        block, module.BLOCK = module.BLOCK, 3
+        try:
+            self.assertEqual(bank.verify_checksums(), [7])
+            self.assertEqual(bank.fix_checksums(), [7])
+            self.assertEqual(bank.verify_checksums(), [])
+        finally:
+            module.BLOCK = block
+
+    def test_round_trip(self):
+        patches = [RolandGp8() for i in range(3)]
+        patches[1].name = 'Middle'
+        bank = PatchBank.from_patches(patches)
+        self.assertEqual(bank[1].name, 'Middle          ')
+        bank[0] = patches[1]
+        bank.append(patches[2])
+        self.assertEqual(len(bank), 4)
+        self.assertEqual(bank[0].name, 'Middle          ')
+
+
+class TestPatchBankMapped(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'library.syx')
+        shutil.copy(SAMPLE_DUMP, self.filename)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_open_read_only(self):
+        ''' A memory mapped bank reads the same as a loaded one '''
+        with PatchBank.open(self.filename) as bank:
+            self.assertEqual(len(bank), 128)
+            self.assertEqual(bank.get('NAME'), PatchBank.from_file(SAMPLE_DUMP).get('NAME'))
+            with self.assertRaises(TypeError):
+                bank.set('VOLUME', 10)
+
+    def test_close_with_live_view(self):
+        ''' Closing leaves the bank empty, a live view keeps reading the map '''
+        bank = PatchBank.open(self.filename)
+        patch = bank.view(5)
+        bank.close()
+        self.assertEqual(len(bank), 0)
+        self.assertEqual(patch.name, PatchBank.from_file(SAMPLE_DUMP)[5].name)
+
+    def test_open_bad_length(self):
+        with open(self.filename, 'ab') as file:
+            file.write(b'\xF0\x41')
+        with self.assertRaises(ValueError):
+            PatchBank.open(self.filename)
+
+    def test_view_is_zero_copy(self):
+        ''' A view wraps the bank buffer, writes land in the bank '''
+        bank = PatchBank.from_file(SAMPLE_DUMP)
+        patch = bank.view(7)
+        self.assertIsInstance(patch._record, memoryview)
+        patch.od_drive = 99
+        patch.name = 'Viewed'
+        self.assertEqual(bank.get('OD_DRIVE')[7], 99)
+        self.assertEqual(bank[7].name, 'Viewed          ')
+        self.assertEqual(len(bank.tobytes()), 128 * 59)
+
+    def test_writable_view_writes_file(self):
+        ''' Writes through a view of a writable map go back to the file in place '''
+        with PatchBank.open(self.filename, writable=True) as bank:
+            patch = bank.view(3)
+            patch.volume = 42
+            patch.chorus = True
+            bank.set('EQ_HI', 11)
+        with open(self.filename, 'rb') as file:
+            data = file.read()
+        self.assertEqual(len(data), 128 * 59)
+        self.assertEqual(RolandGp8(data[3 * 59:4 * 59]).volume, 42)
+        self.assertTrue(RolandGp8(data[3 * 59:4 * 59]).chorus)
+        self.assertEqual(PatchBank(data).get('EQ_HI'), bytes([11]) * 128)
+
+    def test_open_empty_file(self):
+        open(self.filename, 'wb').close()
+        self.assertEqual(len(PatchBank.open(self.filename)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
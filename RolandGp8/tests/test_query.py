@@ -0,0 +1,64 @@
+import os
+import unittest
+from PatchBank import PatchBank
+from query import Query, select, tokenize
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestQuery(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+
+    def brute_force(self, predicate):
+        return [index for index, patch in enumerate(self.bank) if predicate(patch)]
+
+    def test_example(self):
+        query = Query('distortion and not chorus and od_drive >= 80 and name ~ "Lead"')
+        expected = self.brute_force(lambda p: p.distortion and not p.chorus and p.od_drive >= 80
+                                    and 'lead' in p.name.lower())
+        self.assertTrue(expected)
+        self.assertEqual(query.indexes(self.bank), expected)
+        self.assertEqual(query.count(self.bank), len(expected))
+        self.assertEqual([view.name for view in query.views(self.bank)], [self.bank[i].name for i in expected])
+
+    def test_precedence_and_literals(self):
+        ''' not binds tighter than and, and tighter than or '''
+        self.assertEqual(select(self.bank, 'od_turbo == false or chorus and not volume < 0x20'),
+                         self.brute_force(lambda p: not p.od_turbo or (p.chorus and not p.volume < 32)))
+        self.assertEqual(select(self.bank, '(phaser or delay) and filter != true'),
+                         self.brute_force(lambda p: (p.phaser or p.delay) and not p.filter))
+
+    def test_names(self):
+        name = self.bank[17].name
+        self.assertEqual(select(self.bank, 'name == "%s"' % name.rstrip()),
+                         self.brute_force(lambda p: p.name == name))
+        self.assertEqual(select(self.bank, "name != '%s'" % name),
+                         self.brute_force(lambda p: p.name != name))
+        self.assertEqual(select(self.bank, 'name ~ "wa wa"'), self.brute_force(lambda p: 'wa wa' in p.name.lower()))
+
+    def test_blank_names(self):
+        ''' An empty string finds blank names, and ~ "" every record '''
+        self.bank.view(5).name = ''
+        self.bank.view(127).name = ''
+        self.assertEqual(select(self.bank, 'name == ""'), [5, 127])
+        self.assertEqual(select(self.bank, 'name != ""'), self.brute_force(lambda p: p.name.strip()))
+        self.assertEqual(select(self.bank, 'name ~ ""'), list(range(128)))
+        self.assertEqual(select(PatchBank(), 'name == ""'), [])
+
+    def test_errors(self):
+        for text in ['no_such_field', 'od_drive >= "80"', 'chorus > 1', 'name >= 3', '(chorus', 'chorus chorus',
+                     'od_drive >=', 'volume $ 3']:
+            with self.assertRaises(ValueError, msg=text):
+                Query(text)
+
+    def test_tokenize(self):
+        self.assertEqual([token.value for token in tokenize('not(A>=0x10)')], ['not', '(', 'a', '>=', 16, ')'])
+
+    def test_empty_bank(self):
+        self.assertEqual(select(PatchBank(), 'chorus'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
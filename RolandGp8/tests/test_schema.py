@@ -0,0 +1,61 @@
+import os
+import unittest
+from RolandGp8 import RolandGp8
+from PatchBank import PatchBank
+import schema
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+
+    def test_every_field_compiled(self):
+        ''' Every int, bool and string field plus the 8 effect switches is a descriptor '''
+        fields = RolandGp8._fields
+        self.assertEqual(len([f for f in fields.values() if isinstance(f, schema.EffectSwitch)]), 8)
+        self.assertIsInstance(fields['od_drive'], schema.Field)
+        self.assertIsInstance(fields['filter'], schema.EffectSwitch)
+        self.assertIsInstance(fields['name'], schema.StringField)
+        for attribute in fields:
+            self.assertIsInstance(RolandGp8.__dict__[attribute], property)
+
+    def test_descriptors_match_read_value(self):
+        ''' Compiled getters agree with the dictionary driven _read_value '''
+        for patch in self.bank:
+            for attribute, field in RolandGp8._fields.items():
+                if type(field) in (schema.Field, schema.BoolField):
+                    self.assertEqual(getattr(patch, attribute), patch._read_value(field.key))
+
+    def test_legal_values_tables(self):
+        ''' Every field of the data dictionary has a 256 entry table of legal bytes '''
+        legal = RolandGp8._legal
+        self.assertEqual(set(legal), set(RolandGp8._gp8))
+        self.assertTrue(all(len(table) == 256 for table in legal.values()))
+        self.assertEqual([value for value in range(256) if legal['GROUP'][value]], [0x00, 0x40])
+        self.assertEqual([value for value in range(256) if legal['OD_TURBO'][value]], [0x00, 0x64])
+        self.assertEqual([value for value in range(256) if legal['SYSEX_BEGIN'][value]], [0xF0])
+        self.assertEqual(legal['OD_DRIVE'].count(1), 101)
+        self.assertEqual(legal['NAME'].count(1), 128)
+
+    def test_wrong_type_refused(self):
+        p = RolandGp8()
+        with self.assertRaises(ValueError):
+            p.od_drive = '50'
+        with self.assertRaises(ValueError):
+            p.od_drive = 5.0
+
+    def test_effect_reset(self):
+        ''' Deleting an effect switch turns the effect off '''
+        p = RolandGp8()
+        p.filter = True
+        p.chorus = True
+        del p.filter
+        self.assertFalse(p.filter)
+        self.assertTrue(p.chorus)
+
+
+if __name__ == '__main__':
+    unittest.main()
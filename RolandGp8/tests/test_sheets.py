@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PatchBank import PatchBank
+from RolandGp8 import RolandGp8
+import sheets
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestSheets(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self, filename):
+        with open(filename, encoding='utf-8') as file:
+            return file.read()
+
+    def test_sheet(self):
+        patch = self.bank[0]
+        values = sheets.sheet(patch)
+        self.assertEqual(values['slot'], 'A-1-1')
+        self.assertEqual(values['name'], patch.name.rstrip())
+        sections = {section['label']: section for section in values['sections']}
+        self.assertEqual(sections['Chorus']['on'], patch.chorus)
+        self.assertEqual(sections['Overdrive']['on'], patch.overdrive)
+        self.assertTrue(sections[sheets.PATCH_SECTION]['on'])
+        self.assertIn({'label': 'Rate', 'value': patch.chorus_rate}, sections['Chorus']['parameters'])
+        self.assertEqual(sheets.sheet(RolandGp8())['slot'], 'Temp')
+
+    def test_text(self):
+        text = ''.join(sheets.render([self.bank[0]], 'txt', 'Sample'))
+        self.assertTrue(text.startswith('Sample\n======\n'))
+        self.assertIn('Chorus       Rate %d, ' % self.bank[0].chorus_rate, text)
+        # Effects which are off are left out of the text sheet
+        self.assertNotIn('Overdrive    Tone', text)
+
+    def test_html_escaped(self):
+        patch = RolandGp8()
+        patch.name = 'Rock&Roll'
+        html = ''.join(sheets.render([patch], 'html', '<Title>'))
+        self.assertIn('Rock&amp;Roll', html)
+        self.assertIn('&lt;Title&gt;', html)
+        self.assertNotIn('<Title>', html)
+
+    def test_template_cached(self):
+        self.assertIs(sheets.template('html'), sheets.template('html'))
+        with self.assertRaises(ValueError):
+            sheets.template('pdf')
+
+    def test_render_file(self):
+        for format in sheets.FORMATS:
+            single = os.path.join(self.directory, 'single.' + format)
+            parallel = os.path.join(self.directory, 'parallel.' + format)
+            self.assertEqual(sheets.render_file(SAMPLE_DUMP, single, workers=1), len(self.bank))
+            self.assertEqual(sheets.render_file(SAMPLE_DUMP, parallel, workers=2, chunk=50), len(self.bank))
+            self.assertEqual(self.read(parallel), self.read(single))
+        self.assertEqual(sorted(os.listdir(self.directory)),
+                         ['parallel.html', 'parallel.txt', 'single.html', 'single.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
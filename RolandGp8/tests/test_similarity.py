@@ -0,0 +1,87 @@
+import os
+import random
+import unittest
+from PatchBank import PatchBank
+from similarity import SimilarityIndex, SAMPLE, MAX_WEIGHT, distance
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestSimilarity(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.index = SimilarityIndex(self.bank)
+
+    def brute_force(self, patch, k, **options):
+        return sorted((distance(patch, other, **options), position) for position, other in enumerate(self.bank))[:k]
+
+    def test_distances_match_pairwise(self):
+        patch = self.bank[9]
+        self.assertEqual(list(self.index.distances(patch)), [distance(patch, other) for other in self.bank])
+
+    def test_nearest(self):
+        for position in (0, 17, 100):
+            patch = self.bank[position]
+            nearest = self.index.nearest(patch, 8)
+            self.assertEqual(nearest, self.brute_force(patch, 8))
+            self.assertEqual(nearest[0][0], 0)
+
+    def test_weights(self):
+        ''' With every other parameter ignored, only volume and the effects count '''
+        patch = self.bank[30]
+        weights = {name: 0 for name in self.index._columns if name != 'volume'}
+        effects = dict.fromkeys(['phaser', 'equalizer', 'delay', 'chorus', 'filter', 'compressor', 'overdrive',
+                                 'distortion'], 0)
+        for found, position in self.index.nearest(patch, 10, weights=weights, effects=effects):
+            self.assertEqual(found, distance(patch, self.bank[position], weights, effects))
+        same_volume = [position for position, other in enumerate(self.bank) if other.volume == patch.volume]
+        zero = [position for found, position in self.index.within(patch, 0, weights=weights, effects=effects)]
+        self.assertEqual(zero, [position for position, other in enumerate(self.bank)
+                                if distance(patch, other, weights, effects) == 0])
+        self.assertTrue(set(same_volume) <= set(zero))
+
+    def test_weights_out_of_range(self):
+        ''' Weights the distance lanes can't hold raise instead of being clamped '''
+        patch = self.bank[30]
+        self.index.distances(patch, weights={'volume': MAX_WEIGHT})
+        for weights, effects in [({'volume': 100}, None), ({'volume': -1}, None),
+                                 (None, {'chorus': 60, 'delay': 6}), (None, {'chorus': -1})]:
+            with self.assertRaises(ValueError):
+                self.index.distances(patch, weights=weights, effects=effects)
+            with self.assertRaises(ValueError):
+                distance(patch, self.bank[0], weights, effects)
+
+    def test_active_only(self):
+        ''' Parameters of effects that are off don't count '''
+        patch = self.bank[40]
+        patch.chorus = False
+        changed = self.bank[40]
+        changed.chorus = False
+        changed.chorus_rate = (changed.chorus_rate + 50) % 100
+        bank = PatchBank.from_patches([patch, changed])
+        index = SimilarityIndex(bank)
+        self.assertEqual(index.distances(patch, active_only=True)[1], 0)
+        self.assertGreater(index.distances(patch)[1], 0)
+
+    def test_within(self):
+        patch = self.bank[5]
+        radius = sorted(self.index.distances(patch))[10]
+        self.assertEqual(self.index.within(patch, radius),
+                         [pair for pair in self.brute_force(patch, len(self.bank)) if pair[0] <= radius])
+
+    def test_large_index(self):
+        ''' Large indexes only look closely at the candidates picked from a sample '''
+        rng = random.Random(12)
+        bank = PatchBank(self.bank.tobytes() * (SAMPLE * 5 // len(self.bank)))
+        for name in ['od_drive', 'volume', 'chorus_rate', 'eq_gain']:
+            bank.set(name, bytes(rng.randrange(101) for _ in range(len(bank))))
+        index = SimilarityIndex(bank)
+        for position in (3, 4000):
+            distances = index.distances(bank[position])
+            expected = sorted((found, other) for other, found in enumerate(distances))[:6]
+            self.assertEqual(index.nearest(bank[position], 6), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
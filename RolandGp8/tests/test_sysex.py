@@ -0,0 +1,78 @@
+import io
+import os
+import unittest
+from RolandGp8 import RolandGp8
+from sysex import Framer, iter_frames, read_frames, is_program
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestFramer(unittest.TestCase):
+
+    def setUp(self):
+        with open(SAMPLE_DUMP, 'rb') as file:
+            self.dump = file.read()
+        self.records = [self.dump[i:i + 59] for i in range(0, len(self.dump), 59)]
+
+    def test_whole_dump(self):
+        ''' Every record of a clean dump comes out unchanged '''
+        self.assertEqual(list(iter_frames([self.dump])), self.records)
+
+    def test_any_chunk_size(self):
+        ''' Frames split across chunks are reassembled '''
+        for size in [1, 7, 58, 59, 60, 1000]:
+            chunks = [self.dump[i:i + size] for i in range(0, len(self.dump), size)]
+            self.assertEqual(list(iter_frames(chunks)), self.records)
+
+    def test_read_frames(self):
+        frames = list(read_frames(io.BytesIO(self.dump), chunk_size=100))
+        self.assertEqual(len(frames), 128)
+        self.assertTrue(all(is_program(frame) for frame in frames))
+        self.assertEqual(RolandGp8(frames[0]).name, ' Dig Chorus     ')
+
+    def test_skips_other_messages(self):
+        ''' Other manufacturers' sysex, junk and channel messages are skipped '''
+        other = bytes.fromhex('F0 43 10 4C 00 00 7E 00 F7')
+        stream = b'\x90\x40\x7f' + other + self.records[0] + b'junk' + other + self.records[1]
+        self.assertEqual(list(iter_frames([stream])), self.records[:2])
+        self.assertEqual(len(list(iter_frames([stream], gp8_only=False))), 4)
+
+    def test_truncated_frame(self):
+        ''' A frame cut short by the start of the next one is dropped '''
+        framer = Framer()
+        frames = list(framer.feed(self.records[0][:30]))
+        frames += list(framer.feed(self.records[1] + self.records[2][:10]))
+        frames += list(framer.feed(self.records[2][10:]))
+        self.assertEqual(frames, self.records[1:3])
+        self.assertEqual(framer.dropped, 1)
+
+    def test_truncated_frames_same_chunk(self):
+        ''' Frames cut short inside one chunk are counted too '''
+        framer = Framer()
+        frames = list(framer.feed(self.records[0][:30] + self.records[1][:20] + self.records[2]))
+        self.assertEqual(frames, [self.records[2]])
+        self.assertEqual(framer.dropped, 2)
+        frames = list(framer.feed(self.records[3][:10] + self.records[4]))
+        self.assertEqual(frames, [self.records[4]])
+        self.assertEqual(framer.dropped, 3)
+
+    def test_realtime_bytes_removed(self):
+        ''' Timing clock bytes inside a frame don't corrupt it '''
+        record = self.records[5]
+        stream = record[:20] + b'\xf8' + record[20:40] + b'\xfe' + record[40:]
+        self.assertEqual(list(iter_frames([stream])), [record])
+
+    def test_oversized_frame(self):
+        ''' A runaway message is dropped and never buffered past max_length '''
+        framer = Framer(max_length=100)
+        stream = b'\xf0\x41' + b'\x00' * 10000 + b'\xf7' + self.records[0]
+        frames = []
+        for i in range(0, len(stream), 64):
+            frames += framer.feed(stream[i:i + 64])
+            self.assertFalse(isinstance(framer._partial, bytearray) and len(framer._partial) > 100)
+        self.assertEqual(frames, [self.records[0]])
+        self.assertEqual(framer.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
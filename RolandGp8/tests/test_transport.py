@@ -0,0 +1,121 @@
+import asyncio
+import os
+import unittest
+import sysex
+from RolandGp8 import RolandGp8
+from PatchBank import PatchBank
+from transport import Backend, Transport, LoopbackBackend, pty_pair
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+async def fake_unit(backend, bank, received, delay=0.0):
+    ''' Minimal stand-in for a GP-8: answers RQ1 for program addresses, records DT1 '''
+    programs = {sysex.address_of(patch._record): patch for patch in bank}
+    framer = sysex.Framer()
+    while True:
+        chunk = await backend.read()
+        if not chunk:
+            return
+        for frame in framer.feed(chunk):
+            if frame[4] == sysex.RQ1 and sysex.address_of(frame) in programs:
+                await asyncio.sleep(delay)
+                await backend.write(bytes(programs[sysex.address_of(frame)]._record))
+            elif frame[4] == sysex.DT1:
+                received.append(frame)
+
+
+class TestTransport(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.received = []
+        host, unit = LoopbackBackend.pair()
+        self.unit = asyncio.ensure_future(fake_unit(unit, self.bank, self.received))
+        self.midi = Transport(host, timeout=0.5, max_pending=4)
+        await self.midi.start()
+
+    async def asyncTearDown(self):
+        await self.midi.close()
+        await self.unit
+
+    async def test_request_program(self):
+        patch = await self.midi.request_program((0x40, 0x40))
+        self.assertEqual(patch.name, ' Dry Rhythm     ')
+
+    async def test_pipelined_requests(self):
+        ''' Many requests in flight at once each get their own reply '''
+        addresses = [sysex.address_of(patch._record) for patch in self.bank]
+        replies = await asyncio.gather(*[self.midi.request(address) for address in addresses])
+        self.assertEqual(b''.join(replies), self.bank.tobytes())
+        self.assertEqual(self.midi._pending, {})
+
+    async def test_timeout(self):
+        ''' An address the unit never answers times out and is cleaned up '''
+        with self.assertRaises(asyncio.TimeoutError):
+            await self.midi.request((0x7F, 0x7F), timeout=0.05)
+        self.assertEqual(self.midi._pending, {})
+
+    async def test_short_frame(self):
+        ''' A DT1 too short for an address is counted and the reader keeps going '''
+        await self.midi.backend.peer.write(b'\xF0\x41\x00\x13\x12\xF7')
+        patch = await self.midi.request_program((0x40, 0x40))
+        self.assertEqual(patch.name, ' Dry Rhythm     ')
+        self.assertEqual(self.midi.dropped, 1)
+
+    async def test_bad_reply(self):
+        ''' A reply of the wrong length or with a bad checksum fails the request '''
+        record = bytearray(self.bank[0]._record)
+        record[5:7] = b'\x7F\x7F'
+        for reply in (bytes(record[:30] + record[31:]), bytes(record)):
+            request = asyncio.ensure_future(self.midi.request((0x7F, 0x7F)))
+            await asyncio.sleep(0.01)
+            self.midi._dispatch(reply)
+            with self.assertRaises(ValueError):
+                await request
+        self.assertEqual(self.midi._pending, {})
+
+    async def test_send(self):
+        patch = RolandGp8()
+        patch.name = 'Sent'
+        await self.midi.send(patch)
+        await self.midi.send_data((0x00, 0x09), bytes([42]))
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.received, [bytes(patch._record), sysex.dt1((0x00, 0x09), bytes([42]))])
+
+    async def test_listener(self):
+        ''' Unsolicited messages go to the listener '''
+        heard = []
+        self.midi.listener = heard.append
+        self.midi._dispatch(bytes(self.bank[0]._record))
+        self.assertEqual(heard, [bytes(self.bank[0]._record)])
+
+
+class TestBackend(unittest.TestCase):
+
+    def test_partial_backend(self):
+        ''' A backend missing one of its coroutines can't be created '''
+        class WriteOnly(Backend):
+            async def write(self, data):
+                pass
+
+        with self.assertRaises(TypeError):
+            WriteOnly()
+
+
+class TestPtyTransport(unittest.IsolatedAsyncioTestCase):
+
+    async def test_request_over_pty(self):
+        ''' The same exchange through a pseudo terminal '''
+        bank = PatchBank.from_file(SAMPLE_DUMP)
+        host, unit = pty_pair()
+        responder = asyncio.ensure_future(fake_unit(unit, bank, []))
+        async with Transport(host, timeout=1.0) as midi:
+            replies = await asyncio.gather(*[midi.request(sysex.address_of(bank[i]._record)) for i in range(16)])
+        responder.cancel()
+        await unit.close()
+        self.assertEqual(b''.join(replies), bank.tobytes()[:16 * 59])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import os
+import unittest
+import sysex
+from RolandGp8 import RolandGp8
+from PatchBank import PatchBank
+from transport import Transport, LoopbackBackend
+from uploader import Uploader, LIVE, BACKGROUND, bank_airtime
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class Recorder():
+    ''' Stands in for a Transport, remembers what was written and when '''
+
+    def __init__(self):
+        self.written = []
+
+    async def write(self, message):
+        self.written.append((asyncio.get_running_loop().time(), message))
+
+
+class TestUploader(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.bank = PatchBank.from_file(SAMPLE_DUMP)
+        self.recorder = Recorder()
+        # 10x MIDI speed keeps the tests quick
+        self.uploader = Uploader(self.recorder, baud=312500, gap=0.0)
+
+    async def asyncTearDown(self):
+        await self.uploader.close()
+
+    async def test_priority_order(self):
+        ''' Live edits go out before a background sync queued earlier '''
+        for patch in list(self.bank)[:4]:
+            self.uploader.submit(patch, BACKGROUND)
+        edited = self.bank[100]
+        self.uploader.submit(edited, LIVE)
+        await self.uploader.start()
+        await self.uploader.join()
+        messages = [message for when, message in self.recorder.written]
+        self.assertEqual(messages[0], bytes(edited._record))
+        self.assertEqual(messages[1:], [bytes(p._record) for p in list(self.bank)[:4]])
+
+    async def test_coalesce(self):
+        ''' Repeated writes to one address are sent once, latest version wins '''
+        patch = self.bank[3]
+        futures = []
+        for volume in range(10):
+            patch.volume = volume
+            futures.append(self.uploader.submit(patch))
+        await self.uploader.start()
+        await asyncio.gather(*futures)
+        self.assertEqual(len(self.recorder.written), 1)
+        self.assertEqual(RolandGp8(self.recorder.written[0][1]).volume, 9)
+        self.assertEqual(self.uploader.coalesced, 9)
+
+    async def test_program_supersedes_partial_writes(self):
+        address = sysex.address_of(self.bank[0]._record)
+        partial = self.uploader.submit(sysex.dt1((address[0], address[1] + 9), bytes([5])))
+        self.uploader.submit(self.bank[0])
+        await self.uploader.start()
+        await partial
+        self.assertEqual([m for t, m in self.recorder.written], [bytes(self.bank[0]._record)])
+
+    async def test_live_edit_inside_queued_program(self):
+        ''' A live edit goes out first and the queued program keeps it '''
+        address = sysex.address_of(self.bank[0]._record)
+        self.uploader.submit(self.bank[0], BACKGROUND)
+        edit = sysex.dt1((address[0], address[1] + 9), bytes([5]))
+        self.uploader.submit(edit, LIVE)
+        await self.uploader.start()
+        await self.uploader.join()
+        messages = [m for t, m in self.recorder.written]
+        self.assertEqual(messages[0], edit)
+        program = RolandGp8(messages[1])
+        self.assertEqual(program._record[7 + 9], 5)
+        self.assertTrue(program.verify_checksum())
+        self.assertEqual(program.name, self.bank[0].name)
+
+    async def test_program_keeps_priority_of_partial_writes(self):
+        ''' A program replacing a live partial write goes out at live priority '''
+        self.uploader.submit(self.bank[50], BACKGROUND)
+        address = sysex.address_of(self.bank[0]._record)
+        self.uploader.submit(sysex.dt1((address[0], address[1] + 9), bytes([5])), LIVE)
+        self.uploader.submit(self.bank[0], BACKGROUND)
+        await self.uploader.start()
+        await self.uploader.join()
+        self.assertEqual([m for t, m in self.recorder.written], [bytes(self.bank[0]._record),
+                                                                  bytes(self.bank[50]._record)])
+
+    async def test_paced_to_line_rate(self):
+        ''' Messages are spaced by their time on the wire '''
+        for patch in list(self.bank)[:8]:
+            self.uploader.submit(patch)
+        await self.uploader.start()
+        await self.uploader.join()
+        times = [when for when, message in self.recorder.written]
+        self.assertGreaterEqual(times[-1] - times[0], bank_airtime(7, baud=312500) * 0.95)
+        self.assertEqual(self.uploader.bytes_sent, 8 * 59)
+
+    async def test_through_transport(self):
+        host, unit = LoopbackBackend.pair()
+        received = []
+
+        async def receive():
+            while len(b''.join(received)) < len(self.bank.tobytes()):
+                received.append(await unit.read())
+
+        receiver = asyncio.ensure_future(receive())
+        async with Transport(host) as midi:
+            uploader = Uploader(midi, baud=3125000, gap=0.0)
+            await uploader.start()
+            for patch in self.bank:
+                uploader.submit(patch)
+            await uploader.join()
+            await uploader.close()
+        await asyncio.wait_for(receiver, 1.0)
+        self.assertEqual(b''.join(received), self.bank.tobytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+from PatchBank import PatchBank
+from sysex import roland_checksum
+import validate
+
+SAMPLE_DUMP = os.path.join(os.path.dirname(__file__), '..', '..', 'examples', 'sysex_to_read.syx')
+
+
+class TestValidate(unittest.TestCase):
+
+    def setUp(self):
+        with open(SAMPLE_DUMP, 'rb') as file:
+            self.data = bytearray(file.read())
+
+    def poke(self, frame, position, value):
+        ''' Store a byte and fix the checksum, so only the byte is wrong '''
+        start = frame * 59
+        self.data[start + position] = value
+        self.data[start + 57] = roland_checksum(self.data[start + 5:start + 57])
+
+    def found(self, data, **kwargs):
+        return [(violation.frame, violation.field) for violation in validate.validate(bytes(data), **kwargs)]
+
+    def test_sample_dump(self):
+        self.assertEqual(self.found(self.data), [])
+        # A few bools of the sample dump are stored as other values than 00h/64h
+        self.assertEqual(self.found(self.data, strict=True),
+                         [(76, 'FILTER_UP_DOWN'), (85, 'OD_TURBO'), (102, 'OD_TURBO'), (121, 'FILTER_UP_DOWN')])
+
+    def test_fields(self):
+        bank = PatchBank(self.data)
+        bank.view(3).name = 'Bad\x07Name'
+        self.data = bytearray(bank.tobytes())
+        self.data[59 * 1 + 0] = 0xF1
+        self.data[59 * 2 + 2] = 0x10
+        self.data[59 * 5 + 16] = 101
+        self.data[59 * 5 + 56] = 0x20
+        self.data[59 * 9 + 6] = 0x20
+        self.data[59 * 9 + 58] = 0x7F
+        self.assertEqual(self.found(self.data), [
+            (1, 'SYSEX_BEGIN'),
+            (2, 'DEVICE_ID'), (3, 'NAME'),
+            (5, 'OD_DRIVE'), (5, 'NAME_TERM'), (5, 'CHECKSUM'),
+            (9, 'GROUP'), (9, 'SYSEX_END'), (9, 'CHECKSUM'),
+        ])
+
+    def test_checksum(self):
+        expected = self.data[59 * 7 + 57]
+        self.data[59 * 7 + 57] = (expected + 1) & 0x7F
+        violation, = validate.validate(bytes(self.data))
+        self.assertEqual((violation.frame, violation.field, violation.expected), (7, 'CHECKSUM', expected))
+        self.assertIn('should be %02X' % expected, str(violation))
+        self.assertEqual(violation.to_dict()['expected'], '%02X' % expected)
+
+    def test_truncated(self):
+        violations = validate.validate(bytes(self.data[:-10]), first=100)
+        self.assertEqual([(violation.frame, violation.field) for violation in violations], [(227, validate.LENGTH)])
+        self.assertEqual(len(violations[0].value), 49)
+
+    def test_blocks(self):
+        self.poke(30, 16, 101)
+        original = validate.BLOCK
+        validate.BLOCK = 7
+        try:
+            self.assertEqual(self.found(self.data * 2), [(30, 'OD_DRIVE'), (158, 'OD_DRIVE')])
+        finally:
+            validate.BLOCK = original
+
+    def test_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'archive.syx')
+            self.poke(100, 16, 101)
+            with open(filename, 'wb') as file:
+                file.write(self.data * 3 + b'\xF0\x41')
+            expected = [(100, 'OD_DRIVE'), (228, 'OD_DRIVE'), (356, 'OD_DRIVE'), (384, validate.LENGTH)]
+            for workers in (1, 2):
+                violations = validate.validate_file(filename, workers=workers, chunk_bytes=59 * 50)
+                self.assertEqual(sorted([(violation.frame, violation.field) for violation in violations]),
+                                 sorted(expected), workers)
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import sys
 import unittest
 from RolandGp8 import RolandGp8
 
@@ -92,6 +93,29 @@ class TestRolandGp8(unittest.TestCase):
         '''Test property _ '''
         pass
 
+    def test_checksum_new(self):
+        '''A new record has a correct checksum '''
+        self.assertTrue(self.p.verify_checksum())
+
+    def test_checksum_kept_on_write(self):
+        '''Every kind of write keeps the checksum correct '''
+        self.p.od_drive = 77
+        self.p.od_turbo = False
+        self.p.chorus = True
+        self.p.filter = True
+        self.p.name = 'Checksummed'
+        del self.p.volume
+        self.p._write_value('EQ_HI', 3)
+        self.p._write_value('NAME', 'Dictionary path')
+        self.assertTrue(self.p.verify_checksum())
+
+    def test_checksum_fix(self):
+        '''A stale checksum is detected and recomputed '''
+        self.p._record[20] = 99
+        self.assertFalse(self.p.verify_checksum())
+        self.p.fix_checksum()
+        self.assertTrue(self.p.verify_checksum())
+
     def test_property_filter(self):
         '''Test property FILTER '''
         self.effect_test_by_name('filter')
@@ -245,6 +269,137 @@ class TestRolandGp8(unittest.TestCase):
         '''Test property PHASER_RATE '''
         self.generic_test_by_prop_id('PHASER_RATE')
 
+    def test_to_dict_round_trip(self):
+        ''' from_dict(to_dict()) gives back the same record '''
+        self.p.name = 'Round Trip'
+        self.p.chorus = True
+        self.p.od_drive = 77
+        values = self.p.to_dict()
+        self.assertEqual(values['name'], 'Round Trip')
+        self.assertEqual(values['address'], '00 00')
+        self.assertTrue(values['chorus'])
+        self.assertEqual(RolandGp8.from_dict(values)._record, self.p._record)
+
+    def test_to_dict_keeps_odd_bytes(self):
+        ''' A bad checksum, a name terminator other than 00h and raw bools survive the round trip '''
+        self.p.name = 'Odd'
+        self.p._record[17] = 1
+        self.p._record[56] = 0x20
+        self.p._record[57] = (self.p._record[57] + 1) & 0x7F
+        values = self.p.to_dict()
+        self.assertEqual((values['od_turbo'], values['name_term'], values['checksum']),
+                         (1, 0x20, self.p._record[57]))
+        self.assertEqual(RolandGp8.from_dict(values)._record, self.p._record)
+        self.assertNotIn('checksum', RolandGp8().to_dict())
+        self.assertNotIn('name_term', RolandGp8().to_dict())
+
+    def test_to_dict_raw_values(self):
+        ''' An int parameter out of range and unswitched effects bits come back under raw '''
+        self.p.chorus = True
+        self.p._record[16] = 120
+        self.p._record[7] |= 0x30
+        self.p.fix_checksum()
+        values = self.p.to_dict()
+        self.assertNotIn('od_drive', values)
+        self.assertEqual(values['raw'], {'od_drive': 120, 'effects': [0x30, 0]})
+        patch = RolandGp8.from_dict(values)
+        self.assertEqual(patch._record, self.p._record)
+        self.assertEqual(patch._record[7], 0x38)
+        self.assertNotIn('raw', RolandGp8().to_dict())
+        for raw in [{'od_drive': 128}, {'od_turbo': 1}, {'effects': [0x08, 0]}, {'effects': [0x30]}]:
+            with self.assertRaises(ValueError, msg=raw):
+                RolandGp8.from_dict({'raw': raw})
+
+    def test_from_dict_raw_bool(self):
+        ''' An int for a bool is the stored byte, only 64h reads as on '''
+        self.assertEqual(RolandGp8.from_dict({'od_turbo': 1})._record[17], 1)
+        self.assertFalse(RolandGp8.from_dict({'od_turbo': 1}).od_turbo)
+        self.assertTrue(RolandGp8.from_dict({'od_turbo': 100}).od_turbo)
+        self.assertTrue(RolandGp8.from_dict({'od_turbo': True}).od_turbo)
+        with self.assertRaises(ValueError):
+            RolandGp8.from_dict({'od_turbo': 128})
+
+    def test_from_dict_partial(self):
+        ''' Missing values keep their defaults, bad ones are refused '''
+        patch = RolandGp8.from_dict({'volume': 90, 'address': '40 40'})
+        self.assertEqual(patch.volume, 90)
+        self.assertEqual(patch.group, 'B')
+        self.assertTrue(patch.verify_checksum())
+        with self.assertRaises(ValueError):
+            RolandGp8.from_dict({'volume': 101})
+        with self.assertRaises(ValueError):
+            RolandGp8.from_dict({'no_such_field': 1})
+
+    def test_effects_table(self):
+        ''' The table driven effects property agrees with every effect switch '''
+        attributes = ['phaser', 'equalizer', 'delay', 'chorus', 'filter', 'compressor', 'overdrive', 'distortion']
+        for msb in range(16):
+            for lsb in (0, 5, 10, 15):
+                self.p._record[7], self.p._record[8] = msb, lsb
+                self.assertEqual(list(self.p.effects.values()), [getattr(self.p, name) for name in attributes])
+        self.assertEqual(list(self.p.effects), ['Phaser', 'Equalizer', 'Delay', 'Chorus', 'Dynamic Filter',
+                                                'Compressor', 'Overdrive', 'Distortion'])
+
+    def test_location(self):
+        ''' Group, bank and program move the record, keeping the checksum '''
+        self.assertEqual(self.p.location, ('A', 0, 0))
+        self.p.bank = 3
+        self.assertEqual(self.p.location, ('A', 3, 1))
+        self.p.program = 7
+        self.p.group = 'B'
+        self.assertEqual((self.p.group, self.p.bank, self.p.program), ('B', 3, 7))
+        self.assertEqual(bytes(self.p._record[5:7]), bytes([0x40 + 2 * 8 + 6, 0x40]))
+        self.assertTrue(self.p.verify_checksum())
+        self.p.location = ('A', 0, 0)
+        self.assertEqual(bytes(self.p._record[5:7]), b'\x00\x00')
+        self.assertTrue(self.p.verify_checksum())
+        for location in [('C', 1, 1), ('A', 9, 1), ('A', 1, 0)]:
+            with self.assertRaises(ValueError):
+                self.p.location = location
+        with self.assertRaises(ValueError):
+            self.p.group = 'C'
+
+    def test_set_many(self):
+        ''' Several values set at once, checksum kept '''
+        self.p.set_many({'od_drive': 80, 'name': 'Lead'}, od_turbo=False, chorus=True, phaser=True)
+        self.assertEqual((self.p.od_drive, self.p.name, self.p.od_turbo), (80, 'Lead            ', False))
+        self.assertTrue(self.p.chorus and self.p.phaser)
+        self.assertTrue(self.p.verify_checksum())
+
+    def test_set_many_all_or_nothing(self):
+        ''' A bad value anywhere leaves the record untouched '''
+        before = bytes(self.p._record)
+        with self.assertRaises(ValueError):
+            self.p.set_many(od_drive=80, chorus=True, volume=101)
+        with self.assertRaises(ValueError):
+            self.p.set_many(od_drive=80, no_such_field=1)
+        self.assertEqual(bytes(self.p._record), before)
+
+    def test_transaction_rolls_back(self):
+        before = bytes(self.p._record)
+        with self.assertRaises(ValueError):
+            with self.p.transaction():
+                self.p.name = 'Lead'
+                self.p.chorus = True
+                self.p.od_drive = 120
+        self.assertEqual(bytes(self.p._record), before)
+
+    def test_instance_footprint(self):
+        ''' A patch costs its 59 byte record plus a small fixed overhead '''
+        self.assertFalse(hasattr(self.p, '__dict__'))
+        with self.assertRaises(AttributeError):
+            self.p.scratch = 1
+        overhead = sys.getsizeof(self.p) + sys.getsizeof(self.p._record) - len(self.p._record)
+        self.assertLess(overhead, 128)
+
+    def test_shared_schema_is_read_only(self):
+        ''' The data dictionary is shared by every instance and can't be changed '''
+        self.assertIs(self.p._gp8, RolandGp8()._gp8)
+        with self.assertRaises(TypeError):
+            self.p._gp8['OD_DRIVE']['range'] = range(256)
+        with self.assertRaises(TypeError):
+            self.p._effect_lookup['CHORUS'] = 0
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+''' Asyncio MIDI transport for GP-8 sysex.
+
+A Transport sends DT1 (12h) messages and RQ1 (11h) requests over a pluggable
+backend, and hands back the DT1 replies as awaitable results. Any number of
+requests can be in flight at once (up to max_pending, after which request()
+waits: backpressure), each with its own timeout.
+
+Backends only move bytes:
+
+* LoopbackBackend -- an in-process MIDI cable, for tests and emulation.
+* FileBackend -- any file descriptor: a raw MIDI device node (ie.
+  /dev/snd/midiC1D0), a serial port, or one end of a pty (see pty_pair()).
+'''
+
+import abc
+import asyncio
+import os
+
+import sysex
+from RolandGp8 import RolandGp8
+
+'''Bytes of a DT1 message around its data: F0 41 dev 13 12 MSB LSB .. sum F7'''
+_DT1_OVERHEAD = 9
+_SHORTEST_DT1 = _DT1_OVERHEAD + 1
+
+
+class Backend(abc.ABC):
+    """ Byte pipe to a MIDI port. Subclasses implement all three coroutines. """
+
+    @abc.abstractmethod
+    async def write(self, data):
+        """ Send data, waiting while the port can't take more (backpressure) """
+
+    @abc.abstractmethod
+    async def read(self):
+        """ Next chunk of received bytes, b'' once the port is closed """
+
+    @abc.abstractmethod
+    async def close(self):
+        """ Close the port """
+
+
+class LoopbackBackend(Backend):
+    """ One end of an in-process MIDI cable. Create both ends with pair(). """
+
+    def __init__(self, maxsize=64):
+        """
+        Args:
+            maxsize ([int]): Chunks queued towards this end before writers wait.
+        """
+        self._inbox = asyncio.Queue(maxsize)
+        self.peer = None
+
+    @classmethod
+    def pair(cls, maxsize=64):
+        """ Two connected ends, whatever one writes the other reads """
+        one, other = cls(maxsize), cls(maxsize)
+        one.peer, other.peer = other, one
+        return one, other
+
+    async def write(self, data):
+        await self.peer._inbox.put(bytes(data))
+
+    async def read(self):
+        return await self._inbox.get()
+
+    async def close(self):
+        """ Signal end of stream to both ends """
+        for inbox in (self._inbox, self.peer._inbox):
+            try:
+                inbox.put_nowait(b'')
+            except asyncio.QueueFull:
+                pass
+
+
+class FileBackend(Backend):
+    """ Non blocking file descriptor: raw MIDI device, serial port or pty """
+
+    def __init__(self, fd, chunk_size=4096):
+        os.set_blocking(fd, False)
+        self.fd = fd
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def open(cls, path):
+        """ Open a raw MIDI device node (or any character device) read/write """
+        return cls(os.open(path, os.O_RDWR | os.O_NOCTTY))
+
+    async def _ready(self, add, remove):
+        """ Wait until the event loop reports the descriptor ready """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        add(self.fd, lambda: future.done() or future.set_result(None))
+        try:
+            await future
+        finally:
+            remove(self.fd)
+
+    async def write(self, data):
+        loop = asyncio.get_running_loop()
+        data = memoryview(bytes(data))
+        while data:
+            try:
+                data = data[os.write(self.fd, data):]
+            except BlockingIOError:
+                await self._ready(loop.add_writer, loop.remove_writer)
+
+    async def read(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                return os.read(self.fd, self.chunk_size)
+            except BlockingIOError:
+                await self._ready(loop.add_reader, loop.remove_reader)
+            except OSError:
+                # A pty whose other end has gone away
+                return b''
+
+    async def close(self):
+        os.close(self.fd)
+
+
+def pty_pair():
+    """ Two FileBackends joined by a pseudo terminal, a stand-in for a serial
+        MIDI cable. The pty is put in raw mode so every byte goes through as is.
+    """
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    return FileBackend(master), FileBackend(slave)
+
+
+class Transport():
+    """ Sends DT1 messages and pipelined RQ1 requests over a Backend.
+
+        Usage:
+            async with Transport(backend) as midi:
+                await midi.send(patch)
+                patch = await midi.request_program((0x40, 0x00))
+    """
+
+    def __init__(self, backend, device_id=0, timeout=1.0, max_pending=8, listener=None):
+        """
+        Args:
+            backend ([Backend]): The MIDI port.
+            device_id ([int]): Zero indexed MIDI channel of the unit.
+            timeout ([float]): Default seconds to wait for a reply.
+            max_pending ([int]): Requests in flight before request() waits.
+            listener ([callable]): Called with every received message which
+                                   isn't a reply to a request.
+        """
+        self.backend = backend
+        self.device_id = device_id
+        self.timeout = timeout
+        self.listener = listener
+        self.dropped = 0
+        self._pending = {}
+        self._slots = asyncio.Semaphore(max_pending)
+        self._write_lock = asyncio.Lock()
+        self._reader = None
+
+    async def start(self):
+        """ Start reading from the backend """
+        if self._reader is None:
+            self._reader = asyncio.ensure_future(self._read_loop())
+
+    async def close(self):
+        """ Stop reading, fail anything still waiting for a reply, close the backend """
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+        for waiting in self._pending.values():
+            for future, size in waiting:
+                if not future.done():
+                    future.set_exception(ConnectionError('Transport closed'))
+        self._pending.clear()
+        await self.backend.close()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _read_loop(self):
+        framer = sysex.Framer()
+        while True:
+            chunk = await self.backend.read()
+            if not chunk:
+                break
+            for frame in framer.feed(chunk):
+                self._dispatch(frame)
+
+    def _dispatch(self, frame):
+        """ Hand a received message to the oldest request for its address.
+
+            A DT1 too short to hold an address and a data byte is counted in
+            dropped and goes nowhere. A reply of the wrong length or with a bad
+            checksum fails its request with ValueError instead of completing it.
+        """
+        if frame[4] == sysex.DT1 and len(frame) < _SHORTEST_DT1:
+            self.dropped += 1
+            return
+        waiting = self._pending.get(sysex.address_of(frame)) if frame[4] == sysex.DT1 else None
+        while waiting:
+            future, size = waiting.pop(0)
+            if future.done():
+                continue
+            if len(frame) != size + _DT1_OVERHEAD:
+                future.set_exception(ValueError(' '.join(['Reply is', str(len(frame)), 'bytes long, not',
+                                                          str(size + _DT1_OVERHEAD)])))
+            elif frame[-2] != sysex.roland_checksum(frame[5:-2]):
+                future.set_exception(ValueError('Reply has a bad checksum'))
+            else:
+                future.set_result(frame)
+            return
+        if self.listener is not None:
+            self.listener(frame)
+
+    async def write(self, message):
+        """ Send one complete message, never interleaved with another """
+        async with self._write_lock:
+            await self.backend.write(message)
+
+    async def send(self, patch):
+        """ Send a RolandGp8 record (a full DT1 frame) as it is """
+        await self.write(bytes(patch._record))
+
+    async def send_data(self, address, data):
+        """ Send data to an address as one DT1 message """
+        await self.write(sysex.dt1(address, data, self.device_id))
+
+    async def request(self, address, size=sysex.PROGRAM_SIZE, timeout=None):
+        """ Send an RQ1 for address and wait for the unit's DT1 reply.
+
+        Args:
+            address ([tuple]): (MSB, LSB) address.
+            size ([int]): Number of data bytes requested.
+            timeout ([float]): Seconds to wait, defaults to self.timeout.
+
+        Returns:
+            [bytes]: The complete reply message.
+
+        Raises:
+            asyncio.TimeoutError: No reply in time.
+            ValueError: A reply of the wrong length or with a bad checksum.
+        """
+        address = tuple(address)
+        async with self._slots:
+            future = asyncio.get_running_loop().create_future()
+            request = (future, size)
+            self._pending.setdefault(address, []).append(request)
+            try:
+                await self.write(sysex.rq1(address, size, self.device_id))
+                return await asyncio.wait_for(future, self.timeout if timeout is None else timeout)
+            finally:
+                waiting = self._pending.get(address)
+                if waiting is not None and request in waiting:
+                    waiting.remove(request)
+                if not waiting:
+                    self._pending.pop(address, None)
+
+    async def request_program(self, address, timeout=None):
+        """ Request one program and return it as a RolandGp8 """
+        return RolandGp8(await self.request(address, sysex.PROGRAM_SIZE, timeout))
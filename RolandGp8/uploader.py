@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+''' Paced, prioritized uploads to a GP-8.
+
+MIDI runs at 31250 baud, 10 bits per byte on the wire: 3125 bytes a second, so
+one 59 byte program takes ~19 ms and a full 128 program bank ~2.4 s. The
+Uploader queues messages by priority (a live edit goes ahead of a background
+library sync), coalesces repeated writes to the same address into one, and
+paces output to the line rate plus a per-message gap for the unit to digest
+each message, so it is never sent more than it can accept.
+'''
+
+import asyncio
+import heapq
+
+import devices.gp8 as _gp8
+import sysex
+
+'''Priorities, lower goes first'''
+LIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+
+MIDI_BAUD = 31250
+BITS_PER_BYTE = 10
+
+
+class Uploader():
+    """ Priority queue of DT1 messages, drained at (no more than) line rate.
+
+        Usage:
+            uploader = Uploader(transport)
+            await uploader.start()
+            uploader.submit(patch, BACKGROUND)
+            await uploader.submit(edited, LIVE)   # waits until it's on the wire
+            await uploader.join()
+    """
+
+    def __init__(self, transport, baud=MIDI_BAUD, gap=0.005):
+        """
+        Args:
+            transport ([Transport]): Where messages are written.
+            baud ([int]): Line rate in bits per second.
+            gap ([float]): Extra seconds after each message for the unit to process it.
+        """
+        self.transport = transport
+        self.rate = baud / BITS_PER_BYTE
+        self.gap = gap
+        self.bytes_sent = 0
+        self.messages_sent = 0
+        self.coalesced = 0
+        self._heap = []
+        self._entries = {}
+        self._sequence = 0
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._next_free = 0.0
+        self._task = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def submit(self, message, priority=NORMAL):
+        """ Queue a RolandGp8 record or a complete DT1 message.
+
+            A message for an address which is still queued replaces the queued
+            one (keeping the more urgent priority), and a full program record
+            replaces every queued partial write inside that program, taking
+            the most urgent priority of any of them. A partial
+            write inside a queued program is also patched into that program,
+            so sending the program later doesn't undo the edit.
+
+        Returns:
+            [asyncio.Future]: Done once the message (or whatever replaced it) is sent.
+        """
+        if not isinstance(message, (bytes, bytearray, memoryview)):
+            message = message._record
+        message = bytes(message)
+        address = sysex.address_of(message)
+        if sysex.is_program(message):
+            superseded, priority = self._supersede(address, priority)
+            patched = None
+        else:
+            superseded = []
+            patched = self._patch(address, message)
+        entry = self._entries.get(address)
+        if entry is None:
+            entry = self._entries[address] = [priority, self._sequence, address, message,
+                                               asyncio.get_running_loop().create_future()]
+            self._sequence += 1
+            heapq.heappush(self._heap, (priority, entry[1], address))
+        else:
+            self.coalesced += 1
+            if patched != address:
+                entry[3] = message
+            if priority < entry[0]:
+                entry[0] = priority
+                heapq.heappush(self._heap, (priority, entry[1], address))
+        for future in superseded:
+            entry[4].add_done_callback(lambda done, future=future: _follow(future, done))
+        self._idle.clear()
+        self._wakeup.set()
+        return entry[4]
+
+    def _supersede(self, address, priority):
+        """ Drop queued partial writes inside the program at address.
+
+        Returns:
+            [tuple]: (futures, priority): their futures, to be resolved with
+                     the program's, and the most urgent of their priorities
+                     and priority.
+        """
+        msb, lsb = address
+        futures = []
+        for other in [key for key in self._entries if key[0] == msb and lsb < key[1] < lsb + sysex.PROGRAM_SIZE]:
+            entry = self._entries.pop(other)
+            futures.append(entry[4])
+            priority = min(priority, entry[0])
+            self.coalesced += 1
+        return futures, priority
+
+    def _patch(self, address, message):
+        """ Write the data of a partial DT1 into the queued program it falls in.
+
+        Returns:
+            [tuple]: Address of that program, None if none is queued.
+        """
+        msb, lsb = address
+        data = message[_gp8.DATA_START:-2]
+        for key, entry in self._entries.items():
+            if key[0] == msb and key[1] <= lsb < key[1] + sysex.PROGRAM_SIZE and sysex.is_program(entry[3]):
+                start = _gp8.DATA_START + lsb - key[1]
+                record = bytearray(entry[3])
+                record[start:min(start + len(data), _gp8.CHECKSUM_END)] = data[:_gp8.CHECKSUM_END - start]
+                record[_gp8.CHECKSUM_END] = sysex.roland_checksum(record[_gp8.CHECKSUM_START:_gp8.CHECKSUM_END])
+                entry[3] = bytes(record)
+                return key
+        return None
+
+    def _pop(self):
+        """ Most urgent queued entry, skipping heap items left behind by coalescing """
+        while self._heap:
+            priority, sequence, address = heapq.heappop(self._heap)
+            entry = self._entries.get(address)
+            if entry is not None and entry[0] == priority and entry[1] == sequence:
+                del self._entries[address]
+                return entry
+        return None
+
+    def airtime(self, message):
+        """ Seconds the message occupies the line, including the gap after it """
+        return len(message) / self.rate + self.gap
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._run())
+
+    async def join(self):
+        """ Wait until everything queued has been sent """
+        await self._idle.wait()
+
+    async def close(self):
+        """ Stop sending, anything still queued is cancelled """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for entry in self._entries.values():
+            entry[4].cancel()
+        self._entries.clear()
+        self._heap.clear()
+        self._idle.set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._entries:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            delay = self._next_free - loop.time()
+            if delay > 0:
+                # Pick what to send only once the line is free, so anything
+                # more urgent submitted meanwhile still goes first
+                await asyncio.sleep(delay)
+            entry = self._pop()
+            if entry is None:
+                continue
+            message = entry[3]
+            try:
+                await self.transport.write(message)
+            except Exception as error:
+                entry[4].set_exception(error)
+                continue
+            self._next_free = max(loop.time(), self._next_free) + self.airtime(message)
+            self.bytes_sent += len(message)
+            self.messages_sent += 1
+            if not entry[4].done():
+                entry[4].set_result(None)
+
+
+def _follow(future, done):
+    """ Resolve future the same way as done """
+    if future.done():
+        return
+    if done.cancelled():
+        future.cancel()
+    elif done.exception() is not None:
+        future.set_exception(done.exception())
+    else:
+        future.set_result(None)
+
+
+def bank_airtime(count, baud=MIDI_BAUD, gap=0.0):
+    """ Seconds to upload count full program records at baud """
+    return count * (_gp8.RECORD_LENGTH * BITS_PER_BYTE / baud + gap)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+''' Archive validator: every frame of a raw sysex archive checked against devices/gp8.py.
+
+An archive is read as back to back 59 byte frames, like PatchBank does. Each
+frame is checked for its header (F0 41 <device 0-F> 13 12), every field
+against the legal values of the data dictionary, a printable ASCII name, the
+00h name terminator, the checksum and the closing F7. Anything out of place
+is reported as a Violation naming the frame and the field. A byte lost or
+gained in transfer shows up as header and F7 violations on every frame after
+it, and a truncated last frame as LENGTH.
+
+The checks are columnar. For every byte position of a frame the schema gives
+a 256 entry table of the values that are NOT legal there (compiled once,
+from schema.legal_tables()). A block of frames is checked with one extended
+slice, one translate() and one count() per position, and checksums are
+summed in the lanes of one big int (see columnar.py). Real dumps hold bools
+stored as other 7 bit values than 00h/64h (the example dump has a few), so
+those are only violations when checking strict.
+
+Big files are split into chunks of whole frames, checked by a process pool.
+Every worker reads its own byte range, so only violations cross processes.
+
+Usage: python3 validate.py archive.syx [archive.syx ...] [--strict] [--workers N] [--json]
+'''
+
+import argparse
+import concurrent.futures
+import json
+import os
+
+import columnar
+import devices.gp8 as _gp8
+import schema as _schema
+from sysex import roland_checksum
+
+'''Bytes per chunk handed to a worker, a whole number of frames'''
+CHUNK_BYTES = (8 << 20) // _gp8.RECORD_LENGTH * _gp8.RECORD_LENGTH
+
+'''Frames per pass, bounds the memory of the checksum sums'''
+BLOCK = 1 << 16
+
+'''Field reported for a truncated frame at the end of an archive'''
+LENGTH = 'LENGTH'
+
+_LEGAL = _schema.legal_tables(_gp8.data)
+_SEVEN_BITS = columnar.table(lambda value: value & 0x7F)
+
+'''Any data byte, what a bool is checked against unless strict'''
+_DATA_BYTE = _LEGAL['CHECKSUM']
+
+'''Name characters: printable ASCII, space to tilde'''
+_PRINTABLE = bytes([1 if 0x20 <= value < 0x7F else 0 for value in range(256)])
+
+'''Turns a legal_values() table into one with 1 for every value NOT legal'''
+_INVERT = bytes([1, 0]) + bytes(254)
+
+
+def _field_at():
+    """ (key, data) of the field at every byte of a frame, the first in the
+        data dictionary where two share a byte (ie. PROGRAM and BANK)
+    """
+    fields = [None] * _gp8.RECORD_LENGTH
+    for key, data in _gp8.data.items():
+        for position in range(data['position'], data['position'] + data['length']):
+            fields[position] = fields[position] or (key, data)
+    return fields
+
+
+FIELD_AT = _field_at()
+
+
+def bounds(strict=False):
+    """ (position, key, table of illegal values) for every byte of a frame.
+
+    Args:
+        strict ([bool]): Bools must be stored as 00h or 64h, not just any data byte.
+    """
+    checks = []
+    for position, (key, data) in enumerate(FIELD_AT):
+        if data['type'] == 'string':
+            legal = _PRINTABLE
+        elif data['type'] == 'bool' and not strict:
+            legal = _DATA_BYTE
+        else:
+            legal = _LEGAL[key]
+        checks.append((position, key, legal.translate(_INVERT)))
+    return checks
+
+
+_BOUNDS = {strict: bounds(strict) for strict in (False, True)}
+
+
+class Violation():
+    """ A field of a frame holding something it may not """
+
+    def __init__(self, frame, field, value, expected=None):
+        """
+        Args:
+            frame ([int]): Index of the frame in the archive.
+            field ([str]): Data dictionary key, or LENGTH.
+            value ([bytes]): What the field holds.
+            expected: For a CHECKSUM, the right one.
+        """
+        self.frame = frame
+        self.field = field
+        self.value = value
+        self.expected = expected
+
+    def __repr__(self):
+        return 'Violation(%d, %r, %r)' % (self.frame, self.field, self.value)
+
+    def __str__(self):
+        text = 'frame %d: %s %s' % (self.frame, self.field, self.value.hex(' ').upper())
+        if self.expected is not None:
+            text += ', should be %02X' % self.expected
+        return text
+
+    def to_dict(self):
+        values = {'frame': self.frame, 'field': self.field, 'value': self.value.hex(' ').upper()}
+        if self.expected is not None:
+            values['expected'] = '%02X' % self.expected
+        return values
+
+
+def validate(data, first=0, strict=False):
+    """ Check a buffer of back to back frames.
+
+    Args:
+        data ([bytes]): bytes, bytearray or mmap.
+        first ([int]): Index of the first frame, for the report.
+        strict ([bool]): See bounds().
+
+    Returns:
+        [list]: Every Violation, by frame then position in the frame.
+    """
+    length = _gp8.RECORD_LENGTH
+    count = len(data) // length
+    found = {}
+    for start in range(0, count, BLOCK):
+        end = min(count, start + BLOCK)
+        block = data[start * length:end * length]
+        for position, key, illegal in _BOUNDS[strict]:
+            flags = block[position::length].translate(illegal)
+            if flags.count(1):
+                for index in columnar.nonzero(flags):
+                    found.setdefault(start + index, {}).setdefault(key, None)
+        sums = columnar.lane_sum([block[position::length]
+                                  for position in range(_gp8.CHECKSUM_START, _gp8.CHECKSUM_END + 1)], end - start)
+        for index in columnar.nonzero(sums.translate(_SEVEN_BITS)):
+            found.setdefault(start + index, {}).setdefault('CHECKSUM', None)
+    violations = []
+    for index in sorted(found):
+        frame = data[index * length:(index + 1) * length]
+        for key in found[index]:
+            field = _gp8.data[key]
+            value = bytes(frame[field['position']:field['position'] + field['length']])
+            expected = roland_checksum(frame[_gp8.CHECKSUM_START:_gp8.CHECKSUM_END]) if key == 'CHECKSUM' else None
+            violations.append(Violation(first + index, key, value, expected))
+    if len(data) % length:
+        violations.append(Violation(first + count, LENGTH, bytes(data[count * length:])))
+    return violations
+
+
+def _validate_chunk(filename, offset, size, strict):
+    """ Worker: validate size bytes of filename from offset """
+    with open(filename, 'rb') as file:
+        file.seek(offset)
+        return validate(file.read(size), offset // _gp8.RECORD_LENGTH, strict)
+
+
+def validate_file(filename, strict=False, workers=None, chunk_bytes=CHUNK_BYTES):
+    """ Check every frame of an archive file, see the module documentation.
+
+    Args:
+        filename ([str]): The archive.
+        strict ([bool]): See bounds().
+        workers ([int]): Processes, default one per CPU. 1 checks in this process.
+        chunk_bytes ([int]): Bytes per chunk, rounded down to whole frames.
+
+    Returns:
+        [list]: Every Violation, in frame order.
+    """
+    size = os.path.getsize(filename)
+    chunk_bytes = max(1, chunk_bytes // _gp8.RECORD_LENGTH) * _gp8.RECORD_LENGTH
+    chunks = [(filename, offset, min(chunk_bytes, size - offset), strict) for offset in range(0, size, chunk_bytes)]
+    if workers == 1 or len(chunks) < 2:
+        return [violation for chunk in chunks for violation in _validate_chunk(*chunk)]
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_validate_chunk, *chunk) for chunk in chunks]
+        return [violation for future in futures for violation in future.result()]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('archives', nargs='+')
+    parser.add_argument('--strict', action='store_true', help='bools must be stored as 00h or 64h')
+    parser.add_argument('--workers', type=int, help='processes, default one per CPU')
+    parser.add_argument('--json', action='store_true', help='print the violations as JSON')
+    options = parser.parse_args()
+    report = {}
+    for archive in options.archives:
+        report[archive] = validate_file(archive, options.strict, options.workers)
+    if options.json:
+        print(json.dumps({archive: [violation.to_dict() for violation in violations]
+                          for archive, violations in report.items()}, indent=1))
+    else:
+        for archive, violations in report.items():
+            for violation in violations:
+                print('%s: %s' % (archive, violation))
+            print('%s: %d violations' % (archive, len(violations)))
@@ -7,4 +7,5 @@ setup(name='Roland-Gp-8',
       author_email='me@grantrobertson.com',
       url='https://www.github.com/grobertson/Roland-GP-8/',
       packages=['RolandGp8'],
+      package_data={'RolandGp8': ['templates/*']},
      )
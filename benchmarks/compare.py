@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+
+''' Compare two suite.py result files, ie. before and after a change.
+
+Prints the time per item of every benchmark both runs have, and the ratio
+new / old. Exits with status 1 if anything got slower than --threshold times.
+
+Usage: python3 compare.py before.json after.json [--threshold 1.2]
+'''
+
+import argparse
+import json
+import sys
+
+
+def load(filename):
+    """ Report and its results keyed by (name, size) """
+    with open(filename) as file:
+        report = json.load(file)
+    return report, {(entry['name'], entry['size']): entry for entry in report['results']}
+
+
+def compare(old, new, threshold=1.2):
+    """ Print the comparison of two result files.
+
+    Returns:
+        [list]: (name, size, ratio) of every benchmark slower than threshold.
+    """
+    old_report, old_results = load(old)
+    new_report, new_results = load(new)
+    print('%-28s %10s %14s %14s %7s' % ('', '', old_report['revision'], new_report['revision'], ''))
+    regressions = []
+    for key, entry in new_results.items():
+        if key not in old_results:
+            continue
+        ratio = entry['ns_per_item'] / old_results[key]['ns_per_item']
+        flag = ''
+        if ratio > threshold:
+            flag = 'SLOWER'
+            regressions.append((key[0], key[1], ratio))
+        elif ratio < 1 / threshold:
+            flag = 'faster'
+        print('%-28s %10s %11.1f ns %11.1f ns %6.2fx %s' % (
+            key[0], key[1] or '', old_results[key]['ns_per_item'], entry['ns_per_item'], ratio, flag))
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.2, help='new / old ratio counted as a regression')
+    options = parser.parse_args(arguments)
+    if compare(options.old, options.new, options.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+''' Synthetic GP-8 sysex corpora for the benchmarks.
+
+Every record is a legal program: each field holds a random value its data
+dictionary entry accepts, the name is random printable ASCII, and the checksum
+is correct. Record i carries the address of program memory i % 128, the way a
+pile of concatenated bank dumps would. Records are drawn from a pool of 1024
+(so writing 10^7 of them is just repeating the pool), and the same seed always
+gives the same corpus.
+
+Usage: python3 corpus.py count [filename]
+'''
+
+import os
+import random
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'RolandGp8'))
+import schema
+from RolandGp8 import RolandGp8
+
+'''Where generated corpora are cached'''
+CORPORA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpora')
+
+POOL_SIZE = 1024
+PRINTABLE = ' ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789!#&*+-./'
+
+
+def random_patch(rng, slot):
+    """ A RolandGp8 with a random legal value in every field, at program memory slot """
+    patch = RolandGp8()
+    for name, field in RolandGp8._fields.items():
+        if isinstance(field, schema.StringField):
+            value = ''.join(rng.choice(PRINTABLE) for _ in range(field.length))
+        elif isinstance(field, (schema.BoolField, schema.EffectSwitch)):
+            value = rng.random() < 0.5
+        else:
+            value = rng.choice([value for value in range(128) if field.legal[value]])
+        setattr(patch, name, value)
+    patch._record[5] = 0x40 + (slot >> 1)
+    patch._record[6] = (slot & 1) * 0x40
+    patch.fix_checksum()
+    return patch
+
+
+def pool(seed=0):
+    """ POOL_SIZE distinct random records, concatenated """
+    rng = random.Random(seed)
+    return b''.join(bytes(random_patch(rng, index % 128)._record) for index in range(POOL_SIZE))
+
+
+def write(filename, count, seed=0):
+    """ Write count random records to filename """
+    records = pool(seed)
+    record_length = len(records) // POOL_SIZE
+    with open(filename, 'wb') as file:
+        for _ in range(count // POOL_SIZE):
+            file.write(records)
+        file.write(records[:count % POOL_SIZE * record_length])
+
+
+def corpus(count, seed=0):
+    """ Filename of a cached corpus of count records, generated on first use """
+    filename = os.path.join(CORPORA, 'gp8-%d-%d.syx' % (count, seed))
+    if not os.path.exists(filename):
+        os.makedirs(CORPORA, exist_ok=True)
+        write(filename + '.tmp', count, seed)
+        os.replace(filename + '.tmp', filename)
+    return filename
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        sys.exit(__doc__.strip().splitlines()[-1])
+    count = int(float(sys.argv[1]))
+    if len(sys.argv) > 2:
+        write(sys.argv[2], count)
+    else:
+        print(corpus(count))
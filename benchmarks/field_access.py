@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+''' Micro-benchmark: compiled field properties vs the data dictionary path.
+
+The "dictionary" class wraps _read_value/_write_value/_effect_get/_effect_set in
+properties, exactly like the hand written properties of RolandGp8 used to.
+
+Usage: python3 field_access.py [iterations]
+'''
+
+import os
+import sys
+import timeit
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'RolandGp8'))
+from RolandGp8 import RolandGp8
+
+
+class DictionaryRolandGp8(RolandGp8):
+    od_drive = property(lambda self: self._read_value('OD_DRIVE'),
+                        lambda self, value: self._write_value('OD_DRIVE', value))
+    od_turbo = property(lambda self: self._read_value('OD_TURBO'),
+                        lambda self, value: self._write_value('OD_TURBO', value))
+    chorus = property(lambda self: self._effect_get('EFFECT_MSB', 'CHORUS'),
+                      lambda self, value: self._effect_set('EFFECT_MSB', 'CHORUS', value))
+
+
+def compare(label, statement, number):
+    compiled = RolandGp8()
+    dictionary = DictionaryRolandGp8()
+    compiled_time = min(timeit.repeat(statement, number=number, repeat=5, globals={'p': compiled}))
+    dictionary_time = min(timeit.repeat(statement, number=number, repeat=5, globals={'p': dictionary}))
+    print('%-24s compiled %6.1f ns  dictionary %6.1f ns  %4.1fx faster' % (
+        label, compiled_time / number * 1e9, dictionary_time / number * 1e9, dictionary_time / compiled_time))
+
+
+if __name__ == '__main__':
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    compare('p.od_drive', 'p.od_drive', number)
+    compare('p.od_drive = 50', 'p.od_drive = 50', number)
+    compare('p.od_turbo', 'p.od_turbo', number)
+    compare('p.od_turbo = True', 'p.od_turbo = True', number)
+    compare('p.chorus', 'p.chorus', number)
+    compare('p.chorus = not p.chorus', 'p.chorus = not p.chorus', number)
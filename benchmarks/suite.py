@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+''' Benchmark suite: parsing, field access, export, checksums and framing.
+
+Runs every benchmark against synthetic corpora (see corpus.py) of each size
+given, and writes the results as JSON, tagged with the git commit, so runs
+before and after a change can be compared with compare.py.
+
+Field access is timed per property on a single patch, independent of the
+corpus size. Everything else is timed over a whole corpus, best of --repeat
+runs, and reported as seconds per run and nanoseconds per patch.
+
+Usage:
+    python3 suite.py                          # 10^3, 10^4 and 10^5 patches
+    python3 suite.py --sizes 1e3 1e5 1e7 --output before.json
+    python3 suite.py --filter checksum
+'''
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import timeit
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'RolandGp8'))
+import devices.gp8 as _gp8
+import sysex
+from query import Query
+from RolandGp8 import RolandGp8
+from PatchBank import PatchBank
+from corpus import corpus
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_revision():
+    """ Commit the tree is at, with -dirty if it has uncommitted changes """
+    try:
+        return subprocess.run(['git', 'describe', '--always', '--dirty'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def best_of(function, repeat):
+    """ Fastest of repeat calls of function, in seconds """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def corpus_benchmarks(filename, bank):
+    """ (name, function) of every benchmark over a whole corpus file.
+
+    Args:
+        filename ([str]): The corpus.
+        bank ([PatchBank]): The same corpus, opened read only.
+    """
+    with open(filename, 'rb') as file:
+        data = file.read()
+    offsets = range(0, len(data), _gp8.RECORD_LENGTH)
+
+    def construct():
+        for offset in offsets:
+            RolandGp8(data[offset:offset + _gp8.RECORD_LENGTH])
+
+    def construct_views():
+        for patch in bank.views():
+            pass
+
+    def effects():
+        for patch in bank.views():
+            patch.effects
+
+    def csv_hex():
+        for patch in bank.views():
+            patch.csv_hex()
+
+    def verify_checksum():
+        for patch in bank.views():
+            patch.verify_checksum()
+
+    def fix_checksum():
+        for offset in offsets:
+            RolandGp8(data[offset:offset + _gp8.RECORD_LENGTH]).fix_checksum()
+
+    def verify_checksums():
+        bank.verify_checksums()
+
+    def fix_checksums():
+        PatchBank(bytearray(data)).fix_checksums()
+
+    def bank_get():
+        bank.get('od_drive')
+
+    def bank_set():
+        PatchBank(bytearray(data)).set('od_drive', 50)
+
+    def frame_file():
+        with open(filename, 'rb') as file:
+            for frame in sysex.read_frames(file):
+                pass
+
+    def frame_midi():
+        ''' The same bytes arriving in 64 byte chunks, as from a MIDI port '''
+        for frame in sysex.iter_frames(data[offset:offset + 64] for offset in range(0, len(data), 64)):
+            pass
+
+    def bank_load():
+        PatchBank.from_file(filename)
+
+    lead = Query('distortion and not chorus and od_drive >= 80 and name ~ "Lead"')
+
+    def query():
+        lead.indexes(bank)
+
+    return [
+        ('construct', construct),
+        ('construct.views', construct_views),
+        ('effects', effects),
+        ('csv_hex', csv_hex),
+        ('checksum.verify', verify_checksum),
+        ('checksum.fix', fix_checksum),
+        ('checksum.bank_verify', verify_checksums),
+        ('checksum.bank_fix', fix_checksums),
+        ('bank.load', bank_load),
+        ('bank.get', bank_get),
+        ('bank.set', bank_set),
+        ('bank.query', query),
+        ('framing.file', frame_file),
+        ('framing.midi', frame_midi),
+    ]
+
+
+def field_benchmarks():
+    """ (name, statement, value) of a get and a set of every property """
+    benchmarks = []
+    for name, field in RolandGp8._fields.items():
+        value = True if not hasattr(field, 'default') else field.default
+        benchmarks.append(('get.' + name, 'p.' + name, None))
+        benchmarks.append(('set.' + name, 'p.%s = value' % name, value))
+    return benchmarks
+
+
+def run(sizes, repeat=3, number=100000, selected=None):
+    """ Run the suite.
+
+    Args:
+        sizes ([list]): Corpus sizes, in patches.
+        repeat ([int]): Runs of each benchmark, the best is kept.
+        number ([int]): Iterations of each field access benchmark.
+        selected ([str]): Only run benchmarks whose name contains this.
+
+    Returns:
+        [list]: One dict per benchmark (and size).
+    """
+    results = []
+    for name, statement, value in field_benchmarks():
+        if selected and selected not in name:
+            continue
+        namespace = {'p': RolandGp8(), 'value': value}
+        seconds = min(timeit.repeat(statement, number=number, repeat=repeat, globals=namespace))
+        results.append(result(name, None, number, seconds))
+    for size in sizes:
+        filename = corpus(size)
+        with PatchBank.open(filename) as bank:
+            for name, function in corpus_benchmarks(filename, bank):
+                if selected and selected not in name:
+                    continue
+                results.append(result(name, size, size, best_of(function, repeat)))
+    return results
+
+
+def result(name, size, items, seconds):
+    return {
+        'name': name,
+        'size': size,
+        'items': items,
+        'seconds': seconds,
+        'ns_per_item': seconds / items * 1e9,
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', type=lambda size: int(float(size)), default=[10**3, 10**4, 10**5],
+                        help='corpus sizes in patches, ie. 1e3 1e7')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each benchmark, the best is kept')
+    parser.add_argument('--number', type=int, default=100000, help='iterations of each field access benchmark')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this')
+    parser.add_argument('--output', help='JSON results file, default results/<git revision>.json')
+    options = parser.parse_args(arguments)
+
+    revision = git_revision()
+    report = {
+        'revision': revision,
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+        'repeat': options.repeat,
+        'results': [],
+    }
+    for entry in run(options.sizes, options.repeat, options.number, options.filter):
+        report['results'].append(entry)
+        print('%-28s %10s %12.1f ns/item %10.4f s' % (
+            entry['name'], entry['size'] or '', entry['ns_per_item'], entry['seconds']))
+
+    output = options.output or os.path.join(RESULTS, revision + '.json')
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as file:
+        json.dump(report, file, indent=1)
+    print('Results written to', output)
+
+
+if __name__ == '__main__':
+    main()
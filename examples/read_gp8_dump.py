@@ -2,22 +2,25 @@
 
 ''' Slight hack to import from the parent directory '''
 import sys
-sys.path.append('..')
+sys.path.append('../RolandGp8')
 from RolandGp8 import RolandGp8
+from sysex import read_frames, is_program
 
 
 
 def read_sysex(filename):
     ''' Each record in a dump equals one instance of RolandGp8.
 
-    There are cooler/better ways to do this read. However, the example below shows
-    importing all records from a Gp8 sysex dump -- each record is 59 bytes long.
+    The framer pulls complete GP-8 messages out of the file, so it doesn't
+    matter if the dump holds other messages, truncated frames, or isn't
+    exactly 128 records -- each program record is 59 bytes long.
     '''
     program = []
     try:
         with open(filename, 'rb') as file:
-            for index in range(0, 127):
-                program.append(RolandGp8(file.read(59)))
+            for frame in read_frames(file):
+                if is_program(frame):
+                    program.append(RolandGp8(frame))
     except (FileExistsError, FileNotFoundError):
         exit(' '.join(["Could not open", filename, "for read. Sorry."]))
     return program
@@ -31,4 +34,3 @@ for p in program:
     for effect in effects:
         if effects[effect]: e.append(effect)
     print(', '.join(e))
-